@@ -0,0 +1,62 @@
+# Description: Session-level cache of the analytics frames derived from base_dataset.pkl, used by
+# description.py.
+#
+# A session loads the base dataset once and memoizes every frame derived from it, keyed by the
+# chain of steps that produced it (("clean",), ("clean", "impute"), ...). A chain reuses its
+# longest cached prefix, and each step runs on a shallow copy of its parent, so steps that add
+# or replace columns never change a cached frame. frame() hands out shallow copies with the
+# same contract as dataset_loader: add or replace columns freely, but do not modify values in
+# place.
+
+import threading
+
+import financial_factors4 as ff4
+from dataset_loader import BASE_DATASET, load_base_dataset
+
+STEPS = {
+    "clean": ff4.clean_dataset,
+    "impute": ff4.impute_data,
+    "features": ff4.build_features,
+    "final": ff4.finalize_features,
+}
+
+# Named chains for the frames the reports use
+CHAINS = {
+    "base": (),
+    "cleaned": ("clean",),
+    "imputed": ("clean", "impute"),
+    "featured": ("clean", "impute", "features"),
+    "final": ("clean", "impute", "features", "final"),
+}
+
+
+class AnalyticsSession:
+    def __init__(self, path=BASE_DATASET):
+        self.path = path
+        self.frames = {}
+        self.loads = 0
+        self.lock = threading.RLock()
+
+    def frame(self, chain="final"):
+        # chain is a name from CHAINS or a sequence of step names from STEPS
+        chain = CHAINS[chain] if isinstance(chain, str) else tuple(chain)
+        for step in chain:
+            if step not in STEPS:
+                raise KeyError(f"Unknown step {step!r}; expected one of {list(STEPS)}")
+        with self.lock:
+            return self.compute(chain).copy(deep=False)
+
+    def compute(self, chain):
+        if chain not in self.frames:
+            if chain:
+                parent = self.compute(chain[:-1])
+                self.frames[chain] = STEPS[chain[-1]](parent.copy(deep=False))
+            else:
+                self.loads += 1
+                self.frames[chain] = load_base_dataset(self.path)
+        return self.frames[chain]
+
+    def clear(self):
+        # Drops every memoized frame; the next frame() loads the source again
+        with self.lock:
+            self.frames.clear()
@@ -1,134 +1,357 @@
 # Description: This script downloads data from WRDS and processes it to create a base dataset for the credit risk model.
 #
 # Instructions:
-# you may change conn = wrds.Connection() to your own WRDS credentials or use mine: wrds_username="bosen", wrds_password="Y@QC8f4qEjCz!eY"
+# set WRDS_USERNAME / WRDS_PASSWORD to your own WRDS credentials; without them wrds reads ~/.pgpass or prompts for them.
+# the WRDS connection is only opened by the first query that needs it, so runs served entirely from cache work offline.
 # you don't need to rely on any external files, as the script will download the necessary data from GitHub and WRDS.
 
-import subprocess
-import sys
-
-try:
-    import wrds
-except ImportError:
-    print("Installing wrds package...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "wrds", "--quiet"])
-    import wrds
-
+import argparse
+import contextlib
 import os
+import time
+import threading
 import io
+import numpy as np
 import pandas as pd
-import pickle
 import requests
 import datetime as dt
-
-# Global WRDS connection
-# WRDS_CONN = None
-WRDS_CONN = wrds.Connection(wrds_username="bosen", wrds_password="Y@QC8f4qEjCz!eY")
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from cache_store import (
+    cache_exists,
+    read_cache,
+    write_cache,
+    write_chunks,
+    upsert_cache,
+    read_watermarks,
+    write_watermarks,
+)
+from sector_classification import compile_sector_table, classify_sectors
+from pipeline import stage, run_pipeline
+from shards import DEFAULT_SHARDS, concat_shards
+from sql_backend import sql_default_dates, sql_interval_join, sql_ratings_positions
+from instrumentation import instrument, instrument_block
+
+# WRDS connections are opened on first use, one per thread so concurrent extracts do not
+# queue behind each other, and reused by all get_* extractors running on that thread
+WRDS_LOCAL = threading.local()
+WRDS_POOL = []
+# A connection installed with set_wrds_conn is shared by all threads. One without raw_sql
+# (a plain DB-API connection, e.g. sqlite3.connect on a local copy) may only work on the
+# thread that created it, so extracts and pipeline stages then run on the calling thread.
+WRDS_CONN = None
+WRDS_CONN_LOCK = threading.Lock()
+
+# A shared connection must not run two queries at once from different threads; a streamed
+# read holds it until its last chunk is read
+WRDS_LOCK = threading.RLock()
 
 # Global URLs for CSV downloads
 major_groups_url = "https://raw.githubusercontent.com/saintsjd/sic4-list/master/major-groups.csv"
 divisions_url = "https://raw.githubusercontent.com/saintsjd/sic4-list/master/divisions.csv"
 
+# Incremental refreshes re-read this much history before the high-water mark to pick up
+# late-arriving and restated rows
+RATINGS_LOOKBACK_DAYS = 90
+FINANCIALS_LOOKBACK_YEARS = 2
+
+# Cold-start acquisition: every raw extract is fetched on its own thread, retried with
+# exponential backoff, and abandoned after SOURCE_TIMEOUT seconds
+SOURCE_TIMEOUT = 3600
+SOURCE_RETRIES = 2
+RETRY_BACKOFF = 5
+HTTP_TIMEOUT = 60
+
+# Rows per server-side cursor batch when streaming large extracts
+FETCH_CHUNKSIZE = 200_000
+
+# Compact schema, applied from extraction through merge_default_dates: dictionary-encoded
+# identifiers and ratings, float32 financials (Compustat reports about 7 significant digits)
+# and nullable small ints.
+
+# Declared dtypes for comp.funda, applied to every fetched chunk
+FINANCIALS_DTYPES = {
+    "fyear": "Int16",
+    "fyr": "Int8",
+    **{
+        field: "float32"
+        for field in [
+            "at",
+            "lt",
+            "ceq",
+            "act",
+            "lct",
+            "invt",
+            "rect",
+            "ap",
+            "dlc",
+            "dltt",
+            "dltis",
+            "dvt",
+            "che",
+            "xint",
+            "xrd",
+            "xsga",
+            "oibdp",
+            "ebit",
+            "sale",
+            "cogs",
+            "ni",
+            "oancf",
+            "fincf",
+            "csho",
+            "prcc_f",
+        ]
+    },
+    "freq": "category",
+}
+
+# Rating symbols that mark a default event
+DEFAULT_SYMBOLS = ["D", "SD", "R"]
+
+# Execution backends for the relational steps (merge_ratings_with_gvkey, the interval join in
+# merge_financials_ratings and compute_default_dates); both produce identical frames
+BACKENDS = ("pandas", "duckdb")
+
+# Default label windows on days2dflt: flag column -> (min_days, max_days), inclusive
+DEFAULT_HORIZONS = {"dflt_flag": (90, 455)}
+
+RATING_SYMBOLS = [
+    "AAA",
+    "AA+",
+    "AA",
+    "AA-",
+    "A+",
+    "A",
+    "A-",
+    "BBB+",
+    "BBB",
+    "BBB-",
+    "BB+",
+    "BB",
+    "BB-",
+    "B+",
+    "B",
+    "B-",
+    "CCC+",
+    "CCC",
+    "CCC-",
+    "CC",
+    "C",
+    "D",
+    "SD",
+    "NR",
+    "R",
+]
+
+# Declared dtypes for ciq_ratings.wrds_erating. ratingsymbol has fixed categories so frames
+# from different extracts and chunks stay categorical when they are merged or concatenated.
+RATINGS_DTYPES = {
+    "entity_pname": "category",
+    "ratingsymbol": pd.CategoricalDtype(RATING_SYMBOLS),
+    "ratingactionword": "category",
+    "unsol": "category",
+}
+
+# Declared dtypes for the columns added to base_dataset by the merge and default stages; the
+# identifiers stay plain strings until then because the merges join on them
+BASE_DATASET_DTYPES = {
+    "gvkey": "category",
+    "sector": "category",
+    "days2dflt": "Int32",
+}
+
+
+def wrds_credentials():
+    # Credentials from WRDS_USERNAME / WRDS_PASSWORD; missing ones are left to wrds, which
+    # reads ~/.pgpass or prompts
+    credentials = {
+        "wrds_username": os.environ.get("WRDS_USERNAME"),
+        "wrds_password": os.environ.get("WRDS_PASSWORD"),
+    }
+    return {name: value for name, value in credentials.items() if value}
+
 
 def get_wrds_conn():
+    # Connects on the first call from each thread; later calls on that thread reuse it
+    if WRDS_CONN is not None:
+        return WRDS_CONN
+    conn = getattr(WRDS_LOCAL, "conn", None)
+    if conn is None:
+        try:
+            import wrds
+        except ImportError:
+            raise ImportError("wrds is required to download extracts: pip install wrds")
+        # Connections are opened one at a time, so concurrent extracts never prompt at once
+        with WRDS_CONN_LOCK:
+            conn = wrds.Connection(**wrds_credentials())
+            WRDS_POOL.append(conn)
+        WRDS_LOCAL.conn = conn
+    return conn
+
+
+def set_wrds_conn(conn):
+    # Use another connection for all extractors, e.g. LocalWRDS or a plain DB-API connection
+    # to a local copy of the WRDS tables
     global WRDS_CONN
-    if WRDS_CONN is None:
-        # Input credentials once; they will be reused in subsequent calls
-        username = input("Enter WRDS username: ")  # Input WRDS username
-        password = input("Enter WRDS password: ")  # Input WRDS password
-        WRDS_CONN = wrds.Connection(wrds_username=username, wrds_password=password)
-    return WRDS_CONN
+    with WRDS_CONN_LOCK:
+        WRDS_CONN = conn
+
+
+def close_wrds_conn(shared=True):
+    # Closes every pooled WRDS connection, and the one installed with set_wrds_conn unless
+    # shared=False (main leaves that one to the caller that installed it)
+    global WRDS_CONN, WRDS_LOCAL
+    with WRDS_CONN_LOCK:
+        for conn in WRDS_POOL + ([WRDS_CONN] if shared and WRDS_CONN is not None else []):
+            conn.close()
+        WRDS_POOL.clear()
+        if shared:
+            WRDS_CONN = None
+        WRDS_LOCAL = threading.local()
+
+
+def wrds_conn_is_thread_bound():
+    # wrds.Connection and LocalWRDS can be shared between threads; a plain DB-API connection
+    # installed with set_wrds_conn may raise when used off the thread that created it
+    conn = WRDS_CONN
+    return conn is not None and not hasattr(conn, "raw_sql")
+
+
+def run_sql(conn, query, chunksize=None):
+    # wrds.Connection exposes raw_sql; a plain DB-API / SQLAlchemy connection (e.g. a local
+    # SQLite or Postgres copy of the WRDS tables) goes through pandas instead.
+    # With chunksize, an iterator of DataFrames is returned instead of one DataFrame.
+    if chunksize is not None:
+        return iter_sql(conn, query, chunksize)
+    # The connection installed with set_wrds_conn is shared, so its queries take turns
+    with WRDS_LOCK if conn is WRDS_CONN else contextlib.nullcontext():
+        if hasattr(conn, "raw_sql"):
+            return conn.raw_sql(query)
+        return pd.read_sql_query(query, conn)
+
+
+def iter_sql(conn, query, chunksize):
+    # The shared connection stays locked until the last chunk is read (or the iterator is
+    # closed), so a streamed read never interleaves with another thread's query
+    with WRDS_LOCK if conn is WRDS_CONN else contextlib.nullcontext():
+        if hasattr(conn, "raw_sql"):
+            yield from conn.raw_sql(query, chunksize=chunksize, return_iter=True)
+        else:
+            yield from pd.read_sql_query(query, conn, chunksize=chunksize)
 
 
-def close_wrds_conn():
-    global WRDS_CONN
-    if WRDS_CONN is not None:
-        WRDS_CONN.close()
-        WRDS_CONN = None
+def apply_dtypes(df, dtypes):
+    for column, dtype in dtypes.items():
+        if column in df.columns:
+            df[column] = df[column].astype(dtype)
+    return df
 
 
-def get_gvkey(filename="gvkey_data.pkl"):
-    if os.path.exists(filename):
-        print(f"Loading data from {filename}...")
-        with open(filename, "rb") as f:
-            gvkey = pickle.load(f)
-    else:
+def memory_report(df):
+    # Bytes per column as stored vs. as the untyped extract held it (object strings,
+    # 8-byte numbers), largest savings first
+    rows = []
+    for column in df.columns:
+        values = df[column]
+        after = values.memory_usage(index=False, deep=True)
+        if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(values):
+            before = values.astype(object).memory_usage(index=False, deep=True)
+        elif pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            before = 8 * len(values)
+        else:
+            before = after
+        rows.append((column, str(values.dtype), before, after))
+    report = pd.DataFrame(rows, columns=["column", "dtype", "before_bytes", "after_bytes"])
+    report["saved_bytes"] = report["before_bytes"] - report["after_bytes"]
+    report = report.sort_values("saved_bytes", ascending=False, ignore_index=True)
+    return report
+
+
+@instrument
+def get_gvkey(filename="gvkey_data.parquet", columns=None, filters=None):
+    if not cache_exists(filename):
         conn = get_wrds_conn()
         query = "SELECT * FROM ciq.wrds_gvkey"
-        gvkey = conn.raw_sql(query)
-        with open(filename, "wb") as f:
-            pickle.dump(gvkey, f)
-        print(f"Data saved to {filename}")
-    return gvkey
-
-
-def get_ratings(filename="ratings_data.pkl"):
-    if os.path.exists(filename):
-        print(f"Loading data from {filename}...")
-        with open(filename, "rb") as f:
-            ratings = pickle.load(f)
+        gvkey = run_sql(conn, query)
+        write_cache(gvkey, filename)
+    return read_cache(filename, columns=columns, filters=filters)
+
+
+def download_ratings(since="1990-01-01"):
+    conn = get_wrds_conn()
+    query = f"""
+    SELECT company_id as companyid, entity_pname, ratingdate, ratingsymbol, ratingactionword, unsol
+    FROM ciq_ratings.wrds_erating
+    WHERE longtermflag = 1 AND ratingtypename = 'Local Currency LT' AND ratingdate >= '{since}'
+    """
+    ratings = run_sql(conn, query)
+    ratings = ratings[ratings.ratingsymbol.isin(RATING_SYMBOLS)]
+    return apply_dtypes(ratings.reset_index(drop=True), RATINGS_DTYPES)
+
+
+@instrument
+def get_ratings(filename="ratings_data.parquet", columns=None, filters=None, incremental=False):
+    if not cache_exists(filename):
+        write_cache(download_ratings(), filename)
+    elif incremental:
+        watermark = read_watermarks(filename).get("ratingdate")
+        if watermark is None:
+            watermark = read_cache(filename, columns=["ratingdate"])["ratingdate"].max()
+        since = (pd.Timestamp(watermark) - pd.Timedelta(days=RATINGS_LOOKBACK_DAYS)).date()
+        print(f"Refreshing ratings since {since}...")
+        upsert_cache(download_ratings(since), filename, "ratingdate", since)
     else:
-        conn = get_wrds_conn()
-        query = """
-        SELECT company_id as companyid, entity_pname, ratingdate, ratingsymbol, ratingactionword, unsol
-        FROM ciq_ratings.wrds_erating
-        WHERE longtermflag = 1 AND ratingtypename = 'Local Currency LT' AND ratingdate >= '1990-01-01'
-        """
-        ratings = conn.raw_sql(query)
-        symbols = [
-            "AAA",
-            "AA+",
-            "AA",
-            "AA-",
-            "A+",
-            "A",
-            "A-",
-            "BBB+",
-            "BBB",
-            "BBB-",
-            "BB+",
-            "BB",
-            "BB-",
-            "B+",
-            "B",
-            "B-",
-            "CCC+",
-            "CCC",
-            "CCC-",
-            "CC",
-            "C",
-            "D",
-            "SD",
-            "NR",
-            "R",
-        ]
-        ratings = ratings[ratings.ratingsymbol.isin(symbols)]
-        with open(filename, "wb") as f:
-            pickle.dump(ratings, f)
-        print(f"Data saved to {filename}")
-    return ratings
-
-
-def merge_ratings_with_gvkey(gvkey, ratings):
-    ratings2 = pd.merge(
-        gvkey[["gvkey", "companyid", "startdate", "enddate"]], ratings, on="companyid"
-    )
-    ratings3 = ratings2.drop_duplicates(subset=["gvkey", "ratingdate"])
-    ratings4 = ratings3.sort_values(
-        ["gvkey", "companyid", "ratingdate"], ascending=[True, True, False]
-    )
-    ratings4["ratingenddate"] = ratings4.ratingdate.shift()
-    ratings4["gvkey_"] = ratings4.gvkey.shift()
-    ratings4.loc[ratings4.gvkey != ratings4.gvkey_, "ratingenddate"] = str(dt.date(2100, 12, 31))
+        ratings = read_cache(filename, columns=columns, filters=filters)
+        return apply_dtypes(ratings, RATINGS_DTYPES)
+    ratingdate = pd.to_datetime(read_cache(filename, columns=["ratingdate"])["ratingdate"])
+    write_watermarks(filename, ratingdate=ratingdate.max().date())
+    ratings = read_cache(filename, columns=columns, filters=filters)
+    return apply_dtypes(ratings, RATINGS_DTYPES)
+
+
+@instrument
+def merge_ratings_with_gvkey(gvkey, ratings, backend="pandas"):
+    if backend == "duckdb":
+        # Join, de-duplication and sort run in SQL; the frame is assembled from the row
+        # positions, with the merged frame's row numbers as index like the pandas path
+        left = gvkey[["gvkey", "companyid", "startdate", "enddate"]]
+        left_pos, right_pos, merged_pos, end_pos, previous_pos = sql_ratings_positions(
+            left, ratings
+        )
+        ratings4 = pd.concat(
+            [
+                left.iloc[left_pos].reset_index(drop=True),
+                ratings.drop(columns="companyid").iloc[right_pos].reset_index(drop=True),
+            ],
+            axis=1,
+        )
+        ratings4.index = merged_pos
+        # The rating period (the next later rating of the gvkey) comes from LAG windows in
+        # SQL; -1 positions are missing labels, so they reindex to NaN like a shift
+        ratingdate = ratings["ratingdate"].reset_index(drop=True)
+        ratings4["ratingenddate"] = ratingdate.reindex(end_pos).set_axis(ratings4.index)
+        gvkeys = left["gvkey"].reset_index(drop=True)
+        ratings4["gvkey_"] = gvkeys.reindex(previous_pos).set_axis(ratings4.index)
+        first = end_pos < 0
+    else:
+        ratings2 = pd.merge(
+            gvkey[["gvkey", "companyid", "startdate", "enddate"]], ratings, on="companyid"
+        )
+        ratings3 = ratings2.drop_duplicates(subset=["gvkey", "ratingdate"])
+        ratings4 = ratings3.sort_values(
+            ["gvkey", "companyid", "ratingdate"], ascending=[True, True, False]
+        )
+        ratings4["ratingenddate"] = ratings4.ratingdate.shift()
+        ratings4["gvkey_"] = ratings4.gvkey.shift()
+        first = ratings4.gvkey != ratings4.gvkey_
+    # A gvkey's latest rating is open-ended
+    ratings4.loc[first, "ratingenddate"] = str(dt.date(2100, 12, 31))
     return ratings4
 
 
-def get_sector(ratings4, filename="sector_data.pkl"):
-    if os.path.exists(filename):
-        print(f"Loading data from {filename}...")
-        with open(filename, "rb") as f:
-            info = pickle.load(f)
-    else:
+def get_sector(ratings4, filename="sector_data.parquet", columns=None):
+    if not cache_exists(filename):
         conn = get_wrds_conn()
         sql_info = """
         SELECT
@@ -146,137 +369,39 @@ def get_sector(ratings4, filename="sector_data.pkl"):
             state
         FROM comp.company
         """
-        info = conn.raw_sql(sql_info)
+        info = run_sql(conn, sql_info)
         info = info[info.gvkey.isin(ratings4.gvkey)]
         info = info.drop_duplicates(subset=["gvkey"])
-        with open(filename, "wb") as f:
-            pickle.dump(info, f)
-        print(f"Data saved to {filename}")
-    return info
+        write_cache(info, filename)
+    return read_cache(filename, columns=columns)
 
 
-def get_or_download_csv(pkl_filename, csv_url):
-    if os.path.exists(pkl_filename):
-        print(f"Loading data from {pkl_filename}...")
-        df = pd.read_pickle(pkl_filename)
-    else:
-        print(f"{pkl_filename} not found, downloading from GitHub...")
-        response = requests.get(csv_url)
+def get_or_download_csv(filename, csv_url):
+    if not cache_exists(filename):
+        print(f"{filename} not found, downloading from GitHub...")
+        response = requests.get(csv_url, timeout=HTTP_TIMEOUT)
         if response.status_code == 200:
             df = pd.read_csv(io.StringIO(response.text))
-            df.to_pickle(pkl_filename)
-            print(f"Data saved to {pkl_filename}")
+            write_cache(df, filename)
         else:
             raise Exception(f"Download failed with status code: {response.status_code}")
-    return df
+    return read_cache(filename)
 
 
+@instrument
 def get_sector_info(ratings4):
     info = get_sector(ratings4)
-    major_groups = get_or_download_csv("major_groups.pkl", major_groups_url)
-    divisions = get_or_download_csv("divisions.pkl", divisions_url)
-    info["Major Group"] = info["sic"].astype(str).str[:2].str.zfill(2)
-    major_groups["Major Group"] = major_groups["Major Group"].astype(str).str.zfill(2)
-    info_with_division = info.merge(
-        major_groups[["Major Group", "Division"]], on="Major Group", how="left"
-    )
-    info_with_division = info_with_division.merge(
-        divisions[["Division", "Description"]], on="Division", how="left"
-    )
-    info_with_division.rename(columns={"Description": "SIC Division Name"}, inplace=True)
-    info_with_division = info_with_division.drop(columns=["Major Group", "Division"])
-
-    gics_data = {
-        "gsector": ["10", "15", "20", "25", "30", "35", "40", "45", "50", "55", "60"],
-        "GIC Sector Name": [
-            "Energy",
-            "Materials",
-            "Industrials",
-            "Consumer Discretionary",
-            "Consumer Staples",
-            "Health Care",
-            "Financials",
-            "Information Technology",
-            "Communication Services",
-            "Utilities",
-            "Real Estate",
-        ],
-    }
-    gics = pd.DataFrame(gics_data)
-    info_with_gic = info_with_division.merge(gics, on="gsector", how="left")
-    info_with_gic["sector"] = info_with_gic["GIC Sector Name"]
-    info_with_gic.loc[info_with_gic["sector"].isnull(), "sector"] = info_with_gic[
-        "SIC Division Name"
-    ]
-    info_1 = info_with_gic.drop(columns=["fic", "gind", "idbflag", "incorp", "state"])
-
-    # Adjust sectors for specific companies
-    info_1.loc[info_1["conm"] == "ARGO GROUP INTL 6.5 SR NT 42", "sector"] = "Insurance"
-    info_1.loc[info_1["conm"] == "HILFIGER (TOMMY) U S A INC", "sector"] = "Manufacturing"
-    info_1.loc[info_1["conm"] == "NOVA SCOTIA POWER INC", "sector"] = "Utilities"
-
-    def replace_sector(row):
-        if row["sector"] in ["Consumer Discretionary", "Consumer Staples"]:
-            return row["SIC Division Name"]
-        else:
-            return row["sector"]
-
-    info_2 = info_1.copy()
-    info_2["sector"] = info_2.apply(replace_sector, axis=1)
-    info_2["ggroup"] = info_2["ggroup"].fillna("")
-
-    sector_mapping = {
-        "Industrials": "Manufacturing",
-        "Health Care": "Health",
-        "Energy": "Utilities",
-        "Information Technology": "Information Technology",
-        "Wholesale Trade": "Wholesale",
-        "Utilities": "Utilities",
-        "Financials": "Financials",
-        "Materials": "Manufacturing",
-        "Transportation, Communications, Electric, Gas, And Sanitary Services": "Transportation, Communications, Electric, Gas, And Sanitary Services",
-        "Communication Services": "Services",
-        "Retail Trade": "Retail",
-        "Manufacturing": "Manufacturing",
-        "Construction": "Construction",
-        "Finance, Insurance, And Real Estate": "Financials",
-        "Services": "Services",
-        "Agriculture, Forestry, And Fishing": "Agriculture",
-        "Public Administration": "Utilities",
-        "Real Estate": "Financials",
-        "Mining": "Manufacturing",
-        "Insurance": "Financials",
-    }
-    info_3 = info_2.copy()
-    info_3["sector"] = info_3["sector"].map(sector_mapping)
-
-    def map_sic_to_sector(row):
-        if row["sector"] == "Transportation, Communications, Electric, Gas, And Sanitary Services":
-            sic_major_group = int(str(row["sic"])[:2])
-            if 40 <= sic_major_group < 48:
-                return "Transportation"
-            elif sic_major_group == 48:
-                return "Services"
-            else:
-                return "Utilities"
-        else:
-            return row["sector"]
-
-    def map_gic_transportation(row):
-        if row["ggroup"] == "2030":
-            return "Transportation"
-        else:
-            return row["sector"]
-
-    info_3["sector"] = info_3.apply(map_sic_to_sector, axis=1)
-    info_3["sector"] = info_3.apply(map_gic_transportation, axis=1)
-    return info_3
+    major_groups = get_or_download_csv("major_groups.parquet", major_groups_url)
+    divisions = get_or_download_csv("divisions.parquet", divisions_url)
+    compiled = compile_sector_table(major_groups, divisions)
+    return classify_sectors(info, compiled)
 
 
+@instrument
 def prepare_ratings(info_3, ratings4):
     ratings5 = pd.merge(ratings4, info_3[["gvkey", "sector"]], on="gvkey", how="left")
     ratings_all = ratings5.copy()
-    defaults_all = ratings_all[ratings_all.ratingsymbol.isin(["D", "SD", "R"])].copy()
+    defaults_all = ratings_all[ratings_all.ratingsymbol.isin(DEFAULT_SYMBOLS)].copy()
     defaults_all2 = defaults_all[["gvkey", "ratingdate"]].drop_duplicates("gvkey")
     defaults_all2["default_flag"] = 1
     ratings6 = pd.merge(ratings5, defaults_all2, on=["gvkey", "ratingdate"], how="left")
@@ -284,66 +409,187 @@ def prepare_ratings(info_3, ratings4):
     return ratings6
 
 
-def get_financials(filename="financials_data.pkl"):
-    if os.path.exists(filename):
-        print(f"Loading data from {filename}...")
-        with open(filename, "rb") as f:
-            financials = pickle.load(f)
+def download_financials(since=1990, gvkeys=None, chunksize=FETCH_CHUNKSIZE):
+    # Yields funda chunks with the declared dtypes and the gvkey filter already applied, so
+    # peak memory is bounded by chunksize rather than by the size of the universe. Rows come
+    # sorted by gvkey, so each row group of a cold-start cache covers a narrow gvkey range.
+    conn = get_wrds_conn()
+    # Without an explicit gvkey list, the server keeps only issuers linked to Capital IQ (the
+    # only ones that can carry ratings), so the fetch does not have to wait for the ratings
+    universe = "" if gvkeys is not None else "AND gvkey IN (SELECT gvkey FROM ciq.wrds_gvkey)"
+    sql_financials = f"""
+    SELECT
+        gvkey,
+        datadate,
+        fyear,
+        fyr,
+        at,
+        lt,
+        ceq,
+        act,
+        lct,
+        invt,
+        rect,
+        ap,
+        dlc,
+        dltt,
+        dltis,
+        dvt,
+        che,
+        xint,
+        xrd,
+        xsga,
+        oibdp,
+        ebit,
+        sale,
+        cogs,
+        ni,
+        oancf,
+        fincf,
+        csho,
+        prcc_f,
+        'Annual' AS freq
+    FROM comp.funda
+    WHERE
+        indfmt = 'INDL'
+        AND datafmt = 'STD'
+        AND popsrc = 'D'
+        AND consol = 'C'
+        AND fyear >= {since}
+        {universe}
+    ORDER BY gvkey, datadate
+    """
+    chunks = run_sql(conn, sql_financials, chunksize=chunksize)
+    if chunksize is None:
+        chunks = [chunks]
+    for chunk in chunks:
+        if gvkeys is not None:
+            chunk = chunk[chunk["gvkey"].isin(gvkeys)]
+        yield apply_dtypes(chunk.reset_index(drop=True), FINANCIALS_DTYPES)
+
+
+def get_financials(
+    filename="financials_data.parquet",
+    columns=None,
+    filters=None,
+    incremental=False,
+    gvkeys=None,
+    chunksize=FETCH_CHUNKSIZE,
+):
+    # With gvkeys, only those issuers are fetched and read back; the cache then holds that
+    # universe, like sector_data does for the rated gvkeys
+    if gvkeys is not None:
+        gvkeys = list(gvkeys)
+        filters = (filters or []) + [("gvkey", "in", gvkeys)]
+    if not cache_exists(filename):
+        write_chunks(download_financials(gvkeys=gvkeys, chunksize=chunksize), filename)
+    elif incremental:
+        watermark = read_watermarks(filename).get("fyear")
+        if watermark is None:
+            watermark = read_cache(filename, columns=["fyear"])["fyear"].max()
+        since = int(watermark) - FINANCIALS_LOOKBACK_YEARS
+        print(f"Refreshing financials since fiscal year {since}...")
+        financials = pd.concat(
+            download_financials(since, gvkeys=gvkeys, chunksize=chunksize), ignore_index=True
+        )
+        # A refresh limited to gvkeys must not drop the other issuers' recent statements
+        keys = {"gvkey": gvkeys} if gvkeys is not None else None
+        upsert_cache(financials, filename, "fyear", since, sort_by=["gvkey"], keys=keys)
     else:
-        conn = get_wrds_conn()
-        sql_financials = """
-        SELECT
-            gvkey,
-            datadate,
-            fyear,
-            fyr,
-            at,
-            lt,
-            ceq,
-            act,
-            lct,
-            invt,
-            rect,
-            ap,
-            dlc,
-            dltt,
-            dltis,
-            dvt,
-            che,
-            xint,
-            xrd,
-            xsga,
-            oibdp,
-            ebit,
-            sale,
-            cogs,
-            ni,
-            oancf,
-            fincf,
-            csho,
-            prcc_f,
-            'Annual' AS freq
-        FROM comp.funda
-        WHERE
-            indfmt = 'INDL'
-            AND datafmt = 'STD'
-            AND popsrc = 'D'
-            AND consol = 'C'
-            AND fyear >= 1990
-        """
-        financials = conn.raw_sql(sql_financials)
-        financials.to_pickle(filename)
-        print(f"Data saved to {filename}")
-    return financials
+        financials = read_cache(filename, columns=columns, filters=filters)
+        return apply_dtypes(financials, FINANCIALS_DTYPES)
+    marks = read_cache(filename, columns=["fyear", "datadate"])
+    write_watermarks(
+        filename,
+        fyear=int(marks["fyear"].max()),
+        datadate=pd.to_datetime(marks["datadate"]).max().date(),
+    )
+    financials = read_cache(filename, columns=columns, filters=filters)
+    return apply_dtypes(financials, FINANCIALS_DTYPES)
 
 
-def prepare_financials():
-    financials = get_financials()
+@instrument
+def prepare_financials(columns=None, filters=None, incremental=False, gvkeys=None):
+    financials = get_financials(
+        columns=columns, filters=filters, incremental=incremental, gvkeys=gvkeys
+    )
     financials = financials.sort_values(by=["gvkey", "datadate"], ascending=[True, False])
     return financials
 
 
-def merge_financials_ratings(financials, ratings6):
+def interval_keys(left, right, by, on, start, end):
+    # The integer keys of an interval join: the positions of the left rows with a `by` and an
+    # `on` date, and of the right rows with a `by` and both window dates, with their `by`
+    # codes (shared by both sides) and their dates as days since the epoch
+    left_on = pd.to_datetime(left[on], errors="coerce")
+    right_start = pd.to_datetime(right[start], errors="coerce")
+    right_end = pd.to_datetime(right[end], errors="coerce")
+    codes, _ = pd.factorize(pd.concat([left[by], right[by]], ignore_index=True).astype(object))
+    left_code = codes[: len(left)]
+    right_code = codes[len(left) :]
+
+    left_ok = np.flatnonzero((left_code >= 0) & left_on.notna().to_numpy())
+    right_ok = np.flatnonzero(
+        (right_code >= 0) & right_start.notna().to_numpy() & right_end.notna().to_numpy()
+    )
+
+    def to_days(dates, rows):
+        return dates.to_numpy(dtype="datetime64[ns]")[rows].astype("datetime64[D]").view("i8")
+
+    return (
+        left_ok,
+        left_code[left_ok],
+        to_days(left_on, left_ok),
+        right_ok,
+        right_code[right_ok],
+        to_days(right_start, right_ok),
+        to_days(right_end, right_ok),
+    )
+
+
+def interval_join(left, right, by, on, start, end, backend="pandas"):
+    # Positions of every (left, right) pair with equal `by` and
+    # right[start] <= left[on] <= right[end], compared by day, ordered by left row then right
+    # row. Windows are sorted by start within each key, so the candidates for one left row are
+    # a contiguous run: from the first window whose running-max end reaches `on` up to the
+    # last window that has started. Only those candidates are materialised, never the full
+    # product. With backend="duckdb" the join runs in SQL on the same keys.
+    keys = interval_keys(left, right, by, on, start, end)
+    left_ok, left_code, left_day, right_ok, right_code, start_day, end_day = keys
+    if len(left_ok) == 0 or len(right_ok) == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    if backend == "duckdb":
+        return sql_interval_join(*keys)
+
+    lo_day = min(left_day.min(), start_day.min(), end_day.min())
+    span = max(left_day.max(), start_day.max(), end_day.max()) - lo_day + 1
+
+    order = np.lexsort((start_day, right_code))
+    win_pos = right_ok[order]
+    win_code = right_code[order]
+    win_start = win_code * span + (start_day[order] - lo_day)
+    win_end = pd.Series(end_day[order] - lo_day).groupby(win_code).cummax().to_numpy()
+    win_end = win_code * span + win_end
+
+    target = left_code * span + (left_day - lo_day)
+    lo = np.searchsorted(win_end, target, side="left")
+    hi = np.searchsorted(win_start, target, side="right")
+    counts = np.maximum(hi - lo, 0)
+
+    left_idx = np.repeat(left_ok, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cand = np.repeat(lo, counts) + offsets
+    keep = end_day[order][cand] >= np.repeat(left_day, counts)
+    left_idx = left_idx[keep]
+    right_idx = win_pos[cand[keep]]
+
+    # Emit pairs in the order a left merge would: left row first, then right row.
+    pair_order = np.lexsort((right_idx, left_idx))
+    return left_idx[pair_order], right_idx[pair_order]
+
+
+@instrument
+def merge_financials_ratings(financials, ratings6, backend="pandas"):
     common_gvkeys = set(financials["gvkey"]).intersection(set(ratings6["gvkey"]))
     financials2 = financials[financials["gvkey"].isin(common_gvkeys)].copy()
     ratings7 = ratings6[ratings6["gvkey"].isin(common_gvkeys)].copy()
@@ -353,19 +599,7 @@ def merge_financials_ratings(financials, ratings6):
     ratings7.loc[ratings7["ratingenddate"] > "2100-12-31", "ratingenddate"] = pd.Timestamp(
         "2100-12-31"
     )
-    merged_df = financials2.merge(ratings7, how="left", on="gvkey")
-    merged_df["datadate"] = pd.to_datetime(merged_df["datadate"], errors="coerce")
-    merged_df["ratingdate"] = pd.to_datetime(merged_df["ratingdate"], errors="coerce")
-    merged_df["ratingenddate"] = pd.to_datetime(merged_df["ratingenddate"], errors="coerce")
-    merged_df = merged_df[
-        (merged_df["ratingdate"].notna())
-        & (merged_df["ratingenddate"].notna())
-        & (merged_df["ratingdate"] <= merged_df["datadate"])
-        & (merged_df["datadate"] <= merged_df["ratingenddate"])
-    ]
-    merged_df = merged_df.sort_values(by=["gvkey", "datadate"], ascending=[True, True])
-    merged_df.reset_index(drop=True, inplace=True)
-    columns_to_keep = list(financials2.columns) + [
+    rating_columns = [
         "entity_pname",
         "ratingdate",
         "ratingsymbol",
@@ -374,43 +608,71 @@ def merge_financials_ratings(financials, ratings6):
         "ratingenddate",
         "sector",
     ]
+    with instrument_block("interval_join", rows_in=len(financials2)) as event:
+        fin_idx, rating_idx = interval_join(
+            financials2,
+            ratings7,
+            by="gvkey",
+            on="datadate",
+            start="ratingdate",
+            end="ratingenddate",
+            backend=backend,
+        )
+        event["rows_out"] = len(fin_idx)
+    merged_df = pd.concat(
+        [
+            financials2.iloc[fin_idx].reset_index(drop=True),
+            ratings7[rating_columns].iloc[rating_idx].reset_index(drop=True),
+        ],
+        axis=1,
+    )
+    merged_df = merged_df.sort_values(by=["gvkey", "datadate"], ascending=[True, True])
+    merged_df.reset_index(drop=True, inplace=True)
+    columns_to_keep = list(financials2.columns) + rating_columns
     mfinancials_df = merged_df[columns_to_keep]
     mfinancials_df = override_by_exact_fyear(mfinancials_df, ratings6)
 
     return mfinancials_df
 
 
-def compute_default_dates(mfinancials_df):
-    default_date_df = mfinancials_df.filter(["gvkey", "ratingsymbol", "ratingdate"]).copy()
-
-    def find_default_date(row):
-        if row["ratingsymbol"] in ["D", "SD", "R"]:
-            return row["ratingdate"]
-        else:
-            return pd.NaT
-
-    default_date_df["dflt_date"] = default_date_df.apply(find_default_date, axis=1)
-    default_date_df["dflt_date"] = pd.to_datetime(default_date_df["dflt_date"])
-    default_date_df = default_date_df.sort_values(by=["gvkey", "dflt_date"], ascending=[True, True])
-    default_date_df = default_date_df.groupby("gvkey", as_index=False).first()
-    default_date_df["dflt_date"] = default_date_df["dflt_date"].fillna(pd.Timestamp("2100-12-31"))
-    default_date_df = default_date_df.drop(["ratingdate", "ratingsymbol"], axis=1)
-    default_date_df["dflt_date"] = pd.to_datetime(default_date_df["dflt_date"])
+@instrument
+def compute_default_dates(mfinancials_df, backend="pandas"):
+    # First default-type rating per gvkey in one grouped pass; issuers that never default
+    # get 2100-12-31
+    if backend == "duckdb":
+        default_date_df = sql_default_dates(mfinancials_df, DEFAULT_SYMBOLS)
+        default_date_df["dflt_date"] = default_date_df["dflt_date"].fillna(
+            pd.Timestamp("2100-12-31")
+        )
+        return default_date_df
+    ratingdate = pd.to_datetime(mfinancials_df["ratingdate"], errors="coerce")
+    is_default = mfinancials_df["ratingsymbol"].isin(DEFAULT_SYMBOLS)
+    dflt_date = ratingdate.where(is_default).groupby(mfinancials_df["gvkey"], observed=True).min()
+    dflt_date = dflt_date.fillna(pd.Timestamp("2100-12-31"))
+    default_date_df = dflt_date.rename("dflt_date").rename_axis("gvkey").reset_index()
     return default_date_df
 
 
-def merge_default_dates(mfinancials_df, default_date_df):
-    df1 = pd.merge(mfinancials_df, default_date_df, on=["gvkey"], how="left")
-    df2 = df1.copy()
-    df2["dflt_date"] = pd.to_datetime(df2["dflt_date"], errors="coerce")
-    df2["datadate"] = pd.to_datetime(df2["datadate"], errors="coerce")
-    df2["days2dflt"] = (df2["dflt_date"] - df2["datadate"]).dt.days
-    df3 = df2.copy()
-    df3["dflt_flag"] = 0
-    df3.loc[(df3["days2dflt"] >= 90) & (df3["days2dflt"] <= 455), "dflt_flag"] = 1
-    return df3
+@instrument
+def merge_default_dates(mfinancials_df, default_date_df, horizons=None):
+    # Each horizon is a (min_days, max_days) window on days2dflt, inclusive on both ends.
+    # All label columns are derived from the same days2dflt, so several horizons cost one pass.
+    horizons = DEFAULT_HORIZONS if horizons is None else horizons
+    position = pd.Index(default_date_df["gvkey"]).get_indexer(mfinancials_df["gvkey"])
+    # -1 (gvkey without a default date row) picks the trailing NaT
+    dflt_dates = default_date_df["dflt_date"].to_numpy(dtype="datetime64[ns]")
+    dflt_date = np.append(dflt_dates, np.datetime64("NaT", "ns"))[position]
+    df = mfinancials_df.assign(
+        datadate=pd.to_datetime(mfinancials_df["datadate"], errors="coerce"),
+        dflt_date=dflt_date,
+    )
+    df["days2dflt"] = (df["dflt_date"] - df["datadate"]).dt.days
+    for flag, (min_days, max_days) in horizons.items():
+        df[flag] = df["days2dflt"].between(min_days, max_days).astype("int8")
+    return apply_dtypes(df, BASE_DATASET_DTYPES)
 
 
+@instrument
 def clean_dataset(df):
     # Use sector to exclude financial institutions, insurance companies, and real estate firms
     df = df.loc[df["sector"] != "Financials"]
@@ -429,8 +691,9 @@ def check_missing_financials_vs_ratings(ratings6, financials):
     )
 
 
+@instrument
 def override_by_exact_fyear(mfinancials_df, ratings6):
-    defaults = ratings6[ratings6["ratingsymbol"].isin(["D", "SD", "R"])][
+    defaults = ratings6[ratings6["ratingsymbol"].isin(DEFAULT_SYMBOLS)][
         ["gvkey", "ratingdate", "ratingsymbol"]
     ].copy()
     defaults["ratingdate"] = pd.to_datetime(defaults["ratingdate"], errors="coerce")
@@ -459,37 +722,212 @@ def override_by_exact_fyear(mfinancials_df, ratings6):
     return df
 
 
-def main():
-    # Load gvkey and ratings data and merge them
-    gvkey = get_gvkey()
-    ratings = get_ratings()
-    ratings4 = merge_ratings_with_gvkey(gvkey, ratings)
+def build_shard(financials, ratings6, horizons=None, backend="pandas"):
+    # The per-gvkey stages, run on one shard by merge_sharded
+    mfinancials_df = merge_financials_ratings(financials, ratings6, backend)
+    default_date_df = compute_default_dates(mfinancials_df, backend)
+    return merge_default_dates(mfinancials_df, default_date_df, horizons)
+
+
+@instrument
+def merge_sharded(
+    financials, ratings6, horizons=None, n_shards=DEFAULT_SHARDS, n_jobs=None, backend="pandas"
+):
+    # Same result as merge_financials_ratings -> compute_default_dates -> merge_default_dates,
+    # with gvkeys hash-partitioned into n_shards shards on disk that are processed one by one
+    # across a process pool, so their working memory is bounded by the shard size. The shard
+    # outputs are read back from disk as one frame, never all held as separate parts.
+    frames = {"financials": financials, "ratings6": ratings6}
+    all_df = concat_shards(
+        build_shard, frames, "gvkey", n_shards, n_jobs, horizons=horizons, backend=backend
+    )
+    # A shard's gvkey / sector categories only cover that shard, and the union comes back in
+    # shard order; the monolithic stages have the sorted categories that occur
+    all_df = apply_dtypes(all_df, BASE_DATASET_DTYPES)
+    for column in all_df.columns.intersection(["gvkey", "sector"]):
+        values = all_df[column].cat.remove_unused_categories()
+        all_df[column] = values.cat.reorder_categories(sorted(values.cat.categories))
+    # Each shard is sorted by gvkey and datadate, and a gvkey lives in one shard
+    all_df = all_df.sort_values("gvkey", kind="stable", ignore_index=True)
+    return all_df
+
+
+def fetch_with_retries(name, fetch, retries=None, backoff=None):
+    # retries / backoff default to SOURCE_RETRIES / RETRY_BACKOFF at call time
+    retries = SOURCE_RETRIES if retries is None else retries
+    backoff = RETRY_BACKOFF if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return fetch()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            wait = backoff * 2**attempt
+            print(f"Fetching {name} failed ({e}); retrying in {wait}s...")
+            time.sleep(wait)
+
+
+def acquire_extracts(incremental=False, timeout=None, retries=None):
+    # Downloads (or incrementally refreshes) the independent raw extracts concurrently, so a
+    # cold start takes about as long as the slowest one. Only a key column is read back; the
+    # pipeline stages then read what they need from the warm caches.
+    # timeout / retries default to SOURCE_TIMEOUT / SOURCE_RETRIES at call time.
+    timeout = SOURCE_TIMEOUT if timeout is None else timeout
+    wrds_sources = {
+        "gvkey": lambda: get_gvkey(columns=["gvkey"]),
+        "ratings": lambda: get_ratings(columns=["ratingdate"], incremental=incremental),
+        "financials": lambda: get_financials(columns=["gvkey"], incremental=incremental),
+    }
+    http_sources = {
+        "major_groups": lambda: get_or_download_csv("major_groups.parquet", major_groups_url),
+        "divisions": lambda: get_or_download_csv("divisions.parquet", divisions_url),
+    }
+    # A thread-bound shared connection is only used from this thread: its extracts run one
+    # after another here (not bounded by timeout) while the downloads run alongside
+    serial = wrds_sources if wrds_conn_is_thread_bound() else {}
+    sources = {**wrds_sources, **http_sources}
+    pool = ThreadPoolExecutor(max_workers=len(sources) - len(serial))
+    futures = {
+        name: pool.submit(fetch_with_retries, name, fetch, retries)
+        for name, fetch in sources.items()
+        if name not in serial
+    }
+    deadline = time.monotonic() + timeout
+    try:
+        rows = {
+            name: len(fetch_with_retries(name, fetch, retries)) for name, fetch in serial.items()
+        }
+        rows.update(
+            (name, len(future.result(timeout=max(deadline - time.monotonic(), 0))))
+            for name, future in futures.items()
+        )
+    except FuturesTimeoutError:
+        late = [name for name, future in futures.items() if not future.done()]
+        raise TimeoutError(f"Timed out after {timeout}s waiting for {', '.join(late)}")
+    finally:
+        # A source that failed or timed out does not hold up the caller
+        pool.shutdown(wait=False, cancel_futures=True)
+    return rows
+
+
+def load_financials(ratings6):
+    return prepare_financials(gvkeys=ratings6["gvkey"].unique())
+
+
+def pipeline_stages(horizons=None, n_shards=None, backend="pandas"):
+    # The extract loaders are volatile: they always run (reading their caches) and downstream
+    # stages are fingerprinted by the data they return. With n_shards, the per-gvkey stages
+    # run out-of-core as one merge_sharded stage.
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {BACKENDS}")
+    stages = [
+        # Load gvkey and ratings data and merge them
+        stage("gvkey", get_gvkey, volatile=True),
+        stage("ratings", get_ratings, volatile=True),
+        stage(
+            "ratings4",
+            merge_ratings_with_gvkey,
+            inputs=["gvkey", "ratings"],
+            params={"backend": backend},
+        ),
+        # Process sector information and prepare ratings
+        stage("info_3", get_sector_info, inputs=["ratings4"], volatile=True),
+        stage("ratings6", prepare_ratings, inputs=["info_3", "ratings4"]),
+        # Load financials and merge with ratings
+        stage("financials", load_financials, inputs=["ratings6"], volatile=True),
+    ]
+    if n_shards:
+        stages.append(
+            stage(
+                "all_df",
+                merge_sharded,
+                inputs=["financials", "ratings6"],
+                params={"horizons": horizons, "n_shards": n_shards, "backend": backend},
+            )
+        )
+        return stages
+    return stages + [
+        stage(
+            "mfinancials_df",
+            merge_financials_ratings,
+            inputs=["financials", "ratings6"],
+            params={"backend": backend},
+        ),
+        # Compute default dates and merge default flags
+        stage(
+            "default_date_df",
+            compute_default_dates,
+            inputs=["mfinancials_df"],
+            params={"backend": backend},
+        ),
+        stage(
+            "all_df",
+            merge_default_dates,
+            inputs=["mfinancials_df", "default_date_df"],
+            params={"horizons": horizons},
+        ),
+    ]
 
-    # Process sector information and prepare ratings
-    info_3 = get_sector_info(ratings4)
-    ratings6 = prepare_ratings(info_3, ratings4)
 
-    # Load financials and merge with ratings
-    financials = prepare_financials()
+def main(
+    incremental=False, horizons=None, path="base_dataset.pkl", n_shards=None, backend="pandas"
+):
+    # Fetch (or refresh) the raw extracts concurrently, then build from the warm caches
+    acquire_extracts(incremental=incremental)
+
+    # Stages are rerun only when their code, parameters or upstream data changed; with a
+    # thread-bound connection they run one at a time on this thread
+    outputs = run_pipeline(
+        pipeline_stages(horizons, n_shards, backend),
+        targets=["all_df"],
+        max_workers=1 if wrds_conn_is_thread_bound() else 4,
+    )
+    # Only the connections main opened itself are closed
+    close_wrds_conn(shared=False)
 
     # Check missing gvkeys in financials vs. ratings
     # check_missing_financials_vs_ratings(ratings6, financials)
 
-    mfinancials_df = merge_financials_ratings(financials, ratings6)
-    close_wrds_conn()
-
-    # Compute default dates and merge default flags
-    default_date_df = compute_default_dates(mfinancials_df)
-    all_df = merge_default_dates(mfinancials_df, default_date_df)
-
     # clean data
     # final_df = clean_dataset(all_df)
-    final_df = all_df
+    final_df = outputs["all_df"]
 
     print(final_df.describe())
-    final_df.to_pickle("base_dataset.pkl")
-    print("Data saved to base_dataset.pkl")
+    print(memory_report(final_df))
+    final_df.to_pickle(path)
+    print(f"Data saved to {path}")
+    return final_df
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build base_dataset.pkl from WRDS extracts")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="refresh cached ratings and financials from their high-water marks",
+    )
+    parser.add_argument(
+        "--local-wrds",
+        metavar="PATH",
+        help="read the WRDS tables from a local stand-in created by local_wrds.py",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        metavar="N",
+        help="run the per-gvkey merge and default stages out-of-core in N shards",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="pandas",
+        help="engine for the joins and aggregations (duckdb needs the duckdb package)",
+    )
+    args = parser.parse_args()
+    if args.local_wrds:
+        from local_wrds import LocalWRDS, seed_reference_caches
+
+        set_wrds_conn(LocalWRDS(args.local_wrds))
+        seed_reference_caches()
+    main(incremental=args.incremental, n_shards=args.shards, backend=args.backend)
+    close_wrds_conn()
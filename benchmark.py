@@ -0,0 +1,243 @@
+# Description: End-to-end benchmark of the pipeline on synthetic data from local_wrds.py.
+#
+# For each scale, every stage (base dataset build: monolithic, sharded and on DuckDB when
+# installed; get_final_dataframe, calculate_auc, each evaluate_* model from model_1.py and
+# model_1.MODEL_SPECS through model_harness) is run in a fresh working directory and timed.
+# The SIC reference caches are seeded from local_wrds, so the run needs no network. The
+# sharded and DuckDB builds are checked to reproduce the monolithic one exactly, and a model
+# whose AUC is undefined (a test split with one class) fails the run. Each stage records wall
+# time, CPU time, peak RSS (sampled while it runs) and rows in/out. Results are saved as
+# JSON and compared with a stored baseline; a stage that got slower or bigger than the
+# regression threshold makes the run exit with status 1.
+#
+# Usage: python benchmark.py --scales 0.1 0.5 1 --baseline bench_baseline.json
+
+import argparse
+import json
+import math
+import os
+import platform
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import base_dataset4 as bd
+import dataset_loader
+import financial_factors4 as ff4
+import model_1
+import model_harness
+import sql_backend
+from instrumentation import rss_bytes
+from local_wrds import LocalWRDS, seed_reference_caches
+from pipeline import data_fingerprint
+
+DEFAULT_SCALES = [0.1, 0.5, 1.0]
+
+# Relative increase over the baseline that counts as a regression, per metric
+THRESHOLDS = {"wall_s": 0.2, "cpu_s": 0.2, "peak_rss_mb": 0.1}
+# Increases smaller than this are noise, whatever the relative change
+NOISE_FLOOR = {"wall_s": 0.05, "cpu_s": 0.05, "peak_rss_mb": 16.0}
+
+RSS_SAMPLE_INTERVAL = 0.01
+
+# Shards for the out-of-core base dataset build
+SHARDS = 4
+
+MODELS = {
+    "evaluate_single_var_model[Tobin_Q]": lambda df: model_1.evaluate_single_var_model(
+        df, "Tobin_Q"
+    ),
+    "evaluate_single_var_model[Altman_Z]": lambda df: model_1.evaluate_single_var_model(
+        df, "Altman_Z"
+    ),
+    "evaluate_multivariate_model[Combined]": lambda df: model_1.evaluate_multivariate_model(
+        df, ["Tobin_Q", "Altman_Z"], model_label="Combined Model"
+    ),
+    "evaluate_multivariate_model[Ours]": lambda df: model_1.evaluate_multivariate_model(
+        df, ff4.target_vars, model_label="Our Model"
+    ),
+    "evaluate_l1_model": lambda df: model_1.evaluate_l1_model(df, ff4.target_vars),
+}
+
+
+@contextmanager
+def measure(stages, name, rows_in=None):
+    # Records the stage under stages[name]; the caller fills in record["rows_out"]
+    record = {"rows_in": rows_in, "rows_out": None}
+    peak = [rss_bytes()]
+    stop = threading.Event()
+
+    def sample():
+        while not stop.wait(RSS_SAMPLE_INTERVAL):
+            peak[0] = max(peak[0], rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = time.perf_counter() - wall
+        record["cpu_s"] = time.process_time() - cpu
+        stop.set()
+        sampler.join()
+        record["peak_rss_mb"] = max(peak[0], rss_bytes()) / 2**20
+        stages[name] = record
+        print(f"[{name}] {record['wall_s']:.2f}s wall, {record['peak_rss_mb']:.0f} MB peak")
+
+
+def check_auc(name, auc_score):
+    # A NaN AUC means the stage timed a degenerate fit, so its timings are meaningless
+    if not math.isfinite(auc_score):
+        raise RuntimeError(f"{name}: AUC is undefined; the test split has a single class")
+    return float(auc_score)
+
+
+@contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def run_scale(scale, seed=0):
+    stages = {}
+    with tempfile.TemporaryDirectory() as workdir, working_directory(workdir):
+        with measure(stages, "generate_data") as record:
+            local = LocalWRDS()
+            rows = local.populate(scale, seed)
+            record["rows_out"] = sum(rows.values())
+        bd.set_wrds_conn(local)
+        seed_reference_caches()
+
+        raw_rows = rows["comp.funda"] + rows["ciq_ratings.wrds_erating"]
+        with measure(stages, "base_dataset", rows_in=raw_rows) as record:
+            base = bd.main(path="base_dataset.pkl")
+            record["rows_out"] = len(base)
+
+        with measure(stages, "base_dataset_sharded", rows_in=raw_rows) as record:
+            sharded = bd.main(path="base_dataset_sharded.pkl", n_shards=SHARDS)
+            record["rows_out"] = len(sharded)
+            # The out-of-core path must reproduce the monolithic dataset exactly
+            record["identical"] = data_fingerprint(sharded) == data_fingerprint(base)
+            if not record["identical"]:
+                print("WARNING: sharded base dataset differs from the monolithic one")
+        del sharded
+
+        if sql_backend.duckdb is not None:
+            with measure(stages, "base_dataset_duckdb", rows_in=raw_rows) as record:
+                duckdb_df = bd.main(path="base_dataset_duckdb.pkl", backend="duckdb")
+                record["rows_out"] = len(duckdb_df)
+                record["identical"] = data_fingerprint(duckdb_df) == data_fingerprint(base)
+                if not record["identical"]:
+                    print("WARNING: duckdb base dataset differs from the pandas one")
+            del duckdb_df
+
+        with measure(stages, "get_final_dataframe", rows_in=len(base)) as record:
+            df = ff4.get_final_dataframe()
+            record["rows_out"] = len(df)
+
+        with measure(stages, "calculate_auc", rows_in=len(df)) as record:
+            record["rows_out"] = len(ff4.calculate_auc(df))
+
+        for name, evaluate in MODELS.items():
+            with measure(stages, name, rows_in=len(df)) as record:
+                auc_score, fpr, _ = evaluate(df)
+                record["rows_out"] = len(fpr)
+                record["auc"] = check_auc(name, auc_score)
+
+        with measure(stages, "evaluate_models", rows_in=len(df)) as record:
+            results = model_harness.evaluate_models(df, model_1.MODEL_SPECS)
+            record["rows_out"] = len(results)
+            record["auc"] = {
+                result["label"]: check_auc(result["label"], result["auc"]) for result in results
+            }
+
+        # Drop the memory-mapped dataset before its directory is removed
+        del base, df
+        dataset_loader.LOADED.clear()
+        bd.close_wrds_conn()
+    return stages
+
+
+def run_benchmarks(scales=DEFAULT_SCALES, seed=0):
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "seed": seed,
+        "scales": {},
+    }
+    for scale in scales:
+        print(f"=== scale {scale:g} ===")
+        results["scales"][f"{scale:g}"] = run_scale(scale, seed)
+    return results
+
+
+def compare_results(results, baseline, thresholds=THRESHOLDS):
+    # Returns one message per (scale, stage, metric) that regressed against the baseline
+    regressions = []
+    for scale, stages in results["scales"].items():
+        for name, record in stages.items():
+            previous = baseline.get("scales", {}).get(scale, {}).get(name)
+            if previous is None:
+                continue
+            for metric, threshold in thresholds.items():
+                old, new = previous.get(metric), record.get(metric)
+                if old is None or new is None:
+                    continue
+                if new > old * (1 + threshold) and new - old > NOISE_FLOOR[metric]:
+                    regressions.append(
+                        f"scale {scale} {name}: {metric} {old:.2f} -> {new:.2f} "
+                        f"(+{(new / old - 1) * 100 if old else float('inf'):.0f}%, "
+                        f"threshold {threshold * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data")
+    parser.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="compare with this results file")
+    parser.add_argument(
+        "--threshold", type=float, help="relative regression threshold for every metric"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="also write the results to --baseline"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        thresholds = THRESHOLDS
+        if args.threshold is not None:
+            thresholds = dict.fromkeys(THRESHOLDS, args.threshold)
+        regressions = compare_results(results, baseline, thresholds)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
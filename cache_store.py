@@ -0,0 +1,200 @@
+# Description: Shared on-disk cache for the raw WRDS / GitHub extracts used by base_dataset4.py.
+#
+# Extracts are stored as Parquet so a caller can read back only the columns it needs
+# (column projection) and skip whole row groups that cannot match a filter
+# (e.g. [("gvkey", "in", gvkeys)] or [("fyear", ">=", 2000)]). Filters use the pyarrow
+# format: a list of (column, op, value) tuples that are AND-ed, or a list of such lists
+# that are OR-ed. Files ending in .pkl are still understood so old caches keep working.
+#
+# Incremental refreshes keep per-table high-water marks (e.g. max ratingdate) in a small
+# JSON file next to the cache and replace only the refreshed window of rows.
+
+import json
+import os
+import pickle
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+ROW_GROUP_SIZE = 100_000
+
+
+def is_parquet(filename):
+    return filename.endswith(".parquet")
+
+
+def legacy_pickle(filename):
+    # Pickle cache written before the Parquet store existed, e.g. financials_data.pkl
+    return os.path.splitext(filename)[0] + ".pkl"
+
+
+def require_pyarrow():
+    if pq is None:
+        raise ImportError("pyarrow is required for Parquet caches: pip install pyarrow")
+
+
+def cache_exists(filename):
+    if os.path.exists(filename):
+        return True
+    # Migrate a legacy pickle cache instead of downloading everything again
+    if is_parquet(filename) and os.path.exists(legacy_pickle(filename)):
+        print(f"Converting {legacy_pickle(filename)} to {filename}...")
+        write_cache(pd.read_pickle(legacy_pickle(filename)), filename)
+        return True
+    return False
+
+
+def write_cache(df, filename, sort_by=None, row_group_size=ROW_GROUP_SIZE):
+    # Written under a temporary name and renamed, so a crash or Ctrl-C during the write (e.g.
+    # of an incremental refresh) leaves the previous cache intact
+    if sort_by is not None:
+        # Sorting on the usual filter keys keeps row-group min/max statistics tight
+        df = df.sort_values(sort_by, kind="stable")
+    partial = filename + ".tmp"
+    try:
+        if is_parquet(filename):
+            require_pyarrow()
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            pq.write_table(table, partial, row_group_size=row_group_size)
+        else:
+            with open(partial, "wb") as f:
+                pickle.dump(df.reset_index(drop=True), f)
+        os.replace(partial, filename)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    print(f"Data saved to {filename}")
+
+
+def write_chunks(chunks, filename):
+    # Streams DataFrame chunks to the cache so only one chunk is held in memory at a time.
+    # Each chunk becomes its own row group(s); all chunks must share the first chunk's schema.
+    # The file is written under a temporary name, so a failed fetch never leaves a partial
+    # cache behind that a retry would then mistake for a complete one.
+    rows = 0
+    partial = filename + ".tmp"
+    try:
+        if is_parquet(filename):
+            require_pyarrow()
+            writer = None
+            try:
+                for chunk in chunks:
+                    if writer is None:
+                        table = pa.Table.from_pandas(chunk, preserve_index=False)
+                        writer = pq.ParquetWriter(partial, table.schema)
+                    else:
+                        table = pa.Table.from_pandas(
+                            chunk, schema=writer.schema, preserve_index=False
+                        )
+                    writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+                    rows += len(chunk)
+            finally:
+                if writer is not None:
+                    writer.close()
+            if writer is None:
+                raise ValueError(f"No data to write to {filename}")
+        else:
+            frames = list(chunks)
+            rows = sum(len(chunk) for chunk in frames)
+            with open(partial, "wb") as f:
+                pickle.dump(pd.concat(frames, ignore_index=True), f)
+        os.replace(partial, filename)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    print(f"Data saved to {filename} ({rows} rows)")
+    return rows
+
+
+def read_cache(filename, columns=None, filters=None):
+    print(f"Loading data from {filename}...")
+    if is_parquet(filename):
+        require_pyarrow()
+        table = pq.read_table(filename, columns=columns, filters=filters)
+        return table.to_pandas()
+    with open(filename, "rb") as f:
+        df = pickle.load(f)
+    df = filter_frame(df, filters)
+    if columns is not None:
+        df = df[columns]
+    return df
+
+
+def filter_frame(df, filters):
+    # In-memory equivalent of the pyarrow filters, for pickle caches
+    if not filters:
+        return df
+    if isinstance(filters[0], tuple):
+        filters = [filters]
+    keep = pd.Series(False, index=df.index)
+    for conjunction in filters:
+        mask = pd.Series(True, index=df.index)
+        for column, op, value in conjunction:
+            values = df[column]
+            if op in ("=", "=="):
+                mask &= values == value
+            elif op == "!=":
+                mask &= values != value
+            elif op == "<":
+                mask &= values < value
+            elif op == "<=":
+                mask &= values <= value
+            elif op == ">":
+                mask &= values > value
+            elif op == ">=":
+                mask &= values >= value
+            elif op == "in":
+                mask &= values.isin(value)
+            elif op == "not in":
+                mask &= ~values.isin(value)
+            else:
+                raise ValueError(f"Unsupported filter operator: {op}")
+        keep |= mask
+    return df.loc[keep]
+
+
+def watermarks_path(filename):
+    return os.path.splitext(filename)[0] + ".watermarks.json"
+
+
+def read_watermarks(filename):
+    path = watermarks_path(filename)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_watermarks(filename, **marks):
+    # Called once the refreshed cache has replaced the old one, so a failed refresh leaves
+    # the previous marks; the marks file itself is replaced atomically too
+    watermarks = read_watermarks(filename)
+    watermarks.update({name: str(value) for name, value in marks.items()})
+    path = watermarks_path(filename)
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def upsert_cache(new_rows, filename, column, since, sort_by=None, keys=None):
+    # Rows with column >= since were fetched again, so they replace the cached window as a
+    # whole: new rows are added, restated rows are updated and withdrawn rows disappear.
+    # keys ({column: values}) limits the window to the rows that were refetched, e.g. the
+    # gvkeys of a partial refresh, so other rows in the window are kept. The cache is only
+    # replaced once the merged frame is fully written; the caller then moves the watermarks.
+    existing = read_cache(filename)
+    if pd.api.types.is_numeric_dtype(existing[column]):
+        stale = existing[column] >= since
+    else:
+        stale = pd.to_datetime(existing[column], errors="coerce") >= pd.Timestamp(since)
+    for key, values in (keys or {}).items():
+        stale &= existing[key].isin(values)
+    kept = existing.loc[~stale]
+    print(f"Replacing {stale.sum()} cached rows with {len(new_rows)} refreshed rows")
+    write_cache(pd.concat([kept, new_rows], ignore_index=True), filename, sort_by=sort_by)
@@ -0,0 +1,101 @@
+# Description: Shared loader for base_dataset.pkl used by financial_factors4.py and description.py.
+#
+# The dataset is built in-process with base_dataset4.main() when it is missing, under a file
+# lock so concurrent processes do not build it twice. The first load also writes an Arrow IPC
+# copy (base_dataset.arrow) that later loads memory-map instead of unpickling. Each process
+# keeps one cached frame; callers get a shallow copy, so adding or replacing columns is
+# private to the caller, but values must not be modified in place.
+
+import os
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+BASE_DATASET = "base_dataset.pkl"
+
+# {absolute path: (modification time of the pickle, DataFrame)}
+LOADED = {}
+LOADED_LOCK = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    # Exclusive lock on path (created if missing) across processes
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def arrow_path(path):
+    return os.path.splitext(path)[0] + ".arrow"
+
+
+def build_base_dataset(path):
+    print(f"{path} not found. Building it with base_dataset4.main()...")
+    import base_dataset4
+
+    base_dataset4.main(path=path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found after running base_dataset4.main()")
+
+
+def write_arrow(df, path):
+    # Written under a temporary name and renamed, so a reader never maps a partial file
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(path + ".tmp", path)
+
+
+def read_dataset(path):
+    arrow = arrow_path(path)
+    fresh = os.path.exists(arrow) and os.path.getmtime(arrow) >= os.path.getmtime(path)
+    if pa is not None and fresh:
+        print(f"Loading data from {arrow}...")
+        # The map stays open as long as the frame's buffers reference it
+        table = pa.ipc.open_file(pa.memory_map(arrow)).read_all()
+        return table.to_pandas(split_blocks=True)
+    print(f"Loading data from {path}...")
+    df = pd.read_pickle(path)
+    if pa is not None:
+        try:
+            write_arrow(df, arrow)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+            print(f"Keeping {path} as pickle only: {e}")
+    return df
+
+
+def load_base_dataset(path=BASE_DATASET):
+    path = os.path.abspath(path)
+    with LOADED_LOCK:
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = LOADED.get(path)
+        if cached is None or cached[0] != mtime:
+            with file_lock(path + ".lock"):
+                if not os.path.exists(path):
+                    build_base_dataset(path)
+                df = read_dataset(path)
+            LOADED[path] = (os.path.getmtime(path), df)
+        return LOADED[path][1].copy(deep=False)
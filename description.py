@@ -1,55 +1,27 @@
-import os
-import pickle
 import financial_factors4 as ff4
-
-
-def get_base_dataset():
-    # Check if base_dataset.pkl exists
-    if os.path.exists("base_dataset.pkl"):
-        print("Loading data from base_dataset.pkl...")
-        with open("base_dataset.pkl", "rb") as f:
-            data = pickle.load(f)
-        return data
-    else:
-        # Run base_dataset3.py to create base_dataset.pkl
-        print("base_dataset.pkl not found. Running base_dataset3.py...")
-        os.system("python base_dataset3.py")
-        if os.path.exists("base_dataset.pkl"):
-            with open("base_dataset.pkl", "rb") as f:
-                data = pickle.load(f)
-            return data
-        else:
-            raise FileNotFoundError("base_dataset.pkl not found after running base_dataset3.py")
-
-
-def clean_dataset(df):
-    # Use sector to exclude financial institutions, insurance companies, and real estate firms
-    # print("Original dataset:", len(df))
-    df = df.loc[df["sector"] != "Financials"]
-    # print("After removing Financials:", len(df))
-    # Use days2dflt to exclude future information
-    df = df.loc[df["days2dflt"] >= 90]
-    # print("After filtering days2dflt >= 90:", len(df))
-    return df
-
+from analytics_session import AnalyticsSession
+from instrumentation import instrument
 
 # Description of Dataset
 
 
 # Table 1: Sample Data Information
 # A table shows PERIOD FIRMS DEFAULTS STATEMENTS
-def sample_data_info():
-    df = get_base_dataset()
+def sample_data_info(session=None):
+    session = session or AnalyticsSession()
+    df = session.frame("base")
     # print(df.head())
     # print(df.describe())
+    return df
 
 
 # Figure 1: Distribution of Statements and Defaults by Year
 
 
-def statements_defaults_by_year():
-    df = get_base_dataset()
-    df = clean_dataset(df)
+@instrument
+def statements_defaults_by_year(session=None):
+    session = session or AnalyticsSession()
+    df = session.frame("cleaned")
     df["year"] = df["fyear"].astype(int)
 
     # Group by year: count total firms and sum defaults
@@ -59,14 +31,6 @@ def statements_defaults_by_year():
         .reset_index()
     )
 
-    summary["default_rate"] = summary["total_defaults"] / summary["total_firms"]
-
-    summary = (
-        df.groupby("year")
-        .agg(total_firms=("dflt_flag", "count"), total_defaults=("dflt_flag", "sum"))
-        .reset_index()
-    )
-
     # shift defaults and default_rate by one year
     summary["defaults_year"] = summary["year"] + 1
     summary["default_rate"] = summary["total_defaults"] / summary["total_firms"]
@@ -80,8 +44,8 @@ def statements_defaults_by_year():
 import matplotlib.pyplot as plt
 
 
-def plot_statements_and_defaults_dual_axis():
-    summary = statements_defaults_by_year()
+def plot_statements_and_defaults_dual_axis(session=None):
+    summary = statements_defaults_by_year(session)
 
     fig, ax1 = plt.subplots(figsize=(10, 6))
 
@@ -107,12 +71,13 @@ def plot_statements_and_defaults_dual_axis():
     plt.show()
 
 
-def statements_defaults_by_industry():
-    df = get_base_dataset()
-    df = clean_dataset(df)
+@instrument
+def statements_defaults_by_industry(session=None):
+    session = session or AnalyticsSession()
+    df = session.frame("cleaned")
 
     summary = (
-        df.groupby("sector")
+        df.groupby("sector", observed=True)
         .agg(
             total_firms=("gvkey", lambda x: x.nunique()),
             total_defaults=("dflt_flag", "sum"),
@@ -126,8 +91,8 @@ def statements_defaults_by_industry():
     return summary
 
 
-def plot_statements_defaults_by_industry():
-    summary = statements_defaults_by_industry()
+def plot_statements_defaults_by_industry(session=None):
+    summary = statements_defaults_by_industry(session)
 
     fig, ax1 = plt.subplots(figsize=(12, 6))
 
@@ -169,14 +134,16 @@ def plot_statements_defaults_by_industry():
 
 
 def main():
+    # One session for the whole report: the base dataset is loaded and cleaned once
+    session = AnalyticsSession()
     # table 1
-    sample_data_info()
+    sample_data_info(session)
     # figure 1
     # plot_statements_defaults()
-    plot_statements_and_defaults_dual_axis()
+    plot_statements_and_defaults_dual_axis(session)
     # figure 2
-    plot_statements_defaults_by_industry()
-    df = ff4.get_final_dataframe()
+    plot_statements_defaults_by_industry(session)
+    df = session.frame("final")
     ff4.calculate_auc(df)
 
 
@@ -0,0 +1,133 @@
+# Description: Declarative registry of the financial ratios built by financial_factors4.py.
+#
+# Each feature is an expression over Compustat columns and other features, e.g.
+# "DBTAT": "TDEBT / at". Inputs and dependencies are read from the expression itself.
+# evaluate_features computes only the requested features plus what they depend on,
+# evaluates each distinct expression once on the underlying numpy arrays, and gives
+# identical expressions (CASHTA and CHAT) the same result.
+
+import ast
+from functools import cache
+
+import numpy as np
+import pandas as pd
+
+# Functions available inside feature expressions
+FUNCTIONS = {
+    # log of non-positive values is missing rather than -inf / NaN with a warning
+    "log": lambda x: np.log(np.where(x > 0, x, np.nan)),
+    "where": np.where,
+    "notna": pd.notna,
+}
+
+FEATURES = {
+    # Current Assets / Current Liabilities
+    "ACTLCT": "act / lct",
+    # Accounts Payable / Sales
+    "APSALE": "ap / sale",
+    # Cash / Total Assets
+    "CASHTA": "che / at",
+    # Cash / Total Assets (duplicate for compatibility)
+    "CHAT": "che / at",
+    # Cash / Current Liabilities
+    "CHLCT": "che / lct",
+    # EBIT / Total Assets
+    "EBITAT": "ebit / at",
+    # EBIT / Sales
+    "EBITSALE": "ebit / sale",
+    # (Short-term Debt + 0.5 × Long-term Debt) / Total Assets
+    "FAT": "(dlc + 0.5 * dltt) / at",
+    # Operating Cash Flow / Total Liabilities
+    "FFOLT": "oancf / lt",
+    # Inventory / Sales
+    "INVTSALES": "invt / sale",
+    # Current Liabilities / Total Liabilities
+    "LCTLT": "lct / lt",
+    # log(Total Assets)
+    "LOGAT": "log(at)",
+    # log(Sales)
+    "LOGSALE": "log(sale)",
+    # Net Income / Total Assets
+    "NIAT": "ni / at",
+    # Net Income / (Market Cap + Total Liabilities)
+    "NIMTA": "ni / (prcc_f * csho + lt)",
+    # Net Income / Sales
+    "NISALE": "ni / sale",
+    # Total Debt = Short-term + Long-term Debt
+    "TDEBT": "dlc + dltt",
+    # Market Capitalization = Price × Shares Outstanding
+    "MKVAL": "prcc_f * csho",
+    # Total Liabilities / Total Assets
+    "LBTAT": "lt / at",
+    # Total Debt / Total Assets
+    "DBTAT": "TDEBT / at",
+    # Total Debt / (Total Debt + Market Cap or Equity)
+    "DBTMKTEQ": "where(notna(MKVAL), TDEBT / (TDEBT + MKVAL), TDEBT / (TDEBT + ceq))",
+    # Total Liabilities / (Total Liabilities + Market Cap or Equity)
+    "LBTMKTEQ": "where(notna(MKVAL), lt / (lt + MKVAL), TDEBT / (TDEBT + ceq))",
+}
+
+
+def register_feature(name, expression):
+    # New features may use any Compustat column, registered feature or FUNCTIONS entry
+    parse_feature(expression)
+    FEATURES[name] = expression
+
+
+@cache
+def parse_feature(expression):
+    # Returns (compiled code, canonical form, referenced names); the canonical form ignores
+    # whitespace and redundant parentheses, so equal expressions are detected as duplicates
+    tree = ast.parse(expression, mode="eval")
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    return compile(tree, expression, "eval"), ast.dump(tree), frozenset(names - set(FUNCTIONS))
+
+
+def resolve_features(names):
+    # Requested features and their feature dependencies, dependencies first
+    order = []
+
+    def visit(name, path):
+        if name in order:
+            return
+        if name in path:
+            raise ValueError(f"Circular feature dependency: {' -> '.join(path + (name,))}")
+        if name not in FEATURES:
+            raise KeyError(f"Unknown feature: {name}")
+        for dependency in sorted(parse_feature(FEATURES[name])[2] & FEATURES.keys()):
+            visit(dependency, path + (name,))
+        order.append(name)
+
+    for name in names:
+        visit(name, ())
+    return order
+
+
+def column_values(series):
+    # Nullable extension dtypes become plain float arrays with NaN for missing values
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        return series.to_numpy(dtype="float64", na_value=np.nan)
+    return series.to_numpy()
+
+
+def feature_inputs(names):
+    # Compustat columns the requested features read, directly or through dependencies
+    order = resolve_features(names)
+    return sorted(
+        set().union(*(parse_feature(FEATURES[name])[2] for name in order)) - FEATURES.keys()
+    )
+
+
+def evaluate_features(df, names):
+    # Returns {feature: numpy array} for the requested names, in the requested order
+    order = resolve_features(names)
+    namespace = {column: column_values(df[column]) for column in feature_inputs(names)}
+
+    results = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name in order:
+            code, canonical, _ = parse_feature(FEATURES[name])
+            if canonical not in results:
+                results[canonical] = eval(code, {"__builtins__": {}, **FUNCTIONS}, namespace)
+            namespace[name] = results[canonical]
+    return {name: namespace[name] for name in names}
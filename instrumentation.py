@@ -0,0 +1,134 @@
+# Description: Instrumentation hooks for the pipeline stages in base_dataset4.py,
+# financial_factors4.py and description.py.
+#
+# @instrument wraps a stage function and instrument_block wraps a few lines inside one (e.g.
+# a dropna). Each records duration, rows in/out, RSS delta and the NaNs left in the output
+# frame, and sends the event (a dict) to every registered sink. A sink is any callable
+# taking an event: add_sink(events.append) collects events in memory, and
+# add_sink(json_lines_sink("events.jsonl")) appends them to a file. Setting PIPELINE_EVENTS
+# to a path does the latter at import. With no sink registered the hooks only check an
+# empty list, so instrumentation costs nothing when disabled.
+
+import functools
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SINKS = []
+
+
+def add_sink(sink):
+    SINKS.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    SINKS.remove(sink)
+
+
+def json_lines_sink(path):
+    lock = threading.Lock()
+
+    def write(event):
+        with lock, open(path, "a") as f:
+            f.write(json.dumps(event, default=str) + "\n")
+
+    return write
+
+
+def rss_bytes():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # Lifetime peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if platform.system() == "Darwin" else peak * 1024
+    return 0
+
+
+def count_rows(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return len(obj)
+    return None
+
+
+def nan_counts(obj):
+    # {column: NaN count} for the columns of a frame that have any
+    if not isinstance(obj, pd.DataFrame):
+        return None
+    counts = obj.isna().sum()
+    return {str(column): int(count) for column, count in counts[counts > 0].items()}
+
+
+def emit(event):
+    # A snapshot, so a sink may remove itself while handling the event
+    for sink in SINKS.copy():
+        sink(event)
+
+
+@contextmanager
+def instrument_block(name, rows_in=None):
+    # Yields the event; set event["rows_out"] (or event["output"] to a frame, which is
+    # replaced by its row and NaN counts) before the block ends
+    if not SINKS:
+        yield {}
+        return
+    event = {"stage": name, "rows_in": rows_in, "rows_out": None, "error": None}
+    event["started"] = time.time()
+    rss = rss_bytes()
+    start = time.perf_counter()
+    try:
+        yield event
+    except BaseException as e:
+        event["error"] = repr(e)
+        raise
+    finally:
+        event["duration_s"] = time.perf_counter() - start
+        event["memory_delta_mb"] = (rss_bytes() - rss) / 2**20
+        if "output" in event:
+            output = event.pop("output")
+            event["rows_out"] = count_rows(output)
+            event["nan_counts"] = nan_counts(output)
+        emit(event)
+
+
+def instrument(func):
+    # Rows in are the rows of every DataFrame/Series argument; rows out and NaN counts come
+    # from the return value
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not SINKS:
+            return func(*args, **kwargs)
+        inputs = [count_rows(arg) for arg in list(args) + list(kwargs.values())]
+        inputs = [rows for rows in inputs if rows is not None]
+        with instrument_block(func.__name__, sum(inputs) if inputs else None) as event:
+            event["module"] = func.__module__
+            result = func(*args, **kwargs)
+            event["output"] = result
+        return result
+
+    return wrapper
+
+
+if os.environ.get("PIPELINE_EVENTS"):
+    add_sink(json_lines_sink(os.environ["PIPELINE_EVENTS"]))
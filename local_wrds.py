@@ -0,0 +1,623 @@
+# Description: Local stand-in for WRDS with a synthetic data generator, so the pipeline in
+# base_dataset4.py can run, be benchmarked and be regression-tested offline.
+#
+# The tables the pipeline queries (ciq.wrds_gvkey, ciq_ratings.wrds_erating, comp.company and
+# comp.funda) live in SQLite databases attached under the WRDS schema names, so the
+# extractors' SQL runs unchanged. LocalWRDS exposes the raw_sql interface of
+# wrds.Connection; install it with base_dataset4.set_wrds_conn(LocalWRDS(path)). The SIC
+# division / major group reference tables the pipeline otherwise downloads from GitHub ship
+# here too; seed_reference_caches writes them to the working directory's cache.
+#
+# generate_wrds_data produces issuers with Compustat statements, GICS / SIC codes and
+# Capital IQ rating histories, including defaults that are preceded by deteriorating
+# financials. A defaulter keeps filing through its default year and defaults 90-364 days
+# after its previous fiscal year end, so that statement falls in the default window of
+# base_dataset4.DEFAULT_HORIZONS. scale=1 is roughly today's rated universe; generation and
+# loading run in batches of issuers, so scale=100 only needs memory for one batch.
+#
+# Usage: python local_wrds.py synthetic_wrds --scale 10
+
+import argparse
+import os
+import sqlite3
+import threading
+import uuid
+from urllib.request import pathname2url
+
+import numpy as np
+import pandas as pd
+
+from cache_store import cache_exists, write_cache
+
+SCHEMAS = ["ciq", "ciq_ratings", "comp"]
+
+TABLES = {
+    "ciq.wrds_gvkey": {
+        "gvkey": "TEXT",
+        "companyid": "INTEGER",
+        "startdate": "TEXT",
+        "enddate": "TEXT",
+    },
+    "ciq_ratings.wrds_erating": {
+        "company_id": "INTEGER",
+        "entity_pname": "TEXT",
+        "ratingdate": "TEXT",
+        "ratingsymbol": "TEXT",
+        "ratingactionword": "TEXT",
+        "unsol": "TEXT",
+        "longtermflag": "INTEGER",
+        "ratingtypename": "TEXT",
+    },
+    "comp.company": {
+        "gvkey": "TEXT",
+        "conm": "TEXT",
+        "fic": "TEXT",
+        "gsector": "TEXT",
+        "ggroup": "TEXT",
+        "gind": "TEXT",
+        "idbflag": "TEXT",
+        "incorp": "TEXT",
+        "loc": "TEXT",
+        "naics": "TEXT",
+        "sic": "TEXT",
+        "state": "TEXT",
+    },
+    "comp.funda": {
+        "gvkey": "TEXT",
+        "datadate": "TEXT",
+        "fyear": "INTEGER",
+        "fyr": "INTEGER",
+        "indfmt": "TEXT",
+        "datafmt": "TEXT",
+        "popsrc": "TEXT",
+        "consol": "TEXT",
+        **{
+            field: "REAL"
+            for field in [
+                "at",
+                "lt",
+                "ceq",
+                "act",
+                "lct",
+                "invt",
+                "rect",
+                "ap",
+                "dlc",
+                "dltt",
+                "dltis",
+                "dvt",
+                "che",
+                "xint",
+                "xrd",
+                "xsga",
+                "oibdp",
+                "ebit",
+                "sale",
+                "cogs",
+                "ni",
+                "oancf",
+                "fincf",
+                "csho",
+                "prcc_f",
+            ]
+        },
+    },
+}
+
+# Returned as datetime.date objects (None when missing), like wrds.Connection.raw_sql does
+DATE_COLUMNS = ["startdate", "enddate", "ratingdate", "datadate"]
+
+# Issuers generated per unit of scale, and how many of them carry ratings / default
+ISSUERS_PER_SCALE = 12_000
+RATED_SHARE = 0.4
+LINKED_SHARE = 0.75
+DEFAULT_RATE = 0.08
+RATING_ACTIONS_MEAN = 5
+BATCH_ISSUERS = 10_000
+FIRST_YEAR = 1985
+LAST_YEAR = 2024
+MISSING_RATE = 0.03
+# Days from a defaulter's last fiscal year end before its default to the default rating
+DEFAULT_LAG_DAYS = (90, 365)
+
+# Grades AAA .. C of base_dataset4.RATING_SYMBOLS; defaults use D or SD
+GRADES = [
+    "AAA",
+    "AA+",
+    "AA",
+    "AA-",
+    "A+",
+    "A",
+    "A-",
+    "BBB+",
+    "BBB",
+    "BBB-",
+    "BB+",
+    "BB",
+    "BB-",
+    "B+",
+    "B",
+    "B-",
+    "CCC+",
+    "CCC",
+    "CCC-",
+    "CC",
+    "C",
+]
+
+GICS_GROUPS = {
+    "10": ["1010"],
+    "15": ["1510"],
+    "20": ["2010", "2020", "2030"],
+    "25": ["2510", "2520", "2530", "2550"],
+    "30": ["3010", "3020", "3030"],
+    "35": ["3510", "3520"],
+    "40": ["4010", "4020", "4030"],
+    "45": ["4510", "4520", "4530"],
+    "50": ["5010", "5020"],
+    "55": ["5510"],
+    "60": ["6010"],
+}
+ALL_GGROUPS = [group for groups in GICS_GROUPS.values() for group in groups]
+
+# SIC divisions and two-digit major groups (1987 SIC manual), in the layout of the
+# divisions.csv / major-groups.csv files base_dataset4 downloads from GitHub
+SIC_DIVISIONS = {
+    "A": "Agriculture, Forestry, And Fishing",
+    "B": "Mining",
+    "C": "Construction",
+    "D": "Manufacturing",
+    "E": "Transportation, Communications, Electric, Gas, And Sanitary Services",
+    "F": "Wholesale Trade",
+    "G": "Retail Trade",
+    "H": "Finance, Insurance, And Real Estate",
+    "I": "Services",
+    "J": "Public Administration",
+    "K": "Nonclassifiable Establishments",
+}
+SIC_MAJOR_GROUPS = {
+    1: ("A", "Agricultural Production Crops"),
+    2: ("A", "Agriculture Production Livestock And Animal Specialties"),
+    7: ("A", "Agricultural Services"),
+    8: ("A", "Forestry"),
+    9: ("A", "Fishing, Hunting, And Trapping"),
+    10: ("B", "Metal Mining"),
+    12: ("B", "Coal Mining"),
+    13: ("B", "Oil And Gas Extraction"),
+    14: ("B", "Mining And Quarrying Of Nonmetallic Minerals, Except Fuels"),
+    15: ("C", "Building Construction General Contractors And Operative Builders"),
+    16: ("C", "Heavy Construction Other Than Building Construction Contractors"),
+    17: ("C", "Construction Special Trade Contractors"),
+    20: ("D", "Food And Kindred Products"),
+    21: ("D", "Tobacco Products"),
+    22: ("D", "Textile Mill Products"),
+    23: ("D", "Apparel And Other Finished Products Made From Fabrics And Similar Materials"),
+    24: ("D", "Lumber And Wood Products, Except Furniture"),
+    25: ("D", "Furniture And Fixtures"),
+    26: ("D", "Paper And Allied Products"),
+    27: ("D", "Printing, Publishing, And Allied Industries"),
+    28: ("D", "Chemicals And Allied Products"),
+    29: ("D", "Petroleum Refining And Related Industries"),
+    30: ("D", "Rubber And Miscellaneous Plastics Products"),
+    31: ("D", "Leather And Leather Products"),
+    32: ("D", "Stone, Clay, Glass, And Concrete Products"),
+    33: ("D", "Primary Metal Industries"),
+    34: ("D", "Fabricated Metal Products, Except Machinery And Transportation Equipment"),
+    35: ("D", "Industrial And Commercial Machinery And Computer Equipment"),
+    36: ("D", "Electronic And Other Electrical Equipment And Components"),
+    37: ("D", "Transportation Equipment"),
+    38: ("D", "Measuring, Analyzing, And Controlling Instruments"),
+    39: ("D", "Miscellaneous Manufacturing Industries"),
+    40: ("E", "Railroad Transportation"),
+    41: ("E", "Local And Suburban Transit And Interurban Highway Passenger Transportation"),
+    42: ("E", "Motor Freight Transportation And Warehousing"),
+    43: ("E", "United States Postal Service"),
+    44: ("E", "Water Transportation"),
+    45: ("E", "Transportation By Air"),
+    46: ("E", "Pipelines, Except Natural Gas"),
+    47: ("E", "Transportation Services"),
+    48: ("E", "Communications"),
+    49: ("E", "Electric, Gas, And Sanitary Services"),
+    50: ("F", "Wholesale Trade-durable Goods"),
+    51: ("F", "Wholesale Trade-non-durable Goods"),
+    52: ("G", "Building Materials, Hardware, Garden Supply, And Mobile Home Dealers"),
+    53: ("G", "General Merchandise Stores"),
+    54: ("G", "Food Stores"),
+    55: ("G", "Automotive Dealers And Gasoline Service Stations"),
+    56: ("G", "Apparel And Accessory Stores"),
+    57: ("G", "Home Furniture, Furnishings, And Equipment Stores"),
+    58: ("G", "Eating And Drinking Places"),
+    59: ("G", "Miscellaneous Retail"),
+    60: ("H", "Depository Institutions"),
+    61: ("H", "Non-depository Credit Institutions"),
+    62: ("H", "Security And Commodity Brokers, Dealers, Exchanges, And Services"),
+    63: ("H", "Insurance Carriers"),
+    64: ("H", "Insurance Agents, Brokers, And Service"),
+    65: ("H", "Real Estate"),
+    67: ("H", "Holding And Other Investment Offices"),
+    70: ("I", "Hotels, Rooming Houses, Camps, And Other Lodging Places"),
+    72: ("I", "Personal Services"),
+    73: ("I", "Business Services"),
+    75: ("I", "Automotive Repair, Services, And Parking"),
+    76: ("I", "Miscellaneous Repair Services"),
+    78: ("I", "Motion Pictures"),
+    79: ("I", "Amusement And Recreation Services"),
+    80: ("I", "Health Services"),
+    81: ("I", "Legal Services"),
+    82: ("I", "Educational Services"),
+    83: ("I", "Social Services"),
+    84: ("I", "Museums, Art Galleries, And Botanical And Zoological Gardens"),
+    86: ("I", "Membership Organizations"),
+    87: ("I", "Engineering, Accounting, Research, Management, And Related Services"),
+    88: ("I", "Private Households"),
+    89: ("I", "Services, Not Elsewhere Classified"),
+    91: ("J", "Executive, Legislative, And General Government, Except Finance"),
+    92: ("J", "Justice, Public Order, And Safety"),
+    93: ("J", "Public Finance, Taxation, And Monetary Policy"),
+    94: ("J", "Administration Of Human Resource Programs"),
+    95: ("J", "Administration Of Environmental Quality And Housing Programs"),
+    96: ("J", "Administration Of Economic Programs"),
+    97: ("J", "National Security And International Affairs"),
+    99: ("K", "Nonclassifiable Establishments"),
+}
+
+
+def date_strings(days):
+    # Days since 1970-01-01 -> ISO date strings
+    return np.datetime_as_string(np.asarray(days, dtype="datetime64[D]"))
+
+
+def fiscal_year_end(fyear, fyr):
+    # datadate of a fiscal year ending in month fyr; fyear is the calendar year of datadate
+    # for fiscal years ending in June or later
+    month = ((fyear + (fyr < 6) - 1970) * 12 + fyr - 1).astype("datetime64[M]")
+    return (month + 1).astype("datetime64[D]") - 1
+
+
+def generate_issuers(first, n, rng):
+    ids = np.arange(first, first + n)
+    rated = rng.random(n) < RATED_SHARE
+    first_year = rng.integers(FIRST_YEAR, LAST_YEAR - 4, n)
+    last_year = np.minimum(first_year + rng.integers(3, 40, n), LAST_YEAR)
+    # Every issuer files for at least three years, so a default year can always be drawn
+    defaulted = rated & (rng.random(n) < DEFAULT_RATE)
+    default_year = np.where(defaulted, rng.integers(first_year + 2, last_year + 1), 0)
+    # Defaulters file through their default year and default 90-364 days after the previous
+    # fiscal year end, before the default year's statement
+    fyr = rng.choice([12, 12, 12, 6, 9, 3], n)
+    default_day = fiscal_year_end(np.maximum(default_year, 1971) - 1, fyr).astype(
+        np.int64
+    ) + rng.integers(*DEFAULT_LAG_DAYS, n)
+    last_year = np.where(defaulted, default_year, last_year)
+    return pd.DataFrame(
+        {
+            "gvkey": [f"{i + 1000:06d}" for i in ids],
+            "companyid": ids + 100_000,
+            "conm": [f"SYNTHETIC ISSUER {i} INC" for i in ids],
+            "rated": rated,
+            "linked": rated | (rng.random(n) < LINKED_SHARE),
+            "first_year": first_year,
+            "last_year": last_year,
+            "defaulted": defaulted,
+            "default_year": default_year,
+            "default_day": default_day,
+            "size": rng.normal(6.0, 1.5, n),
+            "leverage": rng.beta(2.0, 3.0, n),
+            "fyr": fyr,
+        }
+    )
+
+
+def generate_gvkey(issuers):
+    linked = issuers[issuers["linked"]]
+    return pd.DataFrame(
+        {
+            "gvkey": linked["gvkey"],
+            "companyid": linked["companyid"],
+            "startdate": "1980-01-01",
+            "enddate": None,
+        }
+    )
+
+
+def generate_company(issuers, rng):
+    n = len(issuers)
+    ggroup = rng.choice(ALL_GGROUPS, n).astype(object)
+    # Some issuers have no GICS code and are classified from their SIC division
+    ggroup[rng.random(n) < 0.1] = None
+    gsector = np.array([g[:2] if g else None for g in ggroup], dtype=object)
+    gind = np.array([g + f"{i % 5 + 1:02d}" if g else None for i, g in enumerate(ggroup)])
+    sic = rng.integers(100, 9999, n)
+    return pd.DataFrame(
+        {
+            "gvkey": issuers["gvkey"].to_numpy(),
+            "conm": issuers["conm"].to_numpy(),
+            "fic": "USA",
+            "gsector": gsector,
+            "ggroup": ggroup,
+            "gind": gind,
+            "idbflag": "D",
+            "incorp": "DE",
+            "loc": "USA",
+            "naics": [str(code) for code in rng.integers(110000, 930000, n)],
+            "sic": [f"{code:04d}" for code in sic],
+            "state": rng.choice(["NY", "CA", "TX", "IL", "NJ", "OH", "GA", "MA"], n),
+        }
+    )
+
+
+def generate_funda(issuers, rng):
+    years = (issuers["last_year"] - issuers["first_year"] + 1).clip(lower=0).to_numpy()
+    issuer = np.repeat(np.arange(len(issuers)), years)
+    starts = np.repeat(np.cumsum(years) - years, years)
+    fyear = issuers["first_year"].to_numpy()[issuer] + (np.arange(len(issuer)) - starts)
+    n = len(issuer)
+
+    def pick(column):
+        return issuers[column].to_numpy()[issuer]
+
+    def uniform(low, high):
+        return rng.uniform(low, high, n)
+
+    # Statements approach distress in the years before a default
+    years_left = np.where(pick("defaulted"), pick("default_year") - fyear, np.inf)
+    distress = np.exp(-np.maximum(years_left - 1, 0) / 1.5)
+
+    fyr = pick("fyr")
+    datadate = fiscal_year_end(fyear, fyr)
+
+    at = np.exp(pick("size") + 0.03 * (fyear - pick("first_year")) + rng.normal(0, 0.1, n))
+    lt = at * np.clip(pick("leverage") + 0.4 * distress + rng.normal(0, 0.05, n), 0.05, 1.5)
+    act = at * uniform(0.2, 0.6)
+    lct = lt * uniform(0.2, 0.6)
+    sale = at * uniform(0.3, 1.5) * (1 - 0.3 * distress)
+    cogs = sale * uniform(0.4, 0.85)
+    xsga = sale * uniform(0.05, 0.2)
+    oibdp = sale - cogs - xsga - 0.2 * distress * at
+    ebit = oibdp - at * uniform(0.02, 0.06)
+    dltt = lt * uniform(0.2, 0.7)
+    xint = dltt * uniform(0.03, 0.09)
+    ni = (ebit - xint) * 0.75
+    csho = at / uniform(5, 50)
+    ceq = at - lt
+    funda = pd.DataFrame(
+        {
+            "gvkey": pick("gvkey"),
+            "datadate": np.datetime_as_string(datadate),
+            "fyear": fyear,
+            "fyr": fyr,
+            "indfmt": "INDL",
+            "datafmt": "STD",
+            "popsrc": "D",
+            "consol": "C",
+            "at": at,
+            "lt": lt,
+            "ceq": ceq,
+            "act": act,
+            "lct": lct,
+            "invt": act * uniform(0.0, 0.4),
+            "rect": act * uniform(0.1, 0.5),
+            "ap": lct * uniform(0.2, 0.6),
+            "dlc": lct * uniform(0.05, 0.4),
+            "dltt": dltt,
+            "dltis": dltt * uniform(0.0, 0.3),
+            "dvt": np.maximum(ni, 0) * uniform(0.0, 0.5),
+            "che": act * uniform(0.05, 0.4) * (1 - 0.6 * distress),
+            "xint": xint,
+            "xrd": np.where(rng.random(n) < 0.5, np.nan, sale * uniform(0.0, 0.1)),
+            "xsga": xsga,
+            "oibdp": oibdp,
+            "ebit": ebit,
+            "sale": sale,
+            "cogs": cogs,
+            "ni": ni,
+            "oancf": ni + at * uniform(0.02, 0.06),
+            "fincf": at * rng.normal(0, 0.03, n),
+            "csho": csho,
+            "prcc_f": np.maximum(
+                np.abs(ceq) / csho * uniform(0.8, 3.0) * (1 - 0.8 * distress), 0.05
+            ),
+        }
+    )
+    numeric = list(TABLES["comp.funda"])[8:]
+    missing = rng.random((n, len(numeric))) < MISSING_RATE
+    funda[numeric] = funda[numeric].mask(missing)
+    # Summary-format duplicates that the extract query has to filter out
+    summary = funda.sample(frac=0.05, random_state=rng).assign(datafmt="SUMM_STD")
+    return pd.concat([funda, summary], ignore_index=True)
+
+
+def generate_ratings(issuers, rng):
+    rated = issuers[issuers["rated"]].reset_index(drop=True)
+    actions = 1 + rng.poisson(RATING_ACTIONS_MEAN, len(rated))
+    issuer = np.repeat(np.arange(len(rated)), actions)
+    n = len(issuer)
+
+    def pick(column):
+        return rated[column].to_numpy()[issuer]
+
+    first_day = (pick("first_year") - 1970).astype("datetime64[Y]").astype("datetime64[D]")
+    last_day = (pick("last_year") + 1 - 1970).astype("datetime64[Y]").astype("datetime64[D]") - 1
+    first_day = first_day.astype(np.int64)
+    last_day = np.where(pick("defaulted"), pick("default_day") - 1, last_day.astype(np.int64))
+    day = first_day + (rng.random(n) * np.maximum(last_day - first_day, 1)).astype(np.int64)
+    order = np.lexsort((day, issuer))
+    day = day[order]
+
+    # Grades follow a random walk from an initial rating; defaulters drift down
+    step = rng.choice([-1, 0, 1], n, p=[0.2, 0.55, 0.25]) + pick("defaulted") * rng.integers(
+        0, 2, n
+    )
+    start = np.cumsum(actions) - actions
+    first = np.zeros(n, dtype=bool)
+    first[start] = True
+    step[first] = 0
+    grade = np.clip(
+        rng.integers(2, 16, len(rated))[issuer] + pd.Series(step).groupby(issuer).cumsum(),
+        0,
+        len(GRADES) - 1,
+    ).to_numpy()
+    symbol = np.array(GRADES, dtype=object)[grade]
+    action = np.where(step > 0, "Downgrade", np.where(step < 0, "Upgrade", "Affirmed"))
+    action = np.where(first, "New Rating", action).astype(object)
+
+    ratings = pd.DataFrame(
+        {
+            "company_id": pick("companyid"),
+            "entity_pname": pd.Series(pick("conm")).str.title().to_numpy(),
+            "ratingdate": date_strings(day),
+            "ratingsymbol": symbol,
+            "ratingactionword": action,
+            "unsol": "N",
+        }
+    )
+    defaulters = rated[rated["defaulted"]]
+    defaults = pd.DataFrame(
+        {
+            "company_id": defaulters["companyid"].to_numpy(),
+            "entity_pname": defaulters["conm"].str.title().to_numpy(),
+            "ratingdate": date_strings(defaulters["default_day"].to_numpy()),
+            "ratingsymbol": rng.choice(["D", "SD"], len(defaulters), p=[0.7, 0.3]),
+            "ratingactionword": "Downgrade",
+            "unsol": "N",
+        }
+    )
+    ratings = pd.concat([ratings, defaults], ignore_index=True)
+    ratings["longtermflag"] = 1
+    ratings["ratingtypename"] = "Local Currency LT"
+    # Foreign-currency ratings that the extract query has to filter out
+    foreign = ratings.sample(frac=0.1, random_state=rng)
+    foreign = foreign.assign(ratingtypename="Foreign Currency LT")
+    return pd.concat([ratings, foreign], ignore_index=True)
+
+
+def generate_wrds_data(scale=1.0, seed=0, batch_issuers=BATCH_ISSUERS):
+    # Yields {table: DataFrame} for one batch of issuers at a time
+    rng = np.random.default_rng(seed)
+    total = max(round(ISSUERS_PER_SCALE * scale), 1)
+    for first in range(0, total, batch_issuers):
+        issuers = generate_issuers(first, min(batch_issuers, total - first), rng)
+        yield {
+            "ciq.wrds_gvkey": generate_gvkey(issuers),
+            "ciq_ratings.wrds_erating": generate_ratings(issuers, rng),
+            "comp.company": generate_company(issuers, rng),
+            "comp.funda": generate_funda(issuers, rng),
+        }
+
+
+class LocalWRDS:
+    # SQLite databases named like the WRDS schemas, with the raw_sql interface of
+    # wrds.Connection. Each thread gets its own SQLite connection.
+
+    def __init__(self, path=None):
+        # path: directory holding ciq.db, ciq_ratings.db and comp.db; None keeps them in
+        # shared in-memory databases that live as long as this object
+        self.path = path
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.token = uuid.uuid4().hex
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.create_tables()
+
+    def database_uri(self, schema):
+        if self.path is None:
+            return f"file:{self.token}_{schema}?mode=memory&cache=shared"
+        return "file:" + pathname2url(os.path.abspath(os.path.join(self.path, f"{schema}.db")))
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect("file::memory:", uri=True, check_same_thread=False)
+            for schema in SCHEMAS:
+                conn.execute(f"ATTACH DATABASE ? AS {schema}", (self.database_uri(schema),))
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def create_tables(self):
+        conn = self.connection()
+        for table, columns in TABLES.items():
+            definition = ", ".join(f'"{column}" {kind}' for column, kind in columns.items())
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definition})")
+        conn.commit()
+
+    def insert(self, table, df):
+        columns = list(TABLES[table])
+        rows = df[columns].astype(object).where(df[columns].notna(), None)
+        placeholders = ", ".join("?" for _ in columns)
+        names = ", ".join(f'"{column}"' for column in columns)
+        conn = self.connection()
+        conn.executemany(
+            f"INSERT INTO {table} ({names}) VALUES ({placeholders})",
+            rows.itertuples(index=False, name=None),
+        )
+        conn.commit()
+
+    def populate(self, scale=1.0, seed=0, batch_issuers=BATCH_ISSUERS):
+        rows = dict.fromkeys(TABLES, 0)
+        for batch in generate_wrds_data(scale, seed, batch_issuers):
+            for table, df in batch.items():
+                self.insert(table, df)
+                rows[table] += len(df)
+        for table, count in rows.items():
+            print(f"{table}: {count} synthetic rows")
+        return rows
+
+    def raw_sql(self, sql, chunksize=500000, return_iter=False, date_cols=None):
+        conn = self.connection()
+        if return_iter:
+            return (as_dates(chunk) for chunk in pd.read_sql_query(sql, conn, chunksize=chunksize))
+        return as_dates(pd.read_sql_query(sql, conn))
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+        self.local = threading.local()
+
+
+def as_dates(df):
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            values = pd.to_datetime(df[column], errors="coerce")
+            df[column] = np.where(values.notna(), values.dt.date, None)
+    return df
+
+
+def sic_reference_tables():
+    # {cache file: DataFrame} for the major_groups / divisions caches of get_sector_info
+    major_groups = pd.DataFrame(
+        [(division, code, name) for code, (division, name) in SIC_MAJOR_GROUPS.items()],
+        columns=["Division", "Major Group", "Description"],
+    )
+    divisions = pd.DataFrame(list(SIC_DIVISIONS.items()), columns=["Division", "Description"])
+    return {"major_groups.parquet": major_groups, "divisions.parquet": divisions}
+
+
+def seed_reference_caches():
+    # Writes the SIC reference caches to the working directory, so the pipeline does not
+    # download them; existing caches are kept
+    for filename, df in sic_reference_tables().items():
+        if not cache_exists(filename):
+            write_cache(df, filename)
+
+
+def create_local_wrds(path=None, scale=1.0, seed=0):
+    # Returns a LocalWRDS filled with synthetic data; pass a path for scales that should
+    # not be held in memory
+    local = LocalWRDS(path)
+    local.populate(scale, seed)
+    return local
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic local WRDS stand-in")
+    parser.add_argument("path", help="directory for ciq.db, ciq_ratings.db and comp.db")
+    parser.add_argument("--scale", type=float, default=1.0, help="1 is about today's size")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    create_local_wrds(args.path, args.scale, args.seed).close()
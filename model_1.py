@@ -12,6 +12,19 @@ from sklearn.metrics import (
     roc_curve,
 )
 import matplotlib.pyplot as plt
+import model_registry
+from model_harness import model_spec, results_frame
+from regularization_path import l1_path
+from walk_forward import walk_forward, walk_forward_frame
+
+# The models compared by main(); add specs here to compare more per run
+MODEL_SPECS = [
+    model_spec("Tobin_Q", ["Tobin_Q"]),
+    model_spec("Altman_Z", ["Altman_Z"]),
+    model_spec("Combined (All)", ["Tobin_Q", "Altman_Z"], max_iter=1000),
+    model_spec("Our Model", ff4.target_vars, max_iter=1000),
+    model_spec("L1-Penalized", ff4.target_vars, penalty="l1", solver="liblinear", max_iter=1000),
+]
 
 
 def evaluate_single_var_model(df, var, target="dflt_flag"):
@@ -84,6 +97,24 @@ def evaluate_l1_model(df, feature_cols, target="dflt_flag"):
     return auc_score, fpr, tpr
 
 
+def evaluate_l1_path(df, feature_cols, target="dflt_flag"):
+    # Cross-validated AUC and selected features over the whole L1 path, to choose the penalty
+    result = l1_path(df, feature_cols, target)
+    path = result["path"]
+
+    print("\nL1 Regularization Path (5-fold CV)")
+    print(
+        path[["auc_mean", "auc_std", "n_selected", "converged"]].to_string(
+            float_format="{:.4g}".format
+        )
+    )
+    best = path.loc[result["best_C"]]
+    print(f"Best C: {result['best_C']:.4g} (CV AUC {best['auc_mean']:.4f})")
+    print(f"Selected features ({best['n_selected']} / {len(feature_cols)}): {best['selected']}")
+
+    return result
+
+
 def plot_roc_curves(roc_data):
     plt.figure(figsize=(6, 4))
     for label, (fpr, tpr, auc_val) in roc_data.items():
@@ -99,36 +130,33 @@ def plot_roc_curves(roc_data):
     plt.show()
 
 
-def main():
-    df = ff4.get_final_dataframe()
-
-    auc_tobin, fpr_tobin, tpr_tobin = evaluate_single_var_model(df, "Tobin_Q")
-    auc_altman, fpr_altman, tpr_altman = evaluate_single_var_model(df, "Altman_Z")
+def backtest(df=None):
+    # Out-of-time AUC of MODEL_SPECS: train on fyear <= t, score t + 1, roll forward
+    df = ff4.get_final_dataframe() if df is None else df
+    results = walk_forward(df, MODEL_SPECS)
+    by_year = walk_forward_frame(results)["auc"].unstack("model")
+    print("\nOut-of-time AUC by test year:")
+    print(by_year.to_string(float_format="{:.4f}".format))
+    print("\nPooled out-of-time AUC:")
+    for result in results:
+        print(f"{result['label']:<20} {result['pooled_auc']:.4f}")
+    return results
 
-    all_vars = ["Tobin_Q", "Altman_Z"]
-    auc_combo, fpr_combo, tpr_combo = evaluate_multivariate_model(
-        df, all_vars, model_label="Combined Model"
-    )
 
-    auc_ours, fpr_ours, tpr_ours = evaluate_multivariate_model(
-        df, ff4.target_vars, model_label="Our Model"
-    )
+def main():
+    df = ff4.get_final_dataframe()
 
-    auc_l1, fpr_l1, tpr_l1 = evaluate_l1_model(df, ff4.target_vars)
+    # Specs already fitted on this data come from the registry; the rest share one design
+    # matrix and split and are fitted across a process pool
+    results = model_registry.evaluate_models(df, MODEL_SPECS)
 
     print("\nSummary AUCs:")
-    print(f"Model A - Tobin's Q         AUC: {auc_tobin:.4f}")
-    print(f"Model B - Altman Z          AUC: {auc_altman:.4f}")
-    print(f"Model C - Combined All      AUC: {auc_combo:.4f}")
-    print(f"Model D - Our Factors       AUC: {auc_ours:.4f}")
-    print(f"Model E - L1-Regularized    AUC: {auc_l1:.4f}")
+    print(results_frame(results).to_string(float_format="{:.4f}".format))
 
     roc_data = {
-        "Tobin_Q": (fpr_tobin, tpr_tobin, auc_tobin),
-        "Altman_Z": (fpr_altman, tpr_altman, auc_altman),
-        "Combined (All)": (fpr_combo, tpr_combo, auc_combo),
-        "Our Model": (fpr_ours, tpr_ours, auc_ours),
-        "L1-Penalized": (fpr_l1, tpr_l1, auc_l1),
+        result["label"]: (result["fpr"], result["tpr"], result["auc"])
+        for result in results
+        if result["error"] is None
     }
 
     plot_roc_curves(roc_data)
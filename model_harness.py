@@ -0,0 +1,157 @@
+# Description: Parallel evaluation of many logistic regression specifications on one frame, used
+# by model_1.py.
+#
+# The design matrix (every column any spec uses, plus the target) and the train/test split are
+# built once. The matrix is written to shared memory with the training rows first, in the
+# order train_test_split returns them, so each worker attaches to it instead of receiving a
+# pickled copy. A spec only drops the rows missing one of its own features. Results come back
+# as dicts with the AUC, ROC points and coefficients of each spec.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, roc_auc_score, roc_curve
+from sklearn.model_selection import train_test_split
+
+TEST_SIZE = 0.3
+RANDOM_STATE = 42
+
+# The matrix a process fits on and its context: set by attach_shared in workers, directly
+# for n_jobs=1
+SHARED = {}
+
+
+def model_spec(label, features, **params):
+    # params are passed to LogisticRegression, e.g. penalty="l1", solver="liblinear"
+    return {"label": label, "features": list(features), "params": params}
+
+
+def attach_shared(name, shape, columns, context):
+    try:
+        # The parent owns the segment; Python 3.13+ can skip tracking it in the worker too
+        shm = SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = SharedMemory(name=name)
+    matrix = np.ndarray(shape, dtype="float64", buffer=shm.buf)
+    SHARED.update(context, shm=shm, matrix=matrix, columns=columns)
+
+
+def map_shared(func, tasks, matrix, columns, n_jobs=None, **context):
+    # Returns [func(task) for task in tasks], run across a process pool whose workers see
+    # matrix, columns and context in SHARED; the matrix is placed in shared memory once
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(tasks))
+    if n_jobs <= 1 or not matrix.size:
+        SHARED.update(context, matrix=matrix, columns=columns)
+        try:
+            return [func(task) for task in tasks]
+        finally:
+            SHARED.clear()
+
+    shape = matrix.shape
+    shm = SharedMemory(create=True, size=matrix.nbytes)
+    try:
+        np.ndarray(shape, dtype="float64", buffer=shm.buf)[:] = matrix
+        del matrix
+        with ProcessPoolExecutor(
+            max_workers=n_jobs,
+            initializer=attach_shared,
+            initargs=(shm.name, shape, columns, context),
+        ) as pool:
+            return list(pool.map(func, tasks))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def fit_spec(spec):
+    matrix, n_train = SHARED["matrix"], SHARED["n_train"]
+    positions = [SHARED["columns"].index(feature) for feature in spec["features"]]
+    X = matrix[:, positions]
+    y = matrix[:, -1].astype(np.int8)
+    complete = ~np.isnan(X).any(axis=1)
+    train = complete.copy()
+    train[n_train:] = False
+    test = complete.copy()
+    test[:n_train] = False
+
+    result = {
+        "label": spec["label"],
+        "features": spec["features"],
+        "n_train": int(train.sum()),
+        "n_test": int(test.sum()),
+        "error": None,
+    }
+    try:
+        clf = LogisticRegression(**spec["params"])
+        clf.fit(X[train], y[train])
+        y_prob = clf.predict_proba(X[test])[:, 1]
+        fpr, tpr, _ = roc_curve(y[test], y_prob)
+        result.update(
+            auc=roc_auc_score(y[test], y_prob),
+            accuracy=accuracy_score(y[test], clf.predict(X[test])),
+            fpr=fpr,
+            tpr=tpr,
+            coef=dict(zip(spec["features"], clf.coef_[0])),
+            intercept=float(clf.intercept_[0]),
+        )
+    except ValueError as e:
+        # e.g. a single class left after dropping missing rows; the other specs still run
+        result.update(auc=np.nan, accuracy=np.nan, fpr=None, tpr=None, coef=None, intercept=None)
+        result["error"] = str(e)
+    return result
+
+
+def design_matrix(df, columns, target):
+    # Rows with a target, reordered as [training rows, test rows]; the target is the last column
+    data = df.loc[df[target].notna(), columns + [target]]
+    train_rows, test_rows = train_test_split(
+        np.arange(len(data)), test_size=TEST_SIZE, random_state=RANDOM_STATE
+    )
+    order = np.concatenate([train_rows, test_rows])
+    return data.to_numpy(dtype="float64", na_value=np.nan)[order], len(train_rows)
+
+
+def evaluate_models(df, specs, target="dflt_flag", n_jobs=None):
+    # Returns one result dict per spec, in spec order
+    columns = list(dict.fromkeys(feature for spec in specs for feature in spec["features"]))
+    matrix, n_train = design_matrix(df, columns, target)
+    return map_shared(fit_spec, specs, matrix, columns, n_jobs, n_train=n_train)
+
+
+def fit_model(df, spec, target="dflt_flag"):
+    # Fits spec on every row with its features and target; returns the model as plain data
+    # (what scoring_service serves)
+    data = df[spec["features"] + [target]].dropna()
+    clf = LogisticRegression(**spec["params"])
+    clf.fit(data[spec["features"]].to_numpy(dtype="float64"), data[target].to_numpy(np.int8))
+    return {
+        "label": spec["label"],
+        "features": spec["features"],
+        "params": spec["params"],
+        "coef": clf.coef_[0].tolist(),
+        "intercept": float(clf.intercept_[0]),
+        "n_train": len(data),
+    }
+
+
+def results_frame(results):
+    # One row per spec for comparing runs
+    return pd.DataFrame(
+        {
+            "auc": [r["auc"] for r in results],
+            "accuracy": [r["accuracy"] for r in results],
+            "n_features": [len(r["features"]) for r in results],
+            "nonzero": [
+                np.nan if r["coef"] is None else sum(c != 0 for c in r["coef"].values())
+                for r in results
+            ],
+            "n_train": [r["n_train"] for r in results],
+            "n_test": [r["n_test"] for r in results],
+            "error": [r["error"] for r in results],
+        },
+        index=pd.Index([r["label"] for r in results], name="model"),
+    )
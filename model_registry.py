@@ -0,0 +1,126 @@
+# Description: Versioned registry of fitted model_harness models, keyed by training-data and
+# spec fingerprint, used by model_1.py and scoring_service.py.
+#
+# A model's key hashes the data it was trained on (only the spec's features and the target,
+# so unrelated columns can change freely), its features, LogisticRegression parameters and
+# the train/test split. evaluate_models returns the stored result for every (dataset, spec)
+# pair already in the registry and fits only the rest. Each model is a small JSON file
+# holding the model_harness result (coefficients, intercept, AUC, ROC points, row counts)
+# plus its fingerprints, version and creation time, so loading one takes milliseconds.
+# load_model's latest is the highest version, as creation times have one-second resolution.
+# JSON has no NaN, so an undefined AUC (a test split with one class) is stored as null.
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import model_harness
+from pipeline import data_fingerprint
+
+REGISTRY_DIR = ".model_registry"
+
+
+def model_key(df, spec, target="dflt_flag"):
+    # Returns (model key, training-data fingerprint)
+    data = data_fingerprint(df[spec["features"] + [target]])
+    digest = hashlib.sha256(data.encode())
+    digest.update(repr(spec["features"]).encode())
+    digest.update(repr(sorted(spec["params"].items())).encode())
+    digest.update(repr((target, model_harness.TEST_SIZE, model_harness.RANDOM_STATE)).encode())
+    return digest.hexdigest(), data
+
+
+def artifact_path(key, registry_dir=REGISTRY_DIR):
+    return os.path.join(registry_dir, f"{key[:16]}.json")
+
+
+def json_number(value):
+    # Non-finite metrics are stored as null, read back as NaN
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def read_artifact(path):
+    with open(path) as f:
+        artifact = json.load(f)
+    for name in ("auc", "accuracy"):
+        artifact[name] = np.nan if artifact[name] is None else artifact[name]
+    for name in ("fpr", "tpr"):
+        artifact[name] = np.asarray(artifact[name], dtype="float64")
+    return artifact
+
+
+def load_artifact(key, registry_dir=REGISTRY_DIR):
+    path = artifact_path(key, registry_dir)
+    return read_artifact(path) if os.path.exists(path) else None
+
+
+def list_models(registry_dir=REGISTRY_DIR):
+    # One row per registered model, newest first; versions break ties within a second
+    rows = []
+    for path in glob.glob(os.path.join(registry_dir, "*.json")):
+        with open(path) as f:
+            artifact = json.load(f)
+        rows.append({k: artifact[k] for k in ("key", "label", "version", "created", "auc")})
+        rows[-1]["data_fingerprint"] = artifact["data_fingerprint"][:16]
+    columns = ["key", "label", "version", "created", "auc", "data_fingerprint"]
+    models = pd.DataFrame(rows, columns=columns)
+    return models.sort_values(["created", "version"], ascending=False)
+
+
+def save_artifact(result, key, data, registry_dir=REGISTRY_DIR):
+    os.makedirs(registry_dir, exist_ok=True)
+    models = list_models(registry_dir)
+    versions = models.loc[models["label"] == result["label"], "version"]
+    artifact = dict(result)
+    artifact.update(
+        key=key,
+        data_fingerprint=data,
+        version=int(versions.max()) + 1 if len(versions) else 1,
+        created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        auc=json_number(result["auc"]),
+        accuracy=json_number(result["accuracy"]),
+        fpr=[json_number(x) for x in result["fpr"]],
+        tpr=[json_number(x) for x in result["tpr"]],
+        coef={feature: float(c) for feature, c in result["coef"].items()},
+    )
+    # Written under a temporary name so a reader never sees a partial file
+    path = artifact_path(key, registry_dir)
+    with open(path + ".tmp", "w") as f:
+        json.dump(artifact, f, allow_nan=False)
+    os.replace(path + ".tmp", path)
+    return read_artifact(path)
+
+
+def load_model(label, registry_dir=REGISTRY_DIR):
+    # Latest registered version of a model, e.g. for scoring_service.Scorer
+    models = list_models(registry_dir)
+    models = models[models["label"] == label]
+    if models.empty:
+        raise KeyError(f"No model {label!r} in {registry_dir}")
+    return read_artifact(artifact_path(models.loc[models["version"].idxmax(), "key"], registry_dir))
+
+
+def evaluate_models(df, specs, target="dflt_flag", n_jobs=None, registry_dir=REGISTRY_DIR):
+    # model_harness.evaluate_models, fitting only the specs not registered for this data
+    keys = [model_key(df, spec, target) for spec in specs]
+    results = [load_artifact(key, registry_dir) for key, _ in keys]
+    missing = [i for i, result in enumerate(results) if result is None]
+    for spec, result in zip(specs, results):
+        if result is not None:
+            # Identical specs share a model whatever they are called
+            result["label"] = spec["label"]
+            print(f"Model {spec['label']}: loaded version {result['version']} from registry")
+
+    if missing:
+        fitted = model_harness.evaluate_models(df, [specs[i] for i in missing], target, n_jobs)
+        for i, result in zip(missing, fitted):
+            if result["error"] is None:
+                result = save_artifact(result, *keys[i], registry_dir)
+            results[i] = result
+    return results
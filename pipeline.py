@@ -0,0 +1,201 @@
+# Description: Content-addressed stage cache and DAG runner for the base dataset pipeline in
+# base_dataset4.py.
+#
+# A stage is a function plus the names of the stages whose outputs it takes as arguments.
+# Its fingerprint hashes the stage's code (including the project functions and constants it
+# references), its parameters and its inputs' fingerprints, so an output cached under that
+# fingerprint is reused only when nothing upstream changed. Volatile stages (the extract
+# loaders, whose data can change without any code change) always run and are fingerprinted
+# by the content of their output. Stages whose inputs are ready run concurrently.
+
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+import threading
+import types
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+STAGE_CACHE_DIR = ".stage_cache"
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Global values of these types are folded into the code fingerprint of a stage using them
+CONSTANT_TYPES = (str, int, float, bool, tuple, list, dict, set, frozenset)
+
+
+def stage(name, func, inputs=(), params=None, volatile=False):
+    # func is called as func(*outputs of inputs, **params)
+    return {
+        "name": name,
+        "func": func,
+        "inputs": list(inputs),
+        "params": dict(params or {}),
+        "volatile": volatile,
+    }
+
+
+def is_project_function(obj):
+    if not isinstance(obj, types.FunctionType):
+        return False
+    try:
+        source_file = inspect.getsourcefile(obj)
+    except TypeError:
+        return False
+    if source_file is None:
+        return False
+    # A virtualenv inside the project directory is not project code
+    source_file = os.path.abspath(source_file)
+    return source_file.startswith(PROJECT_DIR) and "site-packages" not in source_file
+
+
+def code_objects(code):
+    # A function's code plus the code of its nested functions, lambdas and comprehensions
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from code_objects(const)
+
+
+def code_fingerprint(func):
+    # Source of func and of every project function it (transitively) refers to by global
+    # name, plus the repr of the module-level constants they use
+    parts = []
+    seen = set()
+
+    def visit(obj):
+        # Decorated stages (e.g. @instrument) are fingerprinted by the function they wrap
+        obj = inspect.unwrap(obj)
+        if obj in seen:
+            return
+        seen.add(obj)
+        parts.append(inspect.getsource(obj))
+        for code in code_objects(obj.__code__):
+            for name in code.co_names:
+                value = obj.__globals__.get(name)
+                if is_project_function(value):
+                    visit(value)
+                elif isinstance(value, CONSTANT_TYPES):
+                    parts.append(f"{name} = {value!r}")
+
+    visit(func)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def data_fingerprint(obj):
+    digest = hashlib.sha256()
+    if isinstance(obj, pd.DataFrame):
+        digest.update(repr(list(obj.columns)).encode())
+        digest.update(repr([str(dtype) for dtype in obj.dtypes]).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+    else:
+        digest.update(pickle.dumps(obj))
+    return digest.hexdigest()
+
+
+def stage_fingerprint(stage, input_fingerprints):
+    digest = hashlib.sha256()
+    digest.update(code_fingerprint(stage["func"]).encode())
+    digest.update(repr(sorted(stage["params"].items())).encode())
+    for fingerprint in input_fingerprints:
+        digest.update(fingerprint.encode())
+    return digest.hexdigest()
+
+
+def required_stages(stages, targets):
+    # Names of the targets and all their ancestors, in declaration order
+    required = set()
+
+    def visit(name):
+        if name not in required:
+            required.add(name)
+            for dependency in stages[name]["inputs"]:
+                visit(dependency)
+
+    for target in targets:
+        visit(target)
+    return [name for name in stages if name in required]
+
+
+def run_pipeline(stages, targets=None, cache_dir=STAGE_CACHE_DIR, max_workers=4):
+    # Returns {target: output}. targets defaults to the last stage; cached intermediate
+    # outputs are only loaded when a stage that has to run needs them.
+    stages = {s["name"]: s for s in stages}
+    for s in stages.values():
+        for dependency in s["inputs"]:
+            if dependency not in stages:
+                raise KeyError(f"Stage {s['name']} depends on unknown stage {dependency}")
+    targets = list(stages)[-1:] if targets is None else list(targets)
+    order = required_stages(stages, targets)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    fingerprints = {}
+    outputs = {}
+    locks = {name: threading.Lock() for name in order}
+
+    def cache_path(name):
+        return os.path.join(cache_dir, f"{name}-{fingerprints[name][:16]}.pkl")
+
+    def output(name):
+        with locks[name]:
+            if name not in outputs:
+                with open(cache_path(name), "rb") as f:
+                    outputs[name] = pickle.load(f)
+            return outputs[name]
+
+    def save_output(name, result):
+        # Written under a temporary name so an interrupted run never leaves a truncated cache,
+        # then older fingerprints of the same stage are removed
+        path = cache_path(name)
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        for stale in glob.glob(os.path.join(cache_dir, f"{name}-*.pkl")):
+            if stale != path:
+                os.remove(stale)
+
+    def run_stage(name):
+        s = stages[name]
+        if not s["volatile"]:
+            fingerprints[name] = stage_fingerprint(s, [fingerprints[d] for d in s["inputs"]])
+            if os.path.exists(cache_path(name)):
+                print(f"Stage {name}: up to date ({fingerprints[name][:16]})")
+                return
+        print(f"Stage {name}: running...")
+        result = s["func"](*[output(d) for d in s["inputs"]], **s["params"])
+        with locks[name]:
+            outputs[name] = result
+        if s["volatile"]:
+            fingerprints[name] = data_fingerprint(result)
+        else:
+            save_output(name, result)
+
+    pending = list(order)
+    done = set()
+    running = {}
+    if max_workers == 1:
+        # Serial runs stay on the calling thread (e.g. for a connection bound to it)
+        while pending:
+            ready = [name for name in pending if set(stages[name]["inputs"]) <= done]
+            if not ready:
+                raise ValueError(f"Circular stage dependencies among {pending}")
+            for name in ready:
+                pending.remove(name)
+                run_stage(name)
+                done.add(name)
+        return {name: output(name) for name in targets}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            ready = [name for name in pending if set(stages[name]["inputs"]) <= done]
+            for name in ready:
+                pending.remove(name)
+                running[pool.submit(run_stage, name)] = name
+            if not running:
+                raise ValueError(f"Circular stage dependencies among {pending}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                future.result()
+                done.add(running.pop(future))
+    return {name: output(name) for name in targets}
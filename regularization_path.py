@@ -0,0 +1,197 @@
+# Description: Cross-validated L1 regularization path for the logistic default model, used by
+# model_1.evaluate_l1_path.
+#
+# The path runs over a log grid of C values from the smallest C that selects any feature
+# upwards. Each fit minimizes C times the log loss plus the L1 norm of the coefficients, with
+# the intercept unpenalized, by proximal Newton: it takes Newton steps on a quadratic
+# approximation of the log loss, each solved exactly on the small Gram matrix of the features
+# by feature-sign search, and halves a step that would raise the penalized loss. Along the
+# grid each fit is warm-started from its neighbour's solution and needs only a few Newton
+# steps. sklearn's LogisticRegression(penalty="l1") solves the same problem, but liblinear
+# has no warm starts and penalizes the intercept, and saga needs thousands of epochs on these
+# features and does not converge at large C. The CV folds and the full-data path run in
+# parallel on the shared-memory matrix of model_harness.map_shared. Features are standardized
+# on each fold's training rows, so coefficients are per standard deviation.
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from model_harness import RANDOM_STATE, SHARED, map_shared
+
+N_CS = 20
+# Largest C on the grid, relative to the smallest C that selects any feature
+C_RATIO = 1e4
+N_FOLDS = 5
+# Quadratic approximations per C, and feature-sign steps per approximation
+MAX_ITER = 100
+MAX_STEPS = 1000
+# Largest coefficient change (per standard deviation) that counts as converged, and the
+# relative slack on the optimality conditions of each quadratic approximation
+TOL = 1e-4
+KKT_TOL = 1e-9
+# Lower bound on the Newton weights p * (1 - p). Defaults are rare, so most weights are
+# tiny, and glmnet's 1e-5 would distort the Hessian and slow convergence to a crawl
+MIN_WEIGHT = 1e-10
+
+# Task id of the path fitted on every row
+FULL_DATA = -1
+
+
+def standardize(X, rows):
+    mean = X[rows].mean(axis=0)
+    std = X[rows].std(axis=0)
+    std[std == 0] = 1.0
+    return (X - mean) / std
+
+
+def min_c(X, y):
+    # Smallest C at which a coefficient leaves zero: the L1 penalty must fall below the
+    # largest log-loss gradient at the intercept-only fit
+    return 1.0 / np.abs(X.T @ (y - y.mean())).max()
+
+
+def penalized_loss(A, y, beta, penalty):
+    eta = A @ beta
+    return np.sum(np.logaddexp(0, eta) - y * eta) + penalty @ np.abs(beta)
+
+
+def quadratic(H, g, penalty, beta):
+    return 0.5 * beta @ H @ beta - g @ beta + penalty @ np.abs(beta)
+
+
+def descend(H, g, penalty, beta):
+    # Minimizes 1/2 beta'H beta - g'beta + penalty'|beta| by feature-sign search (Lee et al.
+    # 2006): add the zero coefficient that most violates the optimality conditions, solve
+    # exactly for the active ones with their signs fixed, and keep the best point on the way
+    # there where a coefficient reaches zero. It ends after a few steps, while coordinate
+    # descent crawls when features are correlated.
+    slack = KKT_TOL * (1 + np.abs(g).max())
+    sign = np.sign(beta)
+    for _ in range(MAX_STEPS):
+        gradient = H @ beta - g
+        active = (beta != 0) | (penalty == 0)
+        if np.all(np.abs(gradient[active] + penalty[active] * sign[active]) <= slack):
+            violation = np.where(active, -np.inf, np.abs(gradient) - penalty)
+            j = int(np.argmax(violation))
+            if violation[j] <= slack:
+                break
+            active[j] = True
+            sign[j] = -np.sign(gradient[j])
+        rows = np.flatnonzero(active)
+        target = g[rows] - penalty[rows] * sign[rows]
+        try:
+            solution = np.linalg.solve(H[np.ix_(rows, rows)], target)
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(H[np.ix_(rows, rows)], target, rcond=None)[0]
+        # Candidates: the full step and every point where a coefficient crosses zero
+        current = beta[rows]
+        crossing = np.flatnonzero((current != 0) & (np.sign(solution) != np.sign(current)))
+        zero_at = current[crossing] / (current[crossing] - solution[crossing])
+        best, best_value = beta, np.inf
+        for t in np.append(zero_at, 1.0):
+            candidate = beta.copy()
+            candidate[rows] = current + t * (solution - current)
+            candidate[rows[crossing[zero_at == t]]] = 0.0
+            value = quadratic(H, g, penalty, candidate)
+            if value < best_value:
+                best, best_value = candidate, value
+        beta = best
+        sign = np.sign(beta)
+    return beta
+
+
+def fit_l1(A, y, C, beta):
+    # A: intercept column then features. Returns (beta, iterations, converged), starting
+    # from beta (the previous C's solution)
+    penalty = np.full(len(beta), 1.0 / C)
+    penalty[0] = 0.0
+    loss = penalized_loss(A, y, beta, penalty)
+    for iteration in range(1, MAX_ITER + 1):
+        eta = A @ beta
+        p = expit(eta)
+        w = np.maximum(p * (1 - p), MIN_WEIGHT)
+        H = A.T @ (A * w[:, None])
+        g = A.T @ (w * eta + y - p)
+        new = descend(H, g, penalty, beta.copy())
+        # Halve the step while the penalized loss goes up, so the iteration cannot diverge
+        step = 1.0
+        new_loss = penalized_loss(A, y, new, penalty)
+        while new_loss > loss and step > 1e-3:
+            step /= 2
+            new = beta + step * (new - beta)
+            new_loss = penalized_loss(A, y, new, penalty)
+        change = np.abs(new - beta).max()
+        beta, loss = new, new_loss
+        if change < TOL:
+            return beta, iteration, True
+    return beta, MAX_ITER, False
+
+
+def path_fold(fold):
+    matrix, fold_ids = SHARED["matrix"], SHARED["fold_ids"]
+    y = matrix[:, -1]
+    train = fold_ids != fold
+    test = fold_ids == fold
+    A = np.column_stack([np.ones(len(y)), standardize(matrix[:, :-1], train)])
+    A_train, y_train = A[train], y[train]
+
+    beta = np.zeros(A.shape[1])
+    points = []
+    for C in SHARED["cs"]:
+        beta, n_iter, converged = fit_l1(A_train, y_train, C, beta)
+        point = {
+            "C": C,
+            "coef": beta[1:].copy(),
+            "intercept": beta[0],
+            "n_iter": n_iter,
+            "converged": converged,
+            "auc": np.nan,
+        }
+        if test.any():
+            try:
+                point["auc"] = roc_auc_score(y[test], A[test] @ beta)
+            except ValueError:
+                pass
+        points.append(point)
+    return points
+
+
+def l1_path(df, feature_cols, target="dflt_flag", cs=None, n_folds=N_FOLDS, n_jobs=None):
+    # Returns {"path": one row per C (CV AUC, selected features of the full-data fit),
+    # "coefs": full-data coefficients per C, "best_C": C with the highest mean CV AUC}
+    data = df[feature_cols + [target]].dropna()
+    matrix = data.to_numpy(dtype="float64")
+    y = matrix[:, -1].astype(np.int8)
+    if cs is None:
+        X = standardize(matrix[:, :-1], slice(None))
+        cs = min_c(X, y) * np.logspace(0, np.log10(C_RATIO), N_CS)
+    cs = np.sort(np.asarray(cs, dtype="float64"))
+
+    fold_ids = np.empty(len(y), dtype=np.int8)
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=RANDOM_STATE)
+    for fold, (_, test_rows) in enumerate(folds.split(matrix, y)):
+        fold_ids[test_rows] = fold
+
+    tasks = [FULL_DATA] + list(range(n_folds))
+    paths = map_shared(path_fold, tasks, matrix, feature_cols, n_jobs, fold_ids=fold_ids, cs=cs)
+    full, cv = paths[0], paths[1:]
+
+    auc = np.array([[point["auc"] for point in path] for path in cv])
+    coefs = pd.DataFrame(
+        [point["coef"] for point in full], index=pd.Index(cs, name="C"), columns=feature_cols
+    )
+    path = pd.DataFrame(
+        {
+            "auc_mean": np.nanmean(auc, axis=0),
+            "auc_std": np.nanstd(auc, axis=0),
+            "n_selected": (coefs != 0).sum(axis=1).to_numpy(),
+            "selected": [list(row.index[row != 0]) for _, row in coefs.iterrows()],
+            "n_iter": [point["n_iter"] for point in full],
+            "converged": [point["converged"] for point in full],
+        },
+        index=coefs.index,
+    )
+    return {"path": path, "coefs": coefs, "best_C": float(path["auc_mean"].idxmax())}
@@ -0,0 +1,205 @@
+# Description: Batch scoring of raw Compustat statements with a fitted default model, served
+# over a local HTTP endpoint.
+#
+# A Scorer is built once from a model (model_harness.fit_model saved as JSON, or a
+# model_registry entry). It works out which registry features and which of Tobin's Q /
+# Altman Z the model needs, then scores a batch of raw funda rows with the same transforms as
+# financial_factors4 (impute_data -> build_features -> tobins_q_n_Altman_Z) and one matrix
+# product. Only rows that would enter the training data are scored: finalize_features drops
+# rows with a missing or infinite financial_factors4.target_vars ratio, so such rows get no
+# probability whichever features the model uses. A batch without a raw column the transforms
+# read is rejected up front with the list of missing columns.
+#
+# Usage: python scoring_service.py --train "Our Model" --model model.json
+#        python scoring_service.py --model model.json --port 8000
+#        python scoring_service.py --registered "Our Model"
+#   POST /score    {"columns": [...], "data": [[...], ...]} or a list of row objects
+#                  -> {"model": label, "probabilities": [...]}
+#   GET  /metrics  request count, rows scored, p50 / p99 latency (ms)
+#   GET  /health
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+
+import financial_factors4 as ff4
+import model_registry
+from feature_registry import FEATURES, feature_inputs
+
+# Latencies kept for the percentiles in /metrics
+LATENCY_WINDOW = 10000
+MARKET_FEATURES = ("Tobin_Q", "Altman_Z")
+# Raw columns read by financial_factors4.impute_data and tobins_q_n_Altman_Z
+IMPUTE_COLUMNS = ["act", "lct", "che", "rect", "invt", "ap", "dlc", "xrd"]
+MARKET_COLUMNS = ["datadate", "at", "lt", "ceq", "act", "ebit", "sale", "ni", "prcc_f", "csho"]
+
+
+def save_model(model, path):
+    with open(path, "w") as f:
+        json.dump(model, f, indent=2)
+
+
+def load_model(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class Scorer:
+    def __init__(self, model):
+        self.model = model
+        self.features = list(model["features"])
+        coef = model["coef"]
+        if isinstance(coef, dict):
+            # model_harness results and registry entries map feature -> coefficient
+            coef = [coef[feature] for feature in self.features]
+        self.coef = np.asarray(coef, dtype="float64")
+        self.intercept = float(model["intercept"])
+        # Ratios built from the registry: the model's own plus the target_vars that decide
+        # whether a row would have been in the training data
+        self.registry_features = [f for f in self.features if f in FEATURES]
+        self.ratios = list(dict.fromkeys(ff4.target_vars + self.registry_features))
+        self.needs_market = any(f in MARKET_FEATURES for f in self.features)
+        columns = IMPUTE_COLUMNS + feature_inputs(self.ratios)
+        if self.needs_market:
+            columns += MARKET_COLUMNS
+        self.columns = list(dict.fromkeys(columns))
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.rows = 0
+        self.lock = threading.Lock()
+
+    def transform(self, raw):
+        # Raw funda rows -> (design matrix, rows that can be scored)
+        missing = [column for column in self.columns if column not in raw.columns]
+        if missing:
+            raise ValueError(f"Missing columns for {self.model['label']}: {', '.join(missing)}")
+        df = ff4.impute_data(raw.copy())
+        df = ff4.build_features(df, self.ratios)
+        ratios = df[self.ratios].replace([np.inf, -np.inf], np.nan)
+        complete = ratios.notna().all(axis=1).to_numpy()
+        df[self.ratios] = ratios
+        if self.needs_market:
+            ff4.tobins_q_n_Altman_Z(df)
+        return df[self.features].to_numpy(dtype="float64", na_value=np.nan), complete
+
+    def score(self, raw):
+        # Default probability per row of raw, NaN where it cannot be scored
+        X, complete = self.transform(raw)
+        probabilities = expit(X @ self.coef + self.intercept)
+        probabilities[~complete] = np.nan
+        return probabilities
+
+    def record(self, seconds, rows):
+        with self.lock:
+            self.latencies.append(seconds)
+            self.requests += 1
+            self.rows += rows
+
+    def metrics(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            metrics = {"model": self.model["label"], "requests": self.requests, "rows": self.rows}
+        if len(latencies):
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            metrics.update(p50_ms=p50, p99_ms=p99)
+        return metrics
+
+
+def read_batch(payload):
+    if isinstance(payload, dict):
+        return pd.DataFrame(payload["data"], columns=payload["columns"])
+    return pd.DataFrame.from_records(payload)
+
+
+def make_handler(scorer):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                self.send_json(200, scorer.metrics())
+            elif self.path == "/health":
+                self.send_json(200, {"status": "ok"})
+            else:
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self.send_json(404, {"error": f"Unknown path {self.path}"})
+                return
+            start = time.perf_counter()
+            try:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                batch = read_batch(json.loads(body))
+                probabilities = scorer.score(batch)
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(400, {"error": f"{type(e).__name__}: {e}"})
+                return
+            # JSON has no NaN; rows that cannot be scored are null
+            values = np.where(np.isnan(probabilities), None, probabilities).tolist()
+            scorer.record(time.perf_counter() - start, len(batch))
+            self.send_json(200, {"model": scorer.model["label"], "probabilities": values})
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ScoringHandler
+
+
+def serve(scorer, host="127.0.0.1", port=8000):
+    server = ThreadingHTTPServer((host, port), make_handler(scorer))
+    print(f"Scoring with {scorer.model['label']} on http://{host}:{port}/score")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def train(label, path):
+    import model_1
+    from model_harness import fit_model
+
+    specs = {spec["label"]: spec for spec in model_1.MODEL_SPECS}
+    if label not in specs:
+        raise SystemExit(f"Unknown model {label!r}; expected one of {list(specs)}")
+    model = fit_model(ff4.get_final_dataframe(), specs[label])
+    save_model(model, path)
+    print(f"Saved {label} ({model['n_train']} training rows) to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score raw statements with a default model")
+    parser.add_argument("--model", default="model.json", help="model file to serve or write")
+    parser.add_argument("--train", metavar="LABEL", help="fit this model_1.MODEL_SPECS spec")
+    parser.add_argument(
+        "--registered", metavar="LABEL", help="serve the latest model_registry version"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.train:
+        train(args.train, args.model)
+    elif args.registered:
+        serve(Scorer(model_registry.load_model(args.registered)), args.host, args.port)
+    else:
+        serve(Scorer(load_model(args.model)), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
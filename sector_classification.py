@@ -0,0 +1,153 @@
+# Description: Vectorized sector classification for the issuers in base_dataset4.py.
+#
+# The GICS / SIC rules are compiled once into a lookup table indexed by
+# (raw sector label, SIC major group). Classifying issuers is then a few array lookups
+# instead of row-wise DataFrame.apply passes.
+
+import numpy as np
+import pandas as pd
+
+GICS_SECTORS = {
+    "10": "Energy",
+    "15": "Materials",
+    "20": "Industrials",
+    "25": "Consumer Discretionary",
+    "30": "Consumer Staples",
+    "35": "Health Care",
+    "40": "Financials",
+    "45": "Information Technology",
+    "50": "Communication Services",
+    "55": "Utilities",
+    "60": "Real Estate",
+}
+
+SECTOR_MAPPING = {
+    "Industrials": "Manufacturing",
+    "Health Care": "Health",
+    "Energy": "Utilities",
+    "Information Technology": "Information Technology",
+    "Wholesale Trade": "Wholesale",
+    "Utilities": "Utilities",
+    "Financials": "Financials",
+    "Materials": "Manufacturing",
+    "Transportation, Communications, Electric, Gas, And Sanitary Services": "Transportation, Communications, Electric, Gas, And Sanitary Services",
+    "Communication Services": "Services",
+    "Retail Trade": "Retail",
+    "Manufacturing": "Manufacturing",
+    "Construction": "Construction",
+    "Finance, Insurance, And Real Estate": "Financials",
+    "Services": "Services",
+    "Agriculture, Forestry, And Fishing": "Agriculture",
+    "Public Administration": "Utilities",
+    "Real Estate": "Financials",
+    "Mining": "Manufacturing",
+    "Insurance": "Financials",
+}
+
+# GICS consumer sectors are too broad; these issuers fall back to their SIC division
+CONSUMER_SECTORS = ["Consumer Discretionary", "Consumer Staples"]
+TCEGS = "Transportation, Communications, Electric, Gas, And Sanitary Services"
+TRANSPORTATION_GGROUP = "2030"
+
+# Company-specific sector fixes keyed by conm, applied before the mapping rules
+SECTOR_OVERRIDES = {
+    "ARGO GROUP INTL 6.5 SR NT 42": "Insurance",
+    "HILFIGER (TOMMY) U S A INC": "Manufacturing",
+    "NOVA SCOTIA POWER INC": "Utilities",
+}
+
+MAJOR_GROUP_CODES = pd.Index([f"{code:02d}" for code in range(100)])
+UNKNOWN_MAJOR_GROUP = len(MAJOR_GROUP_CODES)
+
+
+def register_sector_override(conm, sector):
+    # sector is a raw label (e.g. "Insurance"); it still goes through SECTOR_MAPPING
+    SECTOR_OVERRIDES[conm] = sector
+
+
+def resolve_sector(label, division, major_group):
+    # Scalar version of the rules; only evaluated while compiling the lookup table
+    if label in CONSUMER_SECTORS:
+        label = division
+    sector = SECTOR_MAPPING.get(label) if isinstance(label, str) else None
+    if sector == TCEGS:
+        if 40 <= major_group < 48:
+            return "Transportation"
+        elif major_group == 48:
+            return "Services"
+        else:
+            return "Utilities"
+    return sector
+
+
+def compile_sector_table(major_groups, divisions, overrides=None):
+    overrides = SECTOR_OVERRIDES if overrides is None else overrides
+
+    # SIC division name for every two-digit major group, plus one slot for unknown codes
+    division_names = divisions.drop_duplicates("Division").set_index("Division")["Description"]
+    groups = major_groups.assign(
+        code=major_groups["Major Group"].astype(str).str.zfill(2)
+    ).drop_duplicates("code")
+    division_by_group = np.full(UNKNOWN_MAJOR_GROUP + 1, np.nan, dtype=object)
+    positions = MAJOR_GROUP_CODES.get_indexer(groups["code"])
+    found = positions >= 0
+    division_by_group[positions[found]] = (
+        groups["Division"].map(division_names).to_numpy(dtype=object)[found]
+    )
+
+    # Label 0 means "no GICS sector and no override": the SIC division is the raw label
+    labels = [None] + list(dict.fromkeys(list(GICS_SECTORS.values()) + list(overrides.values())))
+    cells = [
+        [
+            resolve_sector(label if i else division, division, group)
+            for group, division in enumerate(division_by_group)
+        ]
+        for i, label in enumerate(labels)
+    ]
+    sectors = sorted({sector for row in cells for sector in row if sector} | {"Transportation"})
+    # -1 points at the trailing NaN of the sector names array
+    table = np.array(
+        [[sectors.index(sector) if sector else -1 for sector in row] for row in cells],
+        dtype=np.int16,
+    )
+
+    return {
+        "labels": pd.Index(labels[1:]),
+        "sectors": np.array(sectors + [np.nan], dtype=object),
+        "table": table,
+        "division_by_group": division_by_group,
+        "gics": pd.Index(list(GICS_SECTORS)),
+        "gics_names": np.array(list(GICS_SECTORS.values()) + [np.nan], dtype=object),
+        "overrides": pd.Index(list(overrides)),
+        "override_labels": pd.Index(list(overrides.values())),
+    }
+
+
+def classify_sectors(info, compiled):
+    group = MAJOR_GROUP_CODES.get_indexer(info["sic"].astype(str).str[:2].str.zfill(2))
+    group[group < 0] = UNKNOWN_MAJOR_GROUP
+
+    gics = compiled["gics"].get_indexer(info["gsector"])
+    gics_names = compiled["gics_names"][gics]
+    override = compiled["overrides"].get_indexer(info["conm"])
+
+    label = np.zeros(len(info), dtype=np.intp)
+    has_gics = gics >= 0
+    label[has_gics] = compiled["labels"].get_indexer(gics_names[has_gics]) + 1
+    has_override = override >= 0
+    override_labels = compiled["override_labels"][override[has_override]]
+    label[has_override] = compiled["labels"].get_indexer(override_labels) + 1
+
+    ggroup = info["ggroup"].fillna("")
+    code = compiled["table"][label, group]
+    code[(ggroup == TRANSPORTATION_GGROUP).to_numpy()] = list(compiled["sectors"]).index(
+        "Transportation"
+    )
+
+    classified = info.drop(columns=["fic", "gind", "idbflag", "incorp", "state"])
+    classified = classified.reset_index(drop=True)
+    classified["ggroup"] = ggroup.to_numpy()
+    classified["SIC Division Name"] = compiled["division_by_group"][group]
+    classified["GIC Sector Name"] = gics_names
+    classified["sector"] = compiled["sectors"][code]
+    return classified
@@ -0,0 +1,122 @@
+# Description: Out-of-core execution of per-key stages, used by base_dataset4.merge_sharded.
+#
+# The input frames are hash-partitioned on a key column (e.g. gvkey) into shards written to
+# disk, so every row of one key lands in the same shard and rows keep their relative order.
+# Each shard is then loaded from disk and processed on its own across a process pool, and
+# only its output is kept, written back to disk, so the working memory of a worker is bounded
+# by the shard size rather than by the whole universe. concat_shards reads the outputs back
+# as one pyarrow dataset, so the parent never holds every shard's output next to their
+# concatenation. The outputs are Arrow IPC files, which keep every pandas dtype (parquet has
+# no datetime64[s]); without pyarrow they are pickles.
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow.fs import LocalFileSystem
+except ImportError:
+    pa = None
+    ds = None
+
+SHARD_DIR = ".shards"
+DEFAULT_SHARDS = 16
+
+
+def shard_ids(keys, n_shards):
+    # Stable across runs and processes, unlike hash()
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy() % n_shards
+
+
+def write_shards(frames, key, n_shards, directory):
+    # frames: {name: DataFrame}. Returns one {name: path} per shard.
+    shards = [{} for _ in range(n_shards)]
+    for name, df in frames.items():
+        ids = shard_ids(df[key], n_shards)
+        order = np.argsort(ids, kind="stable")
+        bounds = np.searchsorted(ids[order], np.arange(n_shards + 1))
+        for i in range(n_shards):
+            path = os.path.join(directory, f"{name}-{i:04d}.pkl")
+            df.iloc[order[bounds[i] : bounds[i + 1]]].to_pickle(path)
+            shards[i][name] = path
+    return shards
+
+
+def write_output(df, path):
+    if pa is None:
+        df.to_pickle(path)
+        return
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_output(path):
+    if pa is None:
+        return pd.read_pickle(path).reset_index(drop=True)
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).read_pandas()
+
+
+def run_shard(func, paths, output, kwargs):
+    # Runs in a worker: only this shard's inputs and output are in its memory
+    frames = {name: pd.read_pickle(path) for name, path in paths.items()}
+    for path in paths.values():
+        os.remove(path)
+    result = func(**frames, **kwargs)
+    del frames
+    write_output(result, output)
+    return output, len(result)
+
+
+@contextmanager
+def shard_outputs(func, frames, key, n_shards, n_jobs, kwargs):
+    # Yields [(output path, rows)] per shard; the files are removed on exit
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=SHARD_DIR) as directory:
+        shards = write_shards(frames, key, n_shards, directory)
+        suffix = ".pkl" if pa is None else ".arrow"
+        outputs = [os.path.join(directory, f"output-{i:04d}{suffix}") for i in range(n_shards)]
+        n_jobs = min(n_jobs or os.cpu_count() or 1, n_shards)
+        if n_jobs <= 1:
+            yield [run_shard(func, s, output, kwargs) for s, output in zip(shards, outputs)]
+            return
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            results = list(
+                pool.map(run_shard, [func] * n_shards, shards, outputs, [kwargs] * n_shards)
+            )
+        yield results
+
+
+def map_shards(func, frames, key, n_shards=DEFAULT_SHARDS, n_jobs=None, **kwargs):
+    # Returns [func(**shard of frames, **kwargs) for each shard] with default indexes,
+    # computed across a process pool. func must be a module-level function so workers can
+    # import it.
+    with shard_outputs(func, frames, key, n_shards, n_jobs, kwargs) as outputs:
+        return [read_output(path) for path, _ in outputs]
+
+
+def concat_shards(func, frames, key, n_shards=DEFAULT_SHARDS, n_jobs=None, **kwargs):
+    # pd.concat(map_shards(...), ignore_index=True) without every shard's output in memory at
+    # once: the output files are read as one dataset and converted to a single frame.
+    # Empty outputs are left out, as their columns may have no type.
+    with shard_outputs(func, frames, key, n_shards, n_jobs, kwargs) as outputs:
+        paths = [path for path, rows in outputs if rows] or [outputs[0][0]]
+        if pa is None:
+            return pd.concat(map(read_output, paths), ignore_index=True)
+        # A categorical's dictionary only covers its shard, so index widths may differ
+        schemas = [ds.dataset(path, format="ipc").schema for path in paths]
+        schema = pa.unify_schemas(schemas, promote_options="permissive")
+        # Memory-mapped, so the only copy the parent allocates is the frame itself; the
+        # mapped table is dropped before its files are removed
+        local = LocalFileSystem(use_mmap=True)
+        table = ds.dataset(paths, schema=schema, format="ipc", filesystem=local).to_table()
+        df = table.to_pandas()
+        del table
+        return df
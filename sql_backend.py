@@ -0,0 +1,150 @@
+# Description: DuckDB backend for the relational steps of base_dataset4.py, selected with
+# backend="duckdb" (python base_dataset4.py --backend duckdb).
+#
+# The joins, de-duplication, ordering and aggregation run as SQL in an embedded DuckDB
+# database, which uses every core and spills to SPILL_DIR when a step does not fit in
+# DUCKDB_MEMORY_LIMIT. Only the key columns (plus row positions) are handed to DuckDB, as
+# zero-copy scans of the extracts the pandas path reads. The SQL returns row positions, and
+# base_dataset4 builds the output frames from them with the same pandas code as its own
+# path, so both backends produce identical DataFrames (values, dtypes, order and index).
+
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+SPILL_DIR = ".duckdb_spill"
+MEMORY_LIMIT = os.environ.get("DUCKDB_MEMORY_LIMIT")
+
+
+def connect():
+    if duckdb is None:
+        raise ImportError("duckdb is required for backend='duckdb': pip install duckdb")
+    conn = duckdb.connect()
+    conn.execute(f"SET threads = {os.cpu_count() or 1}")
+    conn.execute(f"SET temp_directory = '{SPILL_DIR}'")
+    if MEMORY_LIMIT:
+        conn.execute(f"SET memory_limit = '{MEMORY_LIMIT}'")
+    return conn
+
+
+def query(sql, **frames):
+    # Runs sql with each frame registered as a table under its keyword name
+    conn = connect()
+    try:
+        for name, df in frames.items():
+            conn.register(name, df)
+        return conn.execute(sql).df()
+    finally:
+        conn.close()
+
+
+def sql_literals(values):
+    return ", ".join("'" + str(value).replace("'", "''") + "'" for value in values)
+
+
+def key_frame(df, columns):
+    # The key columns of df with a RangeIndex and each row's position in df
+    keys = df[columns].reset_index(drop=True)
+    keys.insert(0, "pos", np.arange(len(keys)))
+    return keys
+
+
+def sql_ratings_positions(left, ratings):
+    # Rows of merge(left, ratings, on="companyid") after drop_duplicates(["gvkey",
+    # "ratingdate"]) and sorting by gvkey, companyid, ratingdate desc. Returns the left and
+    # ratings position and the position in the merged frame (its index label) of each row,
+    # then the ratings position of the row before it within its gvkey (whose ratingdate ends
+    # the rating period) and the left position of the row before it, -1 where there is none.
+    # The merged frame lists left rows in order, each with its ratings matches in order.
+    keys = query(
+        """
+        WITH pairs AS (
+            SELECT
+                l.pos AS left_pos,
+                r.pos AS right_pos,
+                l.gvkey,
+                l.companyid,
+                r.ratingdate,
+                ROW_NUMBER() OVER (ORDER BY l.pos, r.pos) - 1 AS merged_pos
+            FROM l JOIN r ON l.companyid IS NOT DISTINCT FROM r.companyid
+        ),
+        unique_pairs AS (
+            SELECT *
+            FROM pairs
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY gvkey, ratingdate ORDER BY merged_pos) = 1
+        )
+        SELECT
+            left_pos,
+            right_pos,
+            merged_pos,
+            CASE WHEN gvkey IS NOT NULL THEN COALESCE(LAG(right_pos) OVER (
+                PARTITION BY gvkey
+                ORDER BY companyid NULLS LAST, ratingdate DESC NULLS LAST, merged_pos
+            ), -1) ELSE -1 END AS end_pos,
+            COALESCE(LAG(left_pos) OVER (
+                ORDER BY
+                    gvkey NULLS LAST,
+                    companyid NULLS LAST,
+                    ratingdate DESC NULLS LAST,
+                    merged_pos
+            ), -1) AS previous_pos
+        FROM unique_pairs
+        ORDER BY
+            gvkey NULLS LAST,
+            companyid NULLS LAST,
+            ratingdate DESC NULLS LAST,
+            merged_pos
+        """,
+        l=key_frame(left, ["gvkey", "companyid"]),
+        r=key_frame(ratings, ["companyid", "ratingdate"]),
+    )
+    return tuple(keys[column].to_numpy(np.intp) for column in keys.columns)
+
+
+def sql_interval_join(left_rows, left_code, left_day, right_rows, right_code, start_day, end_day):
+    # The join step of base_dataset4.interval_join on its integer keys (interval_keys):
+    # positions of every (left, right) pair with equal codes and start_day <= left_day <=
+    # end_day, ordered by left row then right row
+    pairs = query(
+        """
+        SELECT l.pos AS left_pos, r.pos AS right_pos
+        FROM l JOIN r ON l.code = r.code AND l.day BETWEEN r.start_day AND r.end_day
+        ORDER BY left_pos, right_pos
+        """,
+        l=pd.DataFrame({"pos": left_rows, "code": left_code, "day": left_day}),
+        r=pd.DataFrame(
+            {"pos": right_rows, "code": right_code, "start_day": start_day, "end_day": end_day}
+        ),
+    )
+    return pairs["left_pos"].to_numpy(np.intp), pairs["right_pos"].to_numpy(np.intp)
+
+
+def sql_default_dates(mfinancials_df, default_symbols):
+    # First default-type ratingdate per gvkey (NaT for issuers that never default), sorted by
+    # gvkey like a groupby, with the resolution of the pandas path
+    ratingdate = pd.to_datetime(mfinancials_df["ratingdate"], errors="coerce")
+    dates = query(
+        f"""
+        SELECT
+            gvkey,
+            MIN(ratingdate) FILTER (
+                WHERE CAST(ratingsymbol AS VARCHAR) IN ({sql_literals(default_symbols)})
+            ) AS dflt_date
+        FROM m
+        WHERE gvkey IS NOT NULL
+        GROUP BY gvkey
+        ORDER BY gvkey
+        """,
+        m=key_frame(mfinancials_df, ["gvkey", "ratingsymbol"]).assign(
+            ratingdate=ratingdate.to_numpy()
+        ),
+    )
+    dates["gvkey"] = dates["gvkey"].astype(mfinancials_df["gvkey"].dtype)
+    dates["dflt_date"] = dates["dflt_date"].astype(ratingdate.dtype)
+    return dates
@@ -0,0 +1,41 @@
+# Description: Shared fixtures for the regression tests: the pipeline inputs built from a
+# small fixed synthetic WRDS (local_wrds.py), so optimized stages can be compared with their
+# baseline implementations offline.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import base_dataset4 as bd
+from local_wrds import LocalWRDS, seed_reference_caches
+from pipeline import run_pipeline
+
+SCALE = 0.05
+SEED = 0
+
+
+@pytest.fixture(scope="session")
+def workdir(tmp_path_factory):
+    # The caches of base_dataset4 and pipeline live in the working directory
+    path = tmp_path_factory.mktemp("pipeline")
+    previous = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def extracts(workdir):
+    # {stage name: output} for the stages up to the per-gvkey merge
+    local = LocalWRDS()
+    local.populate(SCALE, SEED)
+    bd.set_wrds_conn(local)
+    seed_reference_caches()
+    bd.acquire_extracts()
+    targets = ["gvkey", "ratings", "ratings4", "info_3", "ratings6", "financials"]
+    outputs = run_pipeline(bd.pipeline_stages(), targets=targets)
+    bd.close_wrds_conn()
+    return outputs
@@ -0,0 +1,104 @@
+# Description: Incremental, watermark-based refreshes of the Parquet extract caches
+# (cache_store.py and base_dataset4.get_ratings): the refreshed window replaces the cached
+# one, and an interrupted refresh leaves both the cache and its watermarks untouched.
+
+import pandas as pd
+import pytest
+
+import base_dataset4 as bd
+import cache_store
+
+
+def ratings_extract(dates, symbol="BBB"):
+    # download_ratings output for one issuer per date
+    return bd.apply_dtypes(
+        pd.DataFrame(
+            {
+                "companyid": [100000 + i for i in range(len(dates))],
+                "entity_pname": [f"Issuer {i}" for i in range(len(dates))],
+                "ratingdate": pd.to_datetime(dates).date,
+                "ratingsymbol": symbol,
+                "ratingactionword": "Upgrade",
+                "unsol": "N",
+            }
+        ),
+        bd.RATINGS_DTYPES,
+    )
+
+
+@pytest.fixture
+def ratings_cache(tmp_path, monkeypatch):
+    # A cold-start ratings cache with a watermark of 2020-06-30
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        bd,
+        "download_ratings",
+        lambda since="1990-01-01": ratings_extract(["2019-01-15", "2020-03-31", "2020-06-30"]),
+    )
+    bd.get_ratings()
+    return "ratings_data.parquet"
+
+
+def test_upsert_replaces_only_the_refetched_window(tmp_path):
+    filename = str(tmp_path / "financials.parquet")
+    cached = pd.DataFrame(
+        {"gvkey": ["001", "001", "002", "002"], "fyear": [2018, 2020, 2018, 2020]}
+    )
+    cache_store.write_cache(cached, filename)
+    refreshed = pd.DataFrame({"gvkey": ["001", "001"], "fyear": [2020, 2021]})
+    cache_store.upsert_cache(
+        refreshed, filename, "fyear", 2019, sort_by=["gvkey", "fyear"], keys={"gvkey": ["001"]}
+    )
+    result = cache_store.read_cache(filename)
+    # 002 was not refetched, so its 2020 statement stays
+    assert list(zip(result["gvkey"], result["fyear"])) == [
+        ("001", 2018),
+        ("001", 2020),
+        ("001", 2021),
+        ("002", 2018),
+        ("002", 2020),
+    ]
+
+
+def test_incremental_refresh_moves_the_watermark(ratings_cache, monkeypatch):
+    assert cache_store.read_watermarks(ratings_cache) == {"ratingdate": "2020-06-30"}
+    requested = []
+
+    def download(since="1990-01-01"):
+        requested.append(since)
+        # The lookback window is refetched: 2020-06-30 was withdrawn, the others are new
+        return ratings_extract(["2020-05-15", "2020-09-30"], symbol="BB")
+
+    monkeypatch.setattr(bd, "download_ratings", download)
+    ratings = bd.get_ratings(incremental=True)
+    assert requested == [pd.Timestamp("2020-04-01").date()]
+    assert sorted(ratings["ratingdate"].astype(str)) == [
+        "2019-01-15",
+        "2020-03-31",
+        "2020-05-15",
+        "2020-09-30",
+    ]
+    assert cache_store.read_watermarks(ratings_cache) == {"ratingdate": "2020-09-30"}
+
+
+def test_interrupted_refresh_keeps_cache_and_watermark(ratings_cache, tmp_path, monkeypatch):
+    before = cache_store.read_cache(ratings_cache)
+    monkeypatch.setattr(
+        bd, "download_ratings", lambda since="1990-01-01": ratings_extract(["2020-09-30"])
+    )
+
+    def interrupted_write(table, where, **kwargs):
+        # Leaves a partial file behind, as a crash half-way through the write would
+        with open(where, "wb") as f:
+            f.write(b"PAR1")
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(cache_store.pq, "write_table", interrupted_write)
+    with pytest.raises(KeyboardInterrupt):
+        bd.get_ratings(incremental=True)
+    pd.testing.assert_frame_equal(cache_store.read_cache(ratings_cache), before)
+    assert cache_store.read_watermarks(ratings_cache) == {"ratingdate": "2020-06-30"}
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "ratings_data.parquet",
+        "ratings_data.watermarks.json",
+    ]
@@ -0,0 +1,75 @@
+# Description: The in-process base_dataset loader (dataset_loader.py): one build when the
+# dataset is missing, one cached frame per process, the Arrow copy, and reloads when the
+# pickle changes.
+
+import os
+
+import pandas as pd
+import pytest
+
+import base_dataset4 as bd
+import dataset_loader
+from dataset_loader import arrow_path, load_base_dataset
+
+
+def base_frame(n=5):
+    return pd.DataFrame(
+        {
+            "gvkey": pd.Categorical([f"{i:06d}" for i in range(n)]),
+            "at": pd.Series(range(n), dtype="float32"),
+            "days2dflt": pd.array(range(n), dtype="Int32"),
+        }
+    )
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    builds = []
+
+    def main(path="base_dataset.pkl", **kwargs):
+        builds.append(path)
+        base_frame().to_pickle(path)
+
+    monkeypatch.setattr(bd, "main", main)
+    monkeypatch.setattr(dataset_loader, "LOADED", {})
+    return str(tmp_path / "base_dataset.pkl"), builds
+
+
+def test_missing_dataset_is_built_once(dataset):
+    path, builds = dataset
+    first = load_base_dataset(path)
+    second = load_base_dataset(path)
+    assert builds == [path]
+    pd.testing.assert_frame_equal(first, base_frame())
+    pd.testing.assert_frame_equal(second, base_frame())
+
+
+def test_callers_get_private_columns(dataset):
+    path, _ = dataset
+    df = load_base_dataset(path)
+    df["extra"] = 1
+    df["at"] = 0.0
+    pd.testing.assert_frame_equal(load_base_dataset(path), base_frame())
+
+
+def test_arrow_copy_is_used_by_a_new_process(dataset, capsys):
+    path, _ = dataset
+    load_base_dataset(path)
+    assert os.path.exists(arrow_path(path))
+    # A new process has no cached frame and maps the Arrow copy, with the same dtypes
+    dataset_loader.LOADED.clear()
+    capsys.readouterr()
+    pd.testing.assert_frame_equal(load_base_dataset(path), base_frame())
+    assert capsys.readouterr().out == f"Loading data from {arrow_path(path)}...\n"
+
+
+def test_rewritten_pickle_is_reloaded(dataset):
+    path, builds = dataset
+    load_base_dataset(path)
+    changed = base_frame(3)
+    changed.to_pickle(path)
+    # The Arrow copy is now older than the pickle and must not be used
+    stamp = os.path.getmtime(arrow_path(path)) + 10
+    os.utime(path, (stamp, stamp))
+    pd.testing.assert_frame_equal(load_base_dataset(path), changed)
+    assert builds == [path]
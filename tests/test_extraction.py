@@ -0,0 +1,43 @@
+# Description: Streaming, chunked funda extraction (base_dataset4.download_financials /
+# get_financials) against a one-shot fetch, on a small synthetic local WRDS.
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+import base_dataset4 as bd
+from local_wrds import LocalWRDS
+
+CHUNKSIZE = 500
+
+
+@pytest.fixture
+def local_wrds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalWRDS()
+    local.populate(0.02, seed=1)
+    bd.set_wrds_conn(local)
+    yield local
+    bd.set_wrds_conn(None)
+    local.close()
+
+
+def test_chunks_are_bounded_and_typed(local_wrds):
+    chunks = list(bd.download_financials(chunksize=CHUNKSIZE))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= CHUNKSIZE for chunk in chunks)
+    for chunk in chunks:
+        for column, dtype in bd.FINANCIALS_DTYPES.items():
+            assert chunk[column].dtype == dtype, column
+    gvkeys = pd.concat([chunk["gvkey"] for chunk in chunks], ignore_index=True)
+    assert gvkeys.is_monotonic_increasing
+
+
+def test_streamed_cache_matches_one_shot_fetch(local_wrds):
+    gvkeys = sorted(local_wrds.raw_sql("SELECT gvkey FROM ciq.wrds_gvkey")["gvkey"])[::3]
+    streamed = bd.get_financials("streamed.parquet", gvkeys=gvkeys, chunksize=CHUNKSIZE)
+    one_shot = bd.get_financials("one_shot.parquet", gvkeys=gvkeys, chunksize=None)
+    assert pq.ParquetFile("streamed.parquet").num_row_groups > 1
+    assert set(streamed["gvkey"]) <= set(gvkeys)
+    assert len(streamed) > 0
+    pd.testing.assert_frame_equal(streamed, one_shot)
@@ -0,0 +1,99 @@
+# Description: The declarative feature registry (feature_registry.py) behind
+# financial_factors4.build_features, against the original column-by-column ratios.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_registry
+import financial_factors4 as ff4
+from feature_registry import evaluate_features, register_feature, resolve_features
+
+COLUMNS = ["act", "lct", "ap", "sale", "che", "at", "ebit", "dlc", "dltt", "oancf", "lt"]
+COLUMNS += ["invt", "ni", "prcc_f", "csho", "ceq"]
+
+
+def statements(n=500, seed=0):
+    # Raw funda columns with missing values, zeros and negative sizes
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({column: rng.lognormal(3, 1.5, n) for column in COLUMNS})
+    df[["ebit", "ni", "oancf"]] *= rng.choice([-1, 1], (n, 3))
+    for column in COLUMNS:
+        df.loc[rng.random(n) < 0.05, column] = np.nan
+    df.loc[rng.random(n) < 0.03, ["at", "sale"]] = 0.0
+    df.loc[rng.random(n) < 0.03, "at"] = -1.0
+    return df
+
+
+def baseline_features(df):
+    # financial_factors4.build_features before the registry
+    df = df.copy()
+    df["ACTLCT"] = df["act"] / df["lct"]
+    df["APSALE"] = df["ap"] / df["sale"]
+    df["CASHTA"] = df["che"] / df["at"]
+    df["CHAT"] = df["che"] / df["at"]
+    df["CHLCT"] = df["che"] / df["lct"]
+    df["EBITAT"] = df["ebit"] / df["at"]
+    df["EBITSALE"] = df["ebit"] / df["sale"]
+    df["FAT"] = (df["dlc"] + 0.5 * df["dltt"]) / df["at"]
+    df["FFOLT"] = df["oancf"] / df["lt"]
+    df["INVTSALES"] = df["invt"] / df["sale"]
+    df["LCTLT"] = df["lct"] / df["lt"]
+    df["LOGAT"] = df["at"].apply(lambda x: None if x <= 0 else np.log(x))
+    df["LOGSALE"] = df["sale"].apply(lambda x: None if x <= 0 else np.log(x))
+    df["NIAT"] = df["ni"] / df["at"]
+    df["NIMTA"] = df["ni"] / (df["prcc_f"] * df["csho"] + df["lt"])
+    df["NISALE"] = df["ni"] / df["sale"]
+    df["TDEBT"] = df["dlc"] + df["dltt"]
+    df["MKVAL"] = df["prcc_f"] * df["csho"]
+    df["LBTAT"] = df["lt"] / df["at"]
+    df["DBTAT"] = df["TDEBT"] / df["at"]
+    df["DBTMKTEQ"] = np.where(
+        df["MKVAL"].notna(),
+        df["TDEBT"] / (df["TDEBT"] + df["MKVAL"]),
+        df["TDEBT"] / (df["TDEBT"] + df["ceq"]),
+    )
+    df["LBTMKTEQ"] = np.where(
+        df["MKVAL"].notna(),
+        df["lt"] / (df["lt"] + df["MKVAL"]),
+        df["TDEBT"] / (df["TDEBT"] + df["ceq"]),
+    )
+    return df
+
+
+def test_build_features_matches_baseline():
+    df = statements()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        expected = baseline_features(df)
+    result = ff4.build_features(df.copy())
+    pd.testing.assert_frame_equal(
+        result[ff4.target_vars], expected[ff4.target_vars].astype("float64")
+    )
+
+
+def test_only_requested_features_are_added():
+    df = statements(50)
+    result = ff4.build_features(df.copy(), ["DBTAT"])
+    # TDEBT is computed for DBTAT but not added
+    assert list(result.columns) == COLUMNS + ["DBTAT"]
+    assert resolve_features(["DBTAT"]) == ["TDEBT", "DBTAT"]
+
+
+def test_duplicate_expressions_are_evaluated_once():
+    values = evaluate_features(statements(50), ["CASHTA", "CHAT"])
+    assert values["CASHTA"] is values["CHAT"]
+
+
+def test_register_feature_and_cycles(monkeypatch):
+    monkeypatch.setattr(feature_registry, "FEATURES", dict(feature_registry.FEATURES))
+    register_feature("NETDEBT", "TDEBT - che")
+    df = statements(50)
+    np.testing.assert_allclose(
+        evaluate_features(df, ["NETDEBT"])["NETDEBT"], df["dlc"] + df["dltt"] - df["che"]
+    )
+    register_feature("LOOP_A", "LOOP_B + 1")
+    register_feature("LOOP_B", "LOOP_A + 1")
+    with pytest.raises(ValueError, match="Circular feature dependency"):
+        resolve_features(["LOOP_A"])
+    with pytest.raises(KeyError):
+        resolve_features(["UNKNOWN"])
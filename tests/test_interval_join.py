@@ -0,0 +1,87 @@
+# Description: The sorted interval join of base_dataset4.merge_financials_ratings against
+# the original per-gvkey cross product filtered on ratingdate <= datadate <= ratingenddate.
+
+import numpy as np
+import pandas as pd
+
+import base_dataset4 as bd
+
+RATING_COLUMNS = [
+    "entity_pname",
+    "ratingdate",
+    "ratingsymbol",
+    "ratingactionword",
+    "unsol",
+    "ratingenddate",
+    "sector",
+]
+
+
+def cross_product_merge(financials, ratings6):
+    # merge_financials_ratings before the interval join
+    common_gvkeys = set(financials["gvkey"]).intersection(set(ratings6["gvkey"]))
+    financials2 = financials[financials["gvkey"].isin(common_gvkeys)].copy()
+    ratings7 = ratings6[ratings6["gvkey"].isin(common_gvkeys)].copy()
+    financials2["datadate"] = pd.to_datetime(financials2["datadate"], errors="coerce")
+    ratings7["ratingdate"] = pd.to_datetime(ratings7["ratingdate"], errors="coerce")
+    ratings7["ratingenddate"] = pd.to_datetime(ratings7["ratingenddate"], errors="coerce")
+    ratings7.loc[ratings7["ratingenddate"] > "2100-12-31", "ratingenddate"] = pd.Timestamp(
+        "2100-12-31"
+    )
+    merged_df = financials2.merge(ratings7, how="left", on="gvkey")
+    merged_df = merged_df[
+        (merged_df["ratingdate"].notna())
+        & (merged_df["ratingenddate"].notna())
+        & (merged_df["ratingdate"] <= merged_df["datadate"])
+        & (merged_df["datadate"] <= merged_df["ratingenddate"])
+    ]
+    merged_df = merged_df.sort_values(by=["gvkey", "datadate"], ascending=[True, True])
+    merged_df.reset_index(drop=True, inplace=True)
+    mfinancials_df = merged_df[list(financials2.columns) + RATING_COLUMNS]
+    return bd.override_by_exact_fyear(mfinancials_df, ratings6)
+
+
+def cross_product_pairs(left, right):
+    # (left position, right position) of every matching pair, in left-merge order
+    pairs = (
+        left.reset_index(drop=True)
+        .reset_index()
+        .merge(right.reset_index(drop=True).reset_index(), on="gvkey", suffixes=("_left", "_right"))
+    )
+    pairs = pairs[
+        (pairs["start"] <= pairs["datadate"]) & (pairs["datadate"] <= pairs["end"])
+    ].sort_values(["index_left", "index_right"])
+    return pairs["index_left"].to_numpy(), pairs["index_right"].to_numpy()
+
+
+def test_interval_join_matches_cross_product():
+    # Overlapping and nested windows, inclusive bounds, missing dates and keys without windows
+    rng = np.random.default_rng(0)
+    days = pd.Timestamp("2000-01-01") + pd.to_timedelta(rng.integers(0, 3000, 400), unit="D")
+    left = pd.DataFrame({"gvkey": rng.choice(list("abcdef"), 400), "datadate": days})
+    left.loc[::37, "datadate"] = pd.NaT
+    start = pd.Timestamp("2000-01-01") + pd.to_timedelta(rng.integers(0, 3000, 60), unit="D")
+    right = pd.DataFrame(
+        {
+            "gvkey": rng.choice(list("abcdeg"), 60),
+            "start": start,
+            "end": start + pd.to_timedelta(rng.integers(0, 900, 60), unit="D"),
+        }
+    )
+    right.loc[::11, "end"] = pd.NaT
+    # A window that starts and ends on a statement date
+    right.loc[len(right)] = [left.loc[1, "gvkey"], left.loc[1, "datadate"], left.loc[1, "datadate"]]
+
+    left_idx, right_idx = bd.interval_join(left, right, "gvkey", "datadate", "start", "end")
+    expected_left, expected_right = cross_product_pairs(left, right)
+    assert len(expected_left) > 0
+    np.testing.assert_array_equal(left_idx, expected_left)
+    np.testing.assert_array_equal(right_idx, expected_right)
+
+
+def test_merge_financials_ratings_matches_cross_product(extracts):
+    financials, ratings6 = extracts["financials"], extracts["ratings6"]
+    result = bd.merge_financials_ratings(financials, ratings6)
+    expected = cross_product_merge(financials, ratings6)
+    assert len(result) > 0
+    pd.testing.assert_frame_equal(result, expected)
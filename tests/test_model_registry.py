@@ -0,0 +1,89 @@
+# Description: The versioned model registry (model_registry.py): models are fitted once per
+# (training data, spec), reused under any label, versioned when the data changes, and an
+# undefined AUC round-trips through JSON as null.
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.model_selection import train_test_split
+
+import model_harness
+from model_harness import model_spec
+from model_registry import artifact_path, evaluate_models, list_models, load_model, model_key
+
+
+def scored_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"a": rng.normal(0, 1, n), "b": rng.normal(0, 1, n)})
+    df["dflt_flag"] = (df["a"] + rng.normal(0, 1, n) > 1.5).astype(int)
+    df["unrelated"] = 0
+    return df
+
+
+@pytest.fixture
+def fits(monkeypatch):
+    # Specs fitted by model_harness, per evaluate_models call
+    calls = []
+    evaluate = model_harness.evaluate_models
+
+    def counting(df, specs, *args):
+        calls.append([spec["label"] for spec in specs])
+        return evaluate(df, specs, *args)
+
+    monkeypatch.setattr(model_harness, "evaluate_models", counting)
+    return calls
+
+
+def evaluate(df, specs, tmp_path):
+    return evaluate_models(df, specs, n_jobs=1, registry_dir=str(tmp_path / "registry"))
+
+
+def test_models_are_fitted_once_per_data_and_spec(fits, tmp_path):
+    df = scored_data()
+    specs = [model_spec("A", ["a"]), model_spec("AB", ["a", "b"], C=0.5)]
+    first = evaluate(df, specs, tmp_path)
+    assert fits == [["A", "AB"]]
+
+    # Unrelated columns may change; an identical spec under another name shares the model
+    again = evaluate(df.assign(unrelated=1), specs + [model_spec("Same as A", ["a"])], tmp_path)
+    assert fits == [["A", "AB"]]
+    assert [r["label"] for r in again] == ["A", "AB", "Same as A"]
+    assert again[2]["coef"] == again[0]["coef"] == pytest.approx(first[0]["coef"])
+    assert again[1]["auc"] == pytest.approx(first[1]["auc"])
+    np.testing.assert_allclose(again[1]["tpr"], first[1]["tpr"])
+
+    # New data for a spec's columns refits it as the next version
+    changed = df.assign(b=df["b"] * 2)
+    assert model_key(changed, specs[0])[0] == model_key(df, specs[0])[0]
+    evaluate(changed, specs, tmp_path)
+    assert fits == [["A", "AB"], ["AB"]]
+    models = list_models(str(tmp_path / "registry"))
+    assert sorted(models.loc[models["label"] == "AB", "version"]) == [1, 2]
+    latest = load_model("AB", str(tmp_path / "registry"))
+    assert latest["version"] == 2
+    assert latest["data_fingerprint"] == model_key(changed, specs[1])[1]
+    with pytest.raises(KeyError, match="No model 'C'"):
+        load_model("C", str(tmp_path / "registry"))
+
+
+@pytest.mark.filterwarnings("ignore::sklearn.exceptions.UndefinedMetricWarning")
+def test_undefined_auc_is_stored_as_null(fits, tmp_path):
+    # Defaults only among the training rows: the test split has a single class
+    df = scored_data()
+    train_rows, _ = train_test_split(
+        np.arange(len(df)),
+        test_size=model_harness.TEST_SIZE,
+        random_state=model_harness.RANDOM_STATE,
+    )
+    df["dflt_flag"] = 0
+    df.loc[train_rows[:20], "dflt_flag"] = 1
+    spec = model_spec("A", ["a"])
+    (result,) = evaluate(df, [spec], tmp_path)
+    assert result["error"] is None and np.isnan(result["auc"])
+
+    with open(artifact_path(model_key(df, spec)[0], str(tmp_path / "registry"))) as f:
+        assert json.load(f)["auc"] is None
+    (loaded,) = evaluate(df, [spec], tmp_path)
+    assert len(fits) == 1 and np.isnan(loaded["auc"])
@@ -0,0 +1,102 @@
+# Description: The content-addressed stage cache and DAG runner (pipeline.py): a stage is
+# rerun exactly when its code, a constant it uses, its parameters or upstream data change.
+
+import glob
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import pipeline
+from pipeline import data_fingerprint, run_pipeline, stage
+
+# Not a CONSTANT_TYPES value, so recording calls does not change the code fingerprints
+CALLS = SimpleNamespace(load=0, transform=0, unrelated=0)
+SOURCE = {"rows": [1, 2, 3]}
+SCALE = 10
+
+
+def load():
+    CALLS.load += 1
+    return pd.DataFrame({"x": SOURCE["rows"]})
+
+
+def scaled(x):
+    return x * SCALE
+
+
+def transform(df, offset=0):
+    CALLS.transform += 1
+    return df.assign(y=scaled(df["x"]) + offset)
+
+
+def unrelated():
+    CALLS.unrelated += 1
+    return 0
+
+
+def stages(offset=0):
+    return [
+        stage("load", load, volatile=True),
+        stage("transform", transform, inputs=["load"], params={"offset": offset}),
+        stage("unrelated", unrelated),
+    ]
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    CALLS.__dict__.update(load=0, transform=0, unrelated=0)
+    monkeypatch.setitem(SOURCE, "rows", [1, 2, 3])
+    return str(tmp_path / "stage_cache")
+
+
+def run(cache_dir, offset=0):
+    return run_pipeline(stages(offset), targets=["transform"], cache_dir=cache_dir)["transform"]
+
+
+def test_unchanged_stage_is_loaded_from_cache(cache_dir):
+    first = run(cache_dir)
+    second = run(cache_dir)
+    pd.testing.assert_frame_equal(first, second)
+    # Volatile loaders always run, the stage downstream of unchanged data does not, and
+    # stages the targets do not need are skipped
+    assert vars(CALLS) == {"load": 2, "transform": 1, "unrelated": 0}
+    assert len(glob.glob(os.path.join(cache_dir, "transform-*.pkl"))) == 1
+
+
+def test_upstream_data_change_reruns(cache_dir, monkeypatch):
+    run(cache_dir)
+    monkeypatch.setitem(SOURCE, "rows", [1, 2, 4])
+    assert run(cache_dir)["y"].tolist() == [10, 20, 40]
+    assert CALLS.transform == 2
+    # The stale fingerprint's output is removed
+    assert len(glob.glob(os.path.join(cache_dir, "transform-*.pkl"))) == 1
+
+
+def test_parameter_change_reruns(cache_dir):
+    run(cache_dir)
+    assert run(cache_dir, offset=1)["y"].tolist() == [11, 21, 31]
+    assert CALLS.transform == 2
+
+
+def test_constant_used_by_a_helper_changes_the_fingerprint(cache_dir, monkeypatch):
+    before = pipeline.code_fingerprint(transform)
+    run(cache_dir)
+    monkeypatch.setitem(globals(), "SCALE", 100)
+    assert pipeline.code_fingerprint(transform) != before
+    assert run(cache_dir)["y"].tolist() == [100, 200, 300]
+    assert CALLS.transform == 2
+
+
+def test_data_fingerprint_sees_values_dtypes_and_index():
+    df = pd.DataFrame({"x": [1, 2, 3]})
+    assert data_fingerprint(df) == data_fingerprint(df.copy())
+    assert data_fingerprint(df) != data_fingerprint(df.astype("int32"))
+    assert data_fingerprint(df) != data_fingerprint(df.assign(x=[1, 2, 4]))
+    assert data_fingerprint(df) != data_fingerprint(df.set_axis([1, 2, 3]))
+
+
+def test_unknown_dependency_is_rejected(cache_dir):
+    with pytest.raises(KeyError, match="unknown stage"):
+        run_pipeline([stage("transform", transform, inputs=["missing"])], cache_dir=cache_dir)
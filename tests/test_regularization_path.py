@@ -0,0 +1,59 @@
+# Description: The proximal-Newton L1 solver of regularization_path.py against
+# LogisticRegression(penalty="l1", solver="liblinear") on the same penalized objective, and
+# the cross-validated path built on it.
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from regularization_path import fit_l1, l1_path, min_c, penalized_loss, standardize
+
+FEATURES = [f"x{i}" for i in range(8)]
+
+
+def sample(n=3000, seed=0):
+    # Three informative and five noise features, two of them correlated with the signal
+    rng = np.random.default_rng(seed)
+    X = rng.normal(0, 1, (n, len(FEATURES)))
+    X[:, 3] += 0.8 * X[:, 0]
+    X[:, 4] -= 0.5 * X[:, 1]
+    eta = -2.5 + 1.2 * X[:, 0] - 0.8 * X[:, 1] + 0.5 * X[:, 2]
+    y = (rng.random(n) < 1 / (1 + np.exp(-eta))).astype(np.int8)
+    return X, y
+
+
+@pytest.mark.parametrize("scale", [2.0, 10.0, 100.0])
+def test_fit_l1_matches_liblinear(scale):
+    X, y = sample()
+    A = np.column_stack([np.ones(len(y)), standardize(X, slice(None))])
+    C = scale * min_c(A[:, 1:], y)
+    beta, _, converged = fit_l1(A, y, C, np.zeros(A.shape[1]))
+    assert converged
+
+    # A large intercept_scaling leaves liblinear's intercept all but unpenalized
+    # l1_ratio=1 is penalty="l1" (deprecated since sklearn 1.8)
+    clf = LogisticRegression(
+        l1_ratio=1.0, solver="liblinear", C=C, tol=1e-10, max_iter=10000, intercept_scaling=1e3
+    ).fit(A[:, 1:], y)
+    reference = np.append(clf.intercept_, clf.coef_[0])
+    penalty = np.append(0.0, np.full(len(FEATURES), 1.0 / C))
+    # At least as low a penalized loss, and the same features selected
+    ours, theirs = penalized_loss(A, y, beta, penalty), penalized_loss(A, y, reference, penalty)
+    assert ours <= theirs + 1e-6 * abs(theirs)
+    np.testing.assert_array_equal(beta[1:] != 0, np.abs(reference[1:]) > 1e-8)
+    np.testing.assert_allclose(beta, reference, atol=1e-3)
+
+
+def test_path_selects_more_features_as_c_grows():
+    X, y = sample(seed=1)
+    df = pd.DataFrame(X, columns=FEATURES).assign(dflt_flag=y)
+    result = l1_path(df, FEATURES, n_folds=3, n_jobs=1)
+    path = result["path"]
+    assert path["converged"].all()
+    # The grid starts where the first coefficient is about to leave zero
+    assert path["n_selected"].iloc[0] == 0
+    assert path["n_selected"].iloc[1] >= 1
+    assert set(path["selected"].iloc[-1]) >= {"x0", "x1", "x2"}
+    assert result["best_C"] in path.index
+    assert path["auc_mean"].max() > 0.7
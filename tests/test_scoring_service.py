@@ -0,0 +1,101 @@
+# Description: Batch scoring of raw statements (scoring_service.py) against the offline
+# financial_factors4 transforms, and the HTTP endpoint.
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import expit
+
+import financial_factors4 as ff4
+from scoring_service import Scorer, make_handler
+
+MODEL = {
+    "label": "Test Model",
+    "features": ["NIAT", "LCTLT", "DBTAT", "Tobin_Q"],
+    "coef": {"NIAT": -2.0, "LCTLT": 0.5, "DBTAT": 1.5, "Tobin_Q": -0.2},
+    "intercept": -3.0,
+}
+
+
+def raw_statements(columns, n=300, seed=0):
+    # Raw funda rows with missing values and zero sizes, so some rows cannot be scored
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({column: rng.lognormal(3, 1.5, n) for column in columns})
+    df[["ebit", "ni"]] *= rng.choice([-1, 1], (n, 2))
+    for column in columns:
+        df.loc[rng.random(n) < 0.03, column] = np.nan
+    df.loc[rng.random(n) < 0.03, "at"] = 0.0
+    df["datadate"] = "2020-12-31"
+    return df
+
+
+@pytest.fixture
+def scorer():
+    return Scorer(MODEL)
+
+
+def test_scores_match_the_training_transforms(scorer):
+    raw = raw_statements(scorer.columns)
+    probabilities = scorer.score(raw)
+
+    # The offline pipeline: only rows that survive finalize_features are scored
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df = ff4.build_features(ff4.impute_data(raw.copy()))
+        final = ff4.finalize_features(df)
+    coef = np.array([MODEL["coef"][f] for f in MODEL["features"]])
+    expected = expit(final[MODEL["features"]].to_numpy(dtype="float64") @ coef - 3.0)
+    scored = np.flatnonzero(~np.isnan(probabilities))
+    assert 0 < len(scored) < len(raw)
+    np.testing.assert_array_equal(scored, final.index)
+    np.testing.assert_allclose(probabilities[scored], expected)
+
+
+def test_missing_columns_are_rejected(scorer):
+    raw = raw_statements(scorer.columns).drop(columns=["lt", "csho"])
+    with pytest.raises(ValueError, match="Missing columns for Test Model: csho, lt"):
+        scorer.score(raw)
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(), method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_http_endpoint(scorer):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(scorer))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        raw = raw_statements(scorer.columns, n=20)
+        # JSON nulls for the missing values
+        data = raw.astype(object).where(raw.notna(), None).to_numpy().tolist()
+        status, body = post(url + "/score", {"columns": list(raw.columns), "data": data})
+        assert status == 200 and body["model"] == "Test Model"
+        expected = scorer.score(raw)
+        assert [p is None for p in body["probabilities"]] == list(np.isnan(expected))
+        np.testing.assert_allclose(
+            [p for p in body["probabilities"] if p is not None], expected[~np.isnan(expected)]
+        )
+
+        status, body = post(url + "/score", [{"at": 1.0}])
+        assert status == 400 and body["error"].startswith("ValueError: Missing columns")
+
+        with urllib.request.urlopen(url + "/metrics") as response:
+            metrics = json.load(response)
+        # Rejected batches are not counted
+        assert (metrics["requests"], metrics["rows"]) == (1, 20)
+        assert metrics["p99_ms"] >= metrics["p50_ms"] > 0
+    finally:
+        server.shutdown()
+        server.server_close()
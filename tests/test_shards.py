@@ -0,0 +1,86 @@
+# Description: The hash-sharded, out-of-core per-gvkey stages (base_dataset4.merge_sharded)
+# against the monolithic merge_financials_ratings -> compute_default_dates ->
+# merge_default_dates, and the memory claims of shards.py: a worker only loads its own shard,
+# and the parent only allocates the concatenated frame.
+
+import os
+import subprocess
+import sys
+import textwrap
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import base_dataset4 as bd
+from pipeline import data_fingerprint
+from shards import map_shards
+
+
+def shard_summary(frame):
+    # The keys a worker was given and how many rows it loaded
+    return pd.DataFrame({"key": frame["key"].unique(), "rows": len(frame)})
+
+
+def widen(frame, copies=50, width=20):
+    # An output much larger than its shard
+    values = np.ones((len(frame) * copies, width))
+    df = pd.DataFrame(values, columns=[f"x{i}" for i in range(width)])
+    return df.assign(key=np.repeat(frame["key"].to_numpy(), copies))
+
+
+@pytest.fixture(scope="module")
+def monolithic(extracts):
+    return bd.build_shard(extracts["financials"], extracts["ratings6"])
+
+
+@pytest.mark.parametrize("n_shards, n_jobs", [(1, 1), (4, 1), (7, 2)])
+def test_sharded_matches_monolithic(extracts, monolithic, n_shards, n_jobs):
+    sharded = bd.merge_sharded(
+        extracts["financials"], extracts["ratings6"], n_shards=n_shards, n_jobs=n_jobs
+    )
+    assert monolithic["dflt_flag"].sum() > 0
+    pd.testing.assert_frame_equal(sharded, monolithic)
+    assert data_fingerprint(sharded) == data_fingerprint(monolithic)
+
+
+def test_each_worker_loads_only_its_shard(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    keys = np.repeat(np.arange(200), 3)
+    frames = {"frame": pd.DataFrame({"key": keys, "value": np.arange(len(keys))})}
+    parts = map_shards(shard_summary, frames, "key", n_shards=4, n_jobs=2)
+    # Every key is in exactly one shard, with all its rows, and no shard holds them all
+    assert sorted(np.concatenate([part["key"] for part in parts])) == list(range(200))
+    assert [part["rows"].iloc[0] for part in parts] == [3 * len(part) for part in parts]
+    assert max(len(part) for part in parts) < 100
+    assert not os.listdir(tmp_path / ".shards")
+
+
+def test_parent_allocates_only_the_concatenated_frame(tmp_path):
+    # In a fresh interpreter, as Arrow's peak covers the life of the process: the shard
+    # outputs are memory-mapped, so the parent's peak (numpy and Arrow allocations) is
+    # about the size of the result, not the parts plus their concatenation
+    pytest.importorskip("pyarrow")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = f"""
+        import sys, tracemalloc
+        sys.path[:0] = [{root!r}, {os.path.join(root, "tests")!r}]
+        import numpy as np, pandas as pd, pyarrow as pa
+        from shards import concat_shards
+        from test_shards import widen
+
+        frames = {{"frame": pd.DataFrame({{"key": np.arange(5000)}})}}
+        tracemalloc.start()
+        df = concat_shards(widen, frames, "key", n_shards=8, n_jobs=2)
+        peak = tracemalloc.get_traced_memory()[1] + pa.default_memory_pool().max_memory()
+        print(len(df), peak / df.memory_usage(index=True).sum())
+    """
+    out = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(script)],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    assert int(out[0]) == 5000 * 50
+    assert 0.9 < float(out[1]) < 1.3
@@ -0,0 +1,73 @@
+# Description: The DuckDB backend of base_dataset4 (sql_backend.py) against the pandas path,
+# stage by stage and end to end. Skipped when duckdb is not installed.
+
+import datetime as dt
+
+import pandas as pd
+import pytest
+
+import base_dataset4 as bd
+
+pytest.importorskip("duckdb")
+
+
+def test_merge_ratings_with_gvkey(extracts):
+    gvkey, ratings = extracts["gvkey"], extracts["ratings"]
+    pd.testing.assert_frame_equal(
+        bd.merge_ratings_with_gvkey(gvkey, ratings, backend="duckdb"),
+        bd.merge_ratings_with_gvkey(gvkey, ratings),
+    )
+
+
+def test_rating_periods_with_missing_keys_and_shared_gvkeys():
+    # Two companies under one gvkey, a company under two gvkeys, a duplicate rating date
+    # and missing keys: the LAG windows must end each period where the pandas shift does
+    gvkey = pd.DataFrame(
+        {
+            "gvkey": ["001", "001", "002", None, "003"],
+            "companyid": [10.0, 11.0, 10.0, 12.0, None],
+            "startdate": None,
+            "enddate": None,
+        }
+    )
+    dates = [dt.date(2000 + i, 1, 1) for i in range(6)]
+    ratings = pd.DataFrame(
+        {
+            "companyid": [10.0, 11.0, 10.0, 11.0, 12.0, 12.0, None, 10.0],
+            "ratingdate": dates[:2] + dates[2:4] + dates[:2] + [dates[4], dates[2]],
+            "ratingsymbol": list("ABCDEFGH"),
+        }
+    )
+    expected = bd.merge_ratings_with_gvkey(gvkey, ratings)
+    assert (expected["ratingenddate"] != "2100-12-31").sum() > 3
+    pd.testing.assert_frame_equal(
+        bd.merge_ratings_with_gvkey(gvkey, ratings, backend="duckdb"), expected
+    )
+
+
+def test_merge_financials_ratings(extracts):
+    financials, ratings6 = extracts["financials"], extracts["ratings6"]
+    pd.testing.assert_frame_equal(
+        bd.merge_financials_ratings(financials, ratings6, backend="duckdb"),
+        bd.merge_financials_ratings(financials, ratings6),
+    )
+
+
+def test_compute_default_dates(extracts):
+    mfinancials_df = bd.merge_financials_ratings(extracts["financials"], extracts["ratings6"])
+    expected = bd.compute_default_dates(mfinancials_df)
+    assert (expected["dflt_date"] < pd.Timestamp("2100-12-31")).any()
+    pd.testing.assert_frame_equal(
+        bd.compute_default_dates(mfinancials_df, backend="duckdb"), expected
+    )
+
+
+@pytest.mark.parametrize("n_shards", [None, 4])
+def test_base_dataset_matches_pandas(extracts, n_shards):
+    financials, ratings6 = extracts["financials"], extracts["ratings6"]
+    expected = bd.build_shard(financials, ratings6)
+    if n_shards:
+        result = bd.merge_sharded(financials, ratings6, n_shards=n_shards, backend="duckdb")
+    else:
+        result = bd.build_shard(financials, ratings6, backend="duckdb")
+    pd.testing.assert_frame_equal(result, expected)
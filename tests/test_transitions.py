@@ -0,0 +1,109 @@
+# Description: Rating transition matrices (transitions.py): the cohort and duration
+# estimators on a hand-checked history, and the vectorised cohort counts against a
+# per-issuer loop over the synthetic rating histories.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from base_dataset4 import DEFAULT_SYMBOLS
+from transitions import DAYS_PER_YEAR, TransitionEngine
+
+
+def history():
+    rows = [
+        # An upgrade path ending in default
+        ("001", "2000-01-01", "AAA", "Energy"),
+        ("001", "2000-07-01", "AA", "Energy"),
+        ("001", "2001-03-01", "D", "Energy"),
+        # A downgrade after the 2001 cohort date
+        ("002", "1999-06-01", "BBB", "Energy"),
+        ("002", "2001-06-01", "BB", "Energy"),
+        # Two ratings on one day: the later row holds
+        ("003", "2000-01-01", "AA", "Utilities"),
+        ("003", "2000-01-01", "A", "Utilities"),
+        # A default that cures within the horizon
+        ("004", "2000-01-01", "B", "Utilities"),
+        ("004", "2001-05-01", "D", "Utilities"),
+        ("004", "2001-09-01", "B", "Utilities"),
+    ]
+    return pd.DataFrame(rows, columns=["gvkey", "ratingdate", "ratingsymbol", "sector"])
+
+
+def nonzero(counts):
+    return {(i, j): n for (i, j), n in counts.stack().items() if n}
+
+
+def test_cohort_counts():
+    engine = TransitionEngine(history(), obs_end="2005-01-01")
+    counts = engine.cohort_counts(2001)
+    assert nonzero(counts) == {("AA", "D"): 1, ("BBB", "BB"): 1, ("A", "A"): 1, ("B", "D"): 1}
+    # Without absorbing defaults the cured issuer is back to B a year later
+    counts = engine.cohort_counts(2001, absorbing=False)
+    assert nonzero(counts)[("B", "B")] == 1
+    assert nonzero(engine.cohort_counts(2001, sector="Energy")) == {
+        ("AA", "D"): 1,
+        ("BBB", "BB"): 1,
+    }
+    matrix = engine.cohort(2001)
+    assert matrix.loc["AA", "D"] == 1.0
+    assert matrix.loc["AAA"].isna().all()
+    # Cohorts whose horizon reaches the end of observation are not counted
+    assert engine.cohort_counts(2004).to_numpy().sum() == 4
+    short = TransitionEngine(history(), obs_end="2004-12-31")
+    assert short.cohort_counts(2004).to_numpy().sum() == 0
+
+
+def test_generator_and_duration():
+    engine = TransitionEngine(history(), obs_end="2005-01-01")
+    generator = engine.generator()
+    # AAA was held for 182 days, then left once for AA
+    assert generator.loc["AAA", "AA"] == pytest.approx(DAYS_PER_YEAR / 182)
+    np.testing.assert_allclose(generator.sum(axis=1), 0, atol=1e-12)
+    assert (generator.loc[DEFAULT_SYMBOLS] == 0).all().all()
+    assert engine.generator(absorbing=False).loc["D", "B"] > 0
+
+    matrix = engine.duration(horizon=2.0)
+    np.testing.assert_allclose(matrix.sum(axis=1), 1)
+    assert matrix.loc["D", "D"] == pytest.approx(1.0)
+    assert 0 < matrix.loc["AAA", "D"] < 1
+
+
+def loop_cohort_counts(ratings, year, horizon_days, obs_end):
+    # One issuer at a time: the rating held at 1 January of year and horizon_days later, or
+    # the first default in between
+    ratings = ratings.assign(day=pd.to_datetime(ratings["ratingdate"]).dt.normalize())
+    ratings = ratings[ratings["ratingsymbol"].notna() & ratings["gvkey"].notna()]
+    t0 = pd.Timestamp(f"{year}-01-01")
+    t1 = t0 + pd.Timedelta(days=horizon_days)
+    counts = {}
+    if t1 >= obs_end:
+        return counts
+    for _, issuer in ratings.groupby("gvkey", sort=False):
+        spells = issuer.groupby("day", sort=True)["ratingsymbol"].last()
+        before = spells[spells.index <= t0]
+        if before.empty:
+            continue
+        i = before.iloc[-1]
+        j = spells[spells.index <= t1].iloc[-1]
+        defaults = spells[(spells.index > t0) & (spells.index <= t1)]
+        defaults = defaults[defaults.isin(DEFAULT_SYMBOLS)]
+        if i in DEFAULT_SYMBOLS:
+            j = i
+        elif len(defaults):
+            j = defaults.iloc[0]
+        counts[(i, j)] = counts.get((i, j), 0) + 1
+    return counts
+
+
+def test_cohort_counts_match_a_per_issuer_loop(extracts):
+    ratings = extracts["ratings6"][["gvkey", "ratingdate", "ratingsymbol", "sector"]]
+    engine = TransitionEngine(ratings)
+    obs_end = pd.Timestamp(np.datetime64(engine.obs_end, "D"))
+    horizon_days = round(DAYS_PER_YEAR)
+    compared = 0
+    for year in engine.years():
+        expected = loop_cohort_counts(ratings, year, horizon_days, obs_end)
+        assert nonzero(engine.cohort_counts(year)) == expected
+        compared += sum(expected.values())
+    assert compared > 100
@@ -0,0 +1,49 @@
+# Description: Walk-forward validation (walk_forward.py): folds whose training years or test
+# year hold a single class are skipped explicitly instead of scored as NaN.
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import UndefinedMetricWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+
+from model_harness import model_spec
+from walk_forward import walk_forward, walk_forward_frame
+
+
+def panel(seed=0):
+    # 2000 has no defaults (a single class to train a 2001 fold on), 2003 has none either
+    rng = np.random.default_rng(seed)
+    rows = []
+    for year in range(2000, 2006):
+        x = rng.normal(0, 1, 200)
+        flag = (x + rng.normal(0, 1, 200) > 1.5).astype(int)
+        if year in (2000, 2003):
+            flag[:] = 0
+        rows.append(pd.DataFrame({"fyear": year, "x": x, "dflt_flag": flag}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def test_single_class_folds_are_skipped():
+    df = panel()
+    with warnings.catch_warnings():
+        # No "Only one class is present" warning from roc_auc_score
+        warnings.simplefilter("error", UndefinedMetricWarning)
+        (result,) = walk_forward(df, [model_spec("x", ["x"])], n_jobs=1)
+    folds = walk_forward_frame([result]).loc["x"]
+    assert list(folds.index) == [2001, 2002, 2003, 2004, 2005]
+    assert folds.loc[2001, "skipped"] == "fewer than two classes in the training years"
+    assert result["folds"][0]["coef"] is None
+    assert folds.loc[2003, "skipped"] == "one class in the test year"
+    assert np.isnan(folds.loc[[2001, 2003], "auc"]).all()
+    assert folds.loc[[2002, 2004, 2005], "skipped"].isna().all()
+
+    # A scored fold matches a fresh fit on the years before it
+    train, test = df[df["fyear"] < 2004], df[df["fyear"] == 2004]
+    clf = LogisticRegression().fit(train[["x"]].to_numpy(), train["dflt_flag"])
+    expected = roc_auc_score(test["dflt_flag"], clf.predict_proba(test[["x"]].to_numpy())[:, 1])
+    assert np.isclose(folds.loc[2004, "auc"], expected)
+    # The single-class test year still counts towards the pooled AUC
+    assert 0.5 < result["pooled_auc"] < 1
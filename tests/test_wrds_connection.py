@@ -0,0 +1,133 @@
+# Description: The lazily opened WRDS connections of base_dataset4: credentials come only
+# from the environment (or wrds' own pgpass / prompt), and main() closes only the
+# connections it opened itself. A thread-bound DB-API connection keeps every query on the
+# calling thread, and a streamed read holds the shared connection until it is consumed.
+
+import sqlite3
+import sys
+import threading
+import time
+import types
+
+import pandas as pd
+import pytest
+
+import base_dataset4 as bd
+from local_wrds import SCHEMAS, LocalWRDS, seed_reference_caches
+
+
+class FakeConnection:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_wrds(monkeypatch):
+    monkeypatch.setitem(sys.modules, "wrds", types.SimpleNamespace(Connection=FakeConnection))
+    monkeypatch.setattr(bd, "WRDS_CONN", None)
+    monkeypatch.setattr(bd, "WRDS_LOCAL", bd.threading.local())
+    monkeypatch.setattr(bd, "WRDS_POOL", [])
+
+
+def test_credentials_come_from_the_environment(fake_wrds, monkeypatch):
+    monkeypatch.setenv("WRDS_USERNAME", "analyst")
+    monkeypatch.setenv("WRDS_PASSWORD", "secret")
+    conn = bd.get_wrds_conn()
+    assert conn.kwargs == {"wrds_username": "analyst", "wrds_password": "secret"}
+    assert bd.get_wrds_conn() is conn
+    bd.close_wrds_conn()
+    assert conn.closed
+
+
+def test_without_credentials_wrds_handles_the_login(fake_wrds, monkeypatch):
+    monkeypatch.delenv("WRDS_USERNAME", raising=False)
+    monkeypatch.delenv("WRDS_PASSWORD", raising=False)
+    # No literal defaults: wrds reads ~/.pgpass or prompts
+    assert bd.get_wrds_conn().kwargs == {}
+
+
+def test_main_leaves_an_installed_connection_open(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    local = LocalWRDS()
+    local.populate(0.01, seed=2)
+    bd.set_wrds_conn(local)
+    try:
+        seed_reference_caches()
+        bd.main(path="base_dataset.pkl")
+        assert bd.WRDS_CONN is local
+        assert len(local.raw_sql("SELECT gvkey FROM ciq.wrds_gvkey")) > 0
+    finally:
+        bd.close_wrds_conn()
+    assert bd.WRDS_CONN is None
+
+
+def build(workdir, conn, monkeypatch):
+    workdir.mkdir()
+    monkeypatch.chdir(workdir)
+    bd.set_wrds_conn(conn)
+    try:
+        seed_reference_caches()
+        return bd.main(path="base_dataset.pkl")
+    finally:
+        bd.close_wrds_conn()
+
+
+def test_main_with_a_thread_bound_sqlite_connection(tmp_path, monkeypatch):
+    # A plain sqlite3 connection raises when used off the thread that created it, so the
+    # extracts and stages run on this thread instead of failing (and retrying) on workers
+    local = LocalWRDS(str(tmp_path / "wrds"))
+    local.populate(0.01, seed=2)
+    local.close()
+    conn = sqlite3.connect(":memory:")
+    for schema in SCHEMAS:
+        conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(tmp_path / "wrds" / f"{schema}.db"),))
+    monkeypatch.setattr(bd, "SOURCE_RETRIES", 0)
+    df = build(tmp_path / "sqlite", conn, monkeypatch)
+    expected = build(tmp_path / "local", LocalWRDS(str(tmp_path / "wrds")), monkeypatch)
+    # sqlite returns dates as text, so only the datetime resolution differs
+    assert len(df) > 0
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_streamed_read_holds_the_shared_connection():
+    events = []
+
+    class SharedConnection:
+        def raw_sql(self, query, chunksize=None, return_iter=False):
+            if not return_iter:
+                events.append(query)
+                return pd.DataFrame()
+            return (events.append(f"{query} {i}") or pd.DataFrame() for i in range(3))
+
+    conn = SharedConnection()
+    bd.set_wrds_conn(conn)
+    try:
+        chunks = bd.run_sql(conn, "stream", chunksize=10)
+        next(chunks)
+        other = threading.Thread(target=bd.run_sql, args=(conn, "query"))
+        other.start()
+        time.sleep(0.2)
+        # The other thread's query waits until the stream is exhausted
+        list(chunks)
+        other.join()
+    finally:
+        bd.set_wrds_conn(None)
+    assert events == ["stream 0", "stream 1", "stream 2", "query"]
+
+
+def test_retries_are_read_at_call_time(monkeypatch):
+    attempts = []
+
+    def fetch():
+        attempts.append(1)
+        raise OSError("connection reset")
+
+    monkeypatch.setattr(bd, "SOURCE_RETRIES", 1)
+    monkeypatch.setattr(bd, "RETRY_BACKOFF", 0)
+    with pytest.raises(OSError):
+        bd.fetch_with_retries("ratings", fetch)
+    assert len(attempts) == 2
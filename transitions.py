@@ -0,0 +1,176 @@
+# Description: Rating transition matrices over the 25 RATING_SYMBOLS states, from the rating
+# histories of base_dataset4.py (the ratings6 stage: gvkey, ratingdate, ratingsymbol, sector).
+#
+# Each issuer's ratings become contiguous spells: a rating holds from its ratingdate until the
+# issuer's next ratingdate, and its last rating until the end of observation (censored).
+# Spells are rebuilt from the dates rather than taken from ratingenddate, which is computed
+# across companyids. Two estimators are available for any year / sector slice and horizon:
+#   cohort:    issuers rated at the start of each year, counted by their rating `horizon`
+#              years later (only cohorts observed for the full horizon)
+#   duration:  generator matrix from transition counts over time spent in each state within
+#              the slice (Lando-Skodeberg), and P(horizon) = expm(horizon * generator)
+# Default states (DEFAULT_SYMBOLS) are absorbing by default. Everything is array arithmetic
+# over all spells at once, and counts and generators are cached per slice.
+
+import numpy as np
+import pandas as pd
+from scipy.linalg import expm
+
+from base_dataset4 import DEFAULT_SYMBOLS, RATING_SYMBOLS, pipeline_stages
+from pipeline import run_pipeline
+
+DAYS_PER_YEAR = 365.25
+N_STATES = len(RATING_SYMBOLS)
+DEFAULT_STATES = [RATING_SYMBOLS.index(symbol) for symbol in DEFAULT_SYMBOLS]
+
+
+def load_rating_histories():
+    # ratings6 from the stage cache, built if needed
+    return run_pipeline(pipeline_stages(), targets=["ratings6"])["ratings6"]
+
+
+def to_day(date):
+    return int(np.datetime64(pd.Timestamp(date).date(), "D").astype("i8"))
+
+
+def year_start(year):
+    return int(np.datetime64(f"{year}-01-01", "D").astype("i8"))
+
+
+class TransitionEngine:
+    def __init__(self, ratings, obs_end=None):
+        # obs_end: end of observation, by default the day after the last rating
+        start = pd.to_datetime(ratings["ratingdate"], errors="coerce")
+        state = pd.Categorical(ratings["ratingsymbol"].astype(object), RATING_SYMBOLS).codes
+        code, _ = pd.factorize(ratings["gvkey"])
+        if "sector" in ratings.columns:
+            sector, self.sectors = pd.factorize(ratings["sector"], sort=True)
+        else:
+            sector, self.sectors = np.full(len(ratings), -1), pd.Index([])
+        keep = (code >= 0) & start.notna().to_numpy() & (state >= 0)
+        day = start.to_numpy(dtype="datetime64[ns]")[keep].astype("datetime64[D]").view("i8")
+        code, state, sector = code[keep], state[keep].astype(np.intp), sector[keep]
+
+        # Spells in (issuer, date) order; of several ratings on one day the last one holds
+        order = np.lexsort((day, code))
+        code, day, state, sector = code[order], day[order], state[order], sector[order]
+        last_of_day = np.r_[(code[1:] != code[:-1]) | (day[1:] != day[:-1]), True]
+        code, day, state, sector = (a[last_of_day] for a in (code, day, state, sector))
+
+        self.obs_end = int(day.max()) + 1 if obs_end is None else to_day(obs_end)
+        self.first_day = int(day.min())
+        has_next = np.r_[code[1:] == code[:-1], False]
+        self.code, self.day, self.state, self.sector = code, day, state, sector
+        self.end = np.where(has_next, np.r_[day[1:], 0], self.obs_end)
+        self.next_state = np.where(has_next, np.r_[state[1:], 0], -1)
+
+        # Position of the first default spell after each spell (len(day) if none), for
+        # absorbing defaults in the cohort estimator
+        n = len(day)
+        default_pos = np.where(np.isin(state, DEFAULT_STATES), np.arange(n), n)
+        first_default = pd.Series(default_pos[::-1]).groupby(code[::-1]).cummin().to_numpy()[::-1]
+        self.next_default = np.where(has_next, np.r_[first_default[1:], n], n)
+
+        # (issuer, start day) keys for looking up the spell that covers a given day
+        self.span = self.obs_end - self.first_day + 1
+        self.key = code * self.span + (day - self.first_day)
+        self.cache = {}
+
+    def slice_rows(self, sector):
+        if sector is None:
+            return np.arange(len(self.day))
+        return np.flatnonzero(self.sector == self.sectors.get_loc(sector))
+
+    def years(self):
+        first = int(np.datetime64(self.first_day, "D").astype("datetime64[Y]").astype(int)) + 1970
+        last = int(np.datetime64(self.obs_end - 1, "D").astype("datetime64[Y]").astype(int)) + 1970
+        return list(range(first, last + 1))
+
+    def frame(self, matrix):
+        return pd.DataFrame(
+            matrix,
+            index=pd.Index(RATING_SYMBOLS, name="from"),
+            columns=pd.Index(RATING_SYMBOLS, name="to"),
+        )
+
+    def cohort_counts(self, year=None, sector=None, horizon=1.0, absorbing=True):
+        # Counts of (rating at the cohort date, rating `horizon` years later); cohort dates
+        # are 1 January of `year`, or of every year when year is None
+        key = ("cohort", year, sector, horizon, absorbing)
+        if key not in self.cache:
+            rows = self.slice_rows(sector)
+            horizon_days = round(horizon * DAYS_PER_YEAR)
+            starts = [year_start(y) for y in ([year] if year is not None else self.years())]
+            counts = np.zeros(N_STATES * N_STATES, dtype=np.int64)
+            for t0 in starts:
+                t1 = t0 + horizon_days
+                if t1 >= self.obs_end:
+                    continue
+                covering = rows[(self.day[rows] <= t0) & (self.end[rows] > t0)]
+                i = self.state[covering]
+                # Spells chain up to obs_end, so the spell covering t1 is the issuer's own
+                later = self.code[covering] * self.span + (t1 - self.first_day)
+                j = self.state[np.searchsorted(self.key, later, side="right") - 1]
+                if absorbing:
+                    default = np.isin(i, DEFAULT_STATES)
+                    nd = self.next_default[covering]
+                    hit = nd < len(self.day)
+                    hit[hit] = self.day[nd[hit]] <= t1
+                    j = np.where(hit, self.state[np.minimum(nd, len(self.day) - 1)], j)
+                    j = np.where(default, i, j)
+                counts += np.bincount(i * N_STATES + j, minlength=N_STATES * N_STATES)
+            self.cache[key] = self.frame(counts.reshape(N_STATES, N_STATES))
+        return self.cache[key]
+
+    def cohort(self, year=None, sector=None, horizon=1.0, absorbing=True):
+        counts = self.cohort_counts(year, sector, horizon, absorbing)
+        # States nobody held at a cohort date have no row (NaN)
+        return counts.div(counts.sum(axis=1).replace(0, np.nan), axis=0)
+
+    def generator(self, year=None, sector=None, absorbing=True):
+        # Transition intensities per year: transitions i -> j in the window over the years
+        # spent in i in the window; the window is `year`, or the whole observation
+        key = ("generator", year, sector, absorbing)
+        if key not in self.cache:
+            rows = self.slice_rows(sector)
+            if year is None:
+                a, b = self.first_day, self.obs_end
+            else:
+                a, b = year_start(year), year_start(year + 1)
+            overlap = np.minimum(self.end[rows], b) - np.maximum(self.day[rows], a)
+            exposure = np.bincount(
+                self.state[rows],
+                weights=np.clip(overlap, 0, None) / DAYS_PER_YEAR,
+                minlength=N_STATES,
+            )
+            moved = rows[
+                (self.end[rows] >= a) & (self.end[rows] < b) & (self.next_state[rows] >= 0)
+            ]
+            counts = np.bincount(
+                self.state[moved] * N_STATES + self.next_state[moved],
+                minlength=N_STATES * N_STATES,
+            ).reshape(N_STATES, N_STATES)
+            np.fill_diagonal(counts, 0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                intensities = np.where(exposure[:, None] > 0, counts / exposure[:, None], 0.0)
+            if absorbing:
+                intensities[DEFAULT_STATES] = 0.0
+            np.fill_diagonal(intensities, -intensities.sum(axis=1))
+            self.cache[key] = self.frame(intensities)
+        return self.cache[key]
+
+    def duration(self, year=None, sector=None, horizon=1.0, absorbing=True):
+        intensities = self.generator(year, sector, absorbing)
+        return self.frame(expm(horizon * intensities.to_numpy()))
+
+    def grid(self, method="cohort", horizon=1.0, years=None, sectors=None, absorbing=True):
+        # One matrix per (sector, year), stacked with a (sector, year, from) row index
+        estimate = {"cohort": self.cohort, "duration": self.duration}[method]
+        years = self.years() if years is None else years
+        sectors = list(self.sectors) if sectors is None else sectors
+        matrices = {
+            (sector, year): estimate(year, sector, horizon, absorbing)
+            for sector in sectors
+            for year in years
+        }
+        return pd.concat(matrices, names=["sector", "year"])
@@ -0,0 +1,96 @@
+# Description: Walk-forward (out-of-time) validation of the model_harness specs, keyed on fyear.
+#
+# For each test year t+1 a spec is trained on every year <= t and scored on year t+1, then the
+# window rolls forward one year. Refits within a spec are sequential and warm-started from the
+# previous year's coefficients (solvers that support it; liblinear always refits from
+# scratch), while the specs themselves run in parallel on the shared-memory matrix of
+# model_harness.map_shared. Each spec reports the AUC of every test year and one pooled AUC
+# over all of its out-of-time predictions.
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import roc_auc_score
+
+from model_harness import SHARED, map_shared
+
+FIRST_TEST_YEAR = 1990
+LAST_TEST_YEAR = 2022
+
+
+def walk_spec(spec):
+    matrix, test_years = SHARED["matrix"], SHARED["test_years"]
+    positions = [SHARED["columns"].index(feature) for feature in spec["features"]]
+    X = matrix[:, positions]
+    year = matrix[:, -2]
+    y = matrix[:, -1].astype(np.int8)
+    complete = ~np.isnan(X).any(axis=1)
+
+    clf = LogisticRegression(warm_start=True, **spec["params"])
+    folds, scored, probs = [], [], []
+    for test_year in test_years:
+        train = complete & (year < test_year)
+        test = complete & (year == test_year)
+        fold = {"year": test_year, "n_train": int(train.sum()), "n_test": int(test.sum())}
+        fold.update(auc=np.nan, n_iter=None, converged=None, coef=None, skipped=None)
+        if np.unique(y[train]).size < 2:
+            fold["skipped"] = "fewer than two classes in the training years"
+        elif not test.any():
+            fold["skipped"] = "no complete rows in the test year"
+        if fold["skipped"] is not None:
+            folds.append(fold)
+            continue
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always", ConvergenceWarning)
+            clf.fit(X[train], y[train])
+        fold["converged"] = not any(w.category is ConvergenceWarning for w in caught)
+        fold["n_iter"] = int(np.max(clf.n_iter_))
+        fold["coef"] = dict(zip(spec["features"], clf.coef_[0]))
+        y_prob = clf.predict_proba(X[test])[:, 1]
+        scored.append(y[test])
+        probs.append(y_prob)
+        # roc_auc_score only warns and returns NaN on a single class, so check first; the
+        # predictions still count towards the pooled AUC
+        if np.unique(y[test]).size < 2:
+            fold["skipped"] = "one class in the test year"
+        else:
+            fold["auc"] = roc_auc_score(y[test], y_prob)
+        folds.append(fold)
+
+    result = {"label": spec["label"], "features": spec["features"], "folds": folds}
+    result["pooled_auc"] = np.nan
+    if scored and np.unique(np.concatenate(scored)).size == 2:
+        result["pooled_auc"] = roc_auc_score(np.concatenate(scored), np.concatenate(probs))
+    return result
+
+
+def walk_forward(
+    df,
+    specs,
+    target="dflt_flag",
+    first_test_year=FIRST_TEST_YEAR,
+    last_test_year=LAST_TEST_YEAR,
+    n_jobs=None,
+):
+    # Returns one result dict per spec, in spec order, with a fold dict per test year
+    columns = list(dict.fromkeys(feature for spec in specs for feature in spec["features"]))
+    data = df.loc[df[target].notna() & df["fyear"].notna(), columns + ["fyear", target]]
+    matrix = data.to_numpy(dtype="float64", na_value=np.nan)
+    years = np.unique(matrix[:, -2])
+    test_years = [
+        int(year) for year in years if first_test_year <= year <= last_test_year and year > years[0]
+    ]
+    return map_shared(walk_spec, specs, matrix, columns, n_jobs, test_years=test_years)
+
+
+def walk_forward_frame(results):
+    # One row per (model, test year)
+    rows = [
+        {"model": result["label"], **{k: v for k, v in fold.items() if k != "coef"}}
+        for result in results
+        for fold in result["folds"]
+    ]
+    return pd.DataFrame(rows).set_index(["model", "year"])